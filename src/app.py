@@ -1,13 +1,39 @@
 """Launch the FastAPI retriever server."""
 
+import argparse
+import os
+import tempfile
+
 import uvicorn
 from pjs_neo_rag.config import settings
 
 if __name__ == "__main__":
-    print(f"🚀 Starting server on port {settings.API_PORT}")
-    uvicorn.run(
-        "pjs_neo_rag.neo4j_retriever_api:app",
-        host="0.0.0.0",
-        port=settings.API_PORT,
-        reload=False,
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=settings.API_WORKERS,
+        help="Worker processes, each with its own connection pools "
+        "(default: API_WORKERS)",
     )
+    args = parser.parse_args()
+    metrics_dir = None
+    if args.workers > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # one /metrics view across workers (see pjs_neo_rag.metrics); the
+        # directory only lives as long as this server
+        metrics_dir = tempfile.TemporaryDirectory(prefix="pjs-metrics-")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir.name
+
+    print(f"🚀 Starting server on port {args.port} with {args.workers} worker(s)")
+    try:
+        uvicorn.run(
+            "pjs_neo_rag.neo4j_retriever_api:app",
+            host="0.0.0.0",
+            port=args.port,
+            workers=args.workers,
+            reload=False,
+        )
+    finally:
+        if metrics_dir is not None:
+            metrics_dir.cleanup()
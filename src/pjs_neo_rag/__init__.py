@@ -1,11 +1,35 @@
-"""pjs-neo-rag: Graph RAG on Neo4j with LaTeX support."""
+"""pjs-neo-rag: Graph RAG on Neo4j with LaTeX support.
 
-from pjs_neo_rag.config import settings
-from pjs_neo_rag.neo4j_connection import get_driver, get_session
-from pjs_neo_rag.ingest_pdf import ingest_pdf
+The names below are imported on first access, so importing a submodule (the
+API server in particular) does not load the PDF ingestion stack.
+"""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pjs_neo_rag.config import settings
+    from pjs_neo_rag.ingest_pdf import ingest_pdf
+    from pjs_neo_rag.neo4j_connection import get_driver, get_session
 
 __all__ = ["settings", "get_driver", "get_session", "ingest_pdf"]
 
+_EXPORTS = {
+    "settings": "pjs_neo_rag.config",
+    "get_driver": "pjs_neo_rag.neo4j_connection",
+    "get_session": "pjs_neo_rag.neo4j_connection",
+    "ingest_pdf": "pjs_neo_rag.ingest_pdf",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module), name)
+    globals()[name] = value
+    return value
+
 
 def main() -> None:
     print("Hello from pjs-neo-rag!")
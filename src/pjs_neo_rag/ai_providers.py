@@ -3,42 +3,74 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Any, List, Protocol, runtime_checkable
+from typing import Any, AsyncIterator, Protocol, Sequence, runtime_checkable
+
+import numpy as np
 
 from pjs_neo_rag.config import settings
-from pjs_neo_rag.lmstudio import LMStudioProvider
-from pjs_neo_rag.ollama import OllamaProvider
-from pjs_neo_rag.vllm import VLLMProvider
 
 
 @runtime_checkable
 class AIProvider(Protocol):
-    """Minimal interface shared by embedding/chat backends."""
+    """Minimal interface shared by embedding/chat backends.
+
+    Embeddings are float32 arrays: 1-D for ``embed``, one row per input for
+    ``embed_batch``. ``astream_chat`` yields the completion as it is generated.
+    """
 
     name: str
 
-    def embed(self, text: str) -> List[float]:  # pragma: no cover - interface
+    def embed(self, text: str) -> np.ndarray:  # pragma: no cover - interface
+        ...
+
+    def embed_batch(
+        self, texts: Sequence[str]
+    ) -> np.ndarray:  # pragma: no cover - interface
         ...
 
     def chat(self, prompt: str, **kwargs: Any) -> str:  # pragma: no cover - interface
         ...
 
+    async def aembed(self, text: str) -> np.ndarray:  # pragma: no cover - interface
+        ...
+
+    async def aembed_batch(
+        self, texts: Sequence[str]
+    ) -> np.ndarray:  # pragma: no cover - interface
+        ...
+
+    def astream_chat(
+        self, prompt: str, **kwargs: Any
+    ) -> AsyncIterator[str]:  # pragma: no cover - interface
+        ...
+
+    async def aload_chat_model(self) -> None:  # pragma: no cover - interface
+        ...
+
 
 @lru_cache(maxsize=None)
 def _provider_factory(name: str) -> AIProvider:
+    # providers are imported on demand: only the configured backend is loaded
     if name == "ollama":
+        from pjs_neo_rag.ollama import OllamaProvider
+
         return OllamaProvider(
             base_url=settings.OLLAMA_URL,
             embed_model=settings.OLLAMA_EMBED_MODEL,
             chat_model=settings.OLLAMA_CHAT_MODEL,
+            keep_alive=settings.OLLAMA_KEEP_ALIVE or None,
         )
     if name == "vllm":
+        from pjs_neo_rag.vllm import VLLMProvider
+
         return VLLMProvider(
             base_url=settings.VLLM_URL,
             embed_model=settings.VLLM_EMBED_MODEL,
             chat_model=settings.VLLM_CHAT_MODEL,
         )
     if name == "lmstudio":
+        from pjs_neo_rag.lmstudio import LMStudioProvider
+
         return LMStudioProvider(
             base_url=settings.LMSTUDIO_URL,
             embed_model=settings.LMSTUDIO_EMBED_MODEL,
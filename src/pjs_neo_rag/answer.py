@@ -0,0 +1,70 @@
+"""Prompt assembly for ``POST /answer``.
+
+Retrieved passages are packed, best first, into ANSWER_CONTEXT_TOKENS
+tokens of context (estimated at ~4 characters per token, like the
+chunker) and numbered so the model can cite them as ``[n]``.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Sequence
+
+from pjs_neo_rag.config import settings
+
+ANSWER_PROMPT = """Answer the question using only the numbered context passages.
+Cite the passages you use as [n]. If the context does not contain the answer,
+say so.
+
+Context:
+{context}
+
+Question: {question}
+Answer:"""
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def _format_passage(n: int, passage: dict[str, Any]) -> str:
+    pages = (
+        f"p. {passage['page_start']}"
+        if passage["page_start"] == passage["page_end"]
+        else f"pp. {passage['page_start']}-{passage['page_end']}"
+    )
+    body = passage["text"].strip()
+    if passage.get("latex"):
+        body += f"\nLaTeX: {passage['latex'].strip()}"
+    return f"[{n}] ({pages})\n{body}"
+
+
+def pack_passages(
+    passages: Sequence[dict[str, Any]], budget: int | None = None
+) -> list[str]:
+    """Formatted passages, in rank order, that fit in ``budget`` tokens.
+
+    A passage that does not fit ends the context, except the first one,
+    which is truncated so the model always gets the best hit.
+    """
+    budget = settings.ANSWER_CONTEXT_TOKENS if budget is None else budget
+    packed: list[str] = []
+    used = 0
+    for passage in passages:
+        block = _format_passage(len(packed) + 1, passage)
+        cost = estimate_tokens(block)
+        if used + cost > budget:
+            if not packed:
+                packed.append(block[: budget * 4])
+            break
+        packed.append(block)
+        used += cost
+    return packed
+
+
+def build_prompt(
+    question: str, passages: Sequence[dict[str, Any]]
+) -> tuple[str, int]:
+    """The prompt, and how many of ``passages`` made it into the context."""
+    packed = pack_passages(passages)
+    context = "\n\n".join(packed) or "(no passages found)"
+    return ANSWER_PROMPT.format(context=context, question=question.strip()), len(packed)
@@ -0,0 +1,296 @@
+"""Offline bulk load via ``neo4j-admin database import``.
+
+For first-time loads and full rebuilds, transactional MERGE is much slower
+than Neo4j's offline importer. ``export`` parses and embeds every PDF under
+SOURCE_DIR (same chunking, sections and embedding cache as ``ingest_pdf``)
+and writes node/relationship CSV files in the importer's format, with
+vectors as ``float[]`` arrays. Rows are written as each batch of chunks is
+embedded; a document that fails midway is truncated out of the files again,
+so no partial document or dangling relationship id is left. After running
+the printed ``neo4j-admin`` command against the stopped database,
+``indexes`` creates the indexes from ``create_neo_indexes`` and waits for
+them to come online.
+
+Near-duplicate detection (``near_dup``) is not applied: every chunk is
+exported with its own vectors, and the LSH index is reset on the next
+ingest since the database was replaced.
+
+Usage:
+    python src/pjs_neo_rag/bulk_import.py export ./import
+    neo4j-admin database import full ...   # printed by export
+    python src/pjs_neo_rag/bulk_import.py indexes
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import os
+import time
+from itertools import batched
+from pathlib import Path
+from typing import Any
+
+import fitz  # PyMuPDF
+import numpy as np
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.ingest_pdf import (
+    SectionCentroids,
+    build_sections,
+    embed_rows,
+    file_doc_id,
+    iter_chunks,
+)
+
+ARRAY_DELIMITER = ";"
+
+DOC_HEADER = [
+    "doc_id:ID(Document)",
+    "title",
+    "path",
+    "page_count:int",
+    "added_at:long",
+    "chunk_count:int",
+    "ingested_at:long",
+]
+SECTION_HEADER = [
+    "sec_id:ID(Section)",
+    "title",
+    "level:int",
+    "page_start:int",
+    "page_end:int",
+    "embedding:float[]",
+]
+CHUNK_HEADER = [
+    "chunk_id:ID(Chunk)",
+    "text_norm",
+    "latex_raw",
+    "page_start:int",
+    "page_end:int",
+    "source_hash",
+    "content_hash",
+    "source_type",
+    "added_at:long",
+    "vec_text:float[]",
+    "vec_latex:float[]",
+]
+DOC_SECTION_HEADER = [":START_ID(Document)", ":END_ID(Section)"]
+SECTION_CHUNK_HEADER = [":START_ID(Section)", ":END_ID(Chunk)"]
+NEXT_CHUNK_HEADER = [":START_ID(Chunk)", ":END_ID(Chunk)"]
+
+FILES = {
+    "documents": ("documents.csv", DOC_HEADER),
+    "sections": ("sections.csv", SECTION_HEADER),
+    "chunks": ("chunks.csv", CHUNK_HEADER),
+    "doc_sections": ("doc_sections.csv", DOC_SECTION_HEADER),
+    "section_chunks": ("section_chunks.csv", SECTION_CHUNK_HEADER),
+    "next_chunks": ("next_chunks.csv", NEXT_CHUNK_HEADER),
+}
+
+
+def _array(vec: np.ndarray | None) -> str:
+    """Encode a vector as an importer float array (empty -> no property)."""
+    if vec is None:
+        return ""
+    return ARRAY_DELIMITER.join(
+        f"{x:.7g}" for x in np.asarray(vec, dtype=np.float32).tolist()
+    )
+
+
+def import_command(out_dir: Path, database: str = settings.NEO4J_DATABASE) -> str:
+    out = out_dir.resolve()
+    return " \\\n  ".join(
+        [
+            f"neo4j-admin database import full {database} --overwrite-destination",
+            f"--nodes=Document={out / FILES['documents'][0]}",
+            f"--nodes=Section={out / FILES['sections'][0]}",
+            f"--nodes=Chunk={out / FILES['chunks'][0]}",
+            f"--relationships=CONTAINS={out / FILES['doc_sections'][0]}",
+            f"--relationships=CONTAINS={out / FILES['section_chunks'][0]}",
+            f"--relationships=NEXT={out / FILES['next_chunks'][0]}",
+            f'--array-delimiter="{ARRAY_DELIMITER}"',
+            "--multiline-fields=true",
+        ]
+    )
+
+
+def export(files: list[str], out_dir: Path) -> None:
+    """Write importer CSVs for ``files`` into ``out_dir``."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    handles = {
+        key: open(out_dir / name, "w", newline="", encoding="utf-8")
+        for key, (name, _) in FILES.items()
+    }
+    writers = {key: csv.writer(fh) for key, fh in handles.items()}
+    for key, (_, header) in FILES.items():
+        writers[key].writerow(header)
+
+    seen: set[str] = set()
+    totals = {"documents": 0, "sections": 0, "chunks": 0}
+    now = int(time.time() * 1000)
+    try:
+        for f in files:
+            # file positions before this document, to drop its partial rows
+            marks = {key: fh.tell() for key, fh in handles.items()}
+            try:
+                doc_id = file_doc_id(f)
+                if doc_id in seen:
+                    print(f"[SKIP] {f}: duplicate of an exported document")
+                    continue
+                n_sections, n_chunks = _export_pdf(f, doc_id, writers, now)
+            except Exception as e:
+                for key, fh in handles.items():
+                    fh.seek(marks[key])
+                    fh.truncate()
+                print(f"[WARN] {f}: {e}")
+                continue
+            seen.add(doc_id)
+            totals["documents"] += 1
+            totals["sections"] += n_sections
+            totals["chunks"] += n_chunks
+            print(f"✅ Exported: {f}  sections={n_sections}  chunks={n_chunks}")
+    finally:
+        for fh in handles.values():
+            fh.close()
+
+    print(
+        f"\n📦 Wrote {totals['documents']} documents, {totals['sections']} sections, "
+        f"{totals['chunks']} chunks to {out_dir}"
+    )
+    print("\nStop Neo4j, then run:\n")
+    print(import_command(out_dir))
+    print("\nStart Neo4j again and build the indexes with:\n")
+    print("python src/pjs_neo_rag/bulk_import.py indexes")
+
+
+def _export_pdf(
+    pdf_path: str, doc_id: str, writers: dict[str, Any], now: int
+) -> tuple[int, int]:
+    # Rows are written batch by batch as chunks are embedded, so memory is
+    # bounded by INGEST_BATCH_SIZE; ``export`` truncates the files back if
+    # the document fails midway.
+    doc = fitz.open(pdf_path)
+    try:
+        sections = {sec["sec_id"]: sec for sec in build_sections(doc, doc_id)}
+        centroids = SectionCentroids()
+        written: set[str] = set()
+        n_chunks = 0
+        title = ""
+        latex_memo: dict[str, np.ndarray] = {}
+
+        def write_sections(done: list[dict[str, Any]]) -> None:
+            for d in done:
+                _write_section(writers, doc_id, sections[d["sec_id"]], d["embedding"])
+                written.add(d["sec_id"])
+
+        for batch in batched(
+            iter_chunks(doc, doc_id, pdf_path), settings.INGEST_BATCH_SIZE
+        ):
+            rows = list(batch)
+            embed_rows(rows, latex_memo)
+            writers["chunks"].writerows(
+                [
+                    r["chunk_id"],
+                    r["text_norm"],
+                    r["latex_raw"],
+                    r["page_start"],
+                    r["page_end"],
+                    doc_id,
+                    r["content_hash"],
+                    "pdf",
+                    now,
+                    _array(r["vec_text"]),  # type: ignore[arg-type]
+                    _array(r["vec_latex"]),  # type: ignore[arg-type]
+                ]
+                for r in rows
+            )
+            writers["section_chunks"].writerows(
+                [r["sec_id"], r["chunk_id"]] for r in rows
+            )
+            writers["next_chunks"].writerows(
+                [r["prev_id"], r["chunk_id"]] for r in rows if r["prev_id"]
+            )
+            write_sections(centroids.add(rows))
+            title = str(rows[-1]["title"])
+            n_chunks += len(rows)
+        write_sections(centroids.finish())
+        # sections without chunks, or with duplicate chunks only, have no vector
+        for sec_id, sec in sections.items():
+            if sec_id not in written:
+                _write_section(writers, doc_id, sec, None)
+        if not title:
+            metadata = doc.metadata or {}
+            title = (metadata.get("title") or os.path.basename(pdf_path)).strip()
+        page_count = doc.page_count
+    finally:
+        doc.close()
+
+    writers["documents"].writerow(
+        [doc_id, title, os.path.abspath(pdf_path), page_count, now, n_chunks, now]
+    )
+    return len(sections), n_chunks
+
+
+def _write_section(
+    writers: dict[str, Any],
+    doc_id: str,
+    sec: dict[str, Any],
+    embedding: np.ndarray | None,
+) -> None:
+    writers["sections"].writerow(
+        [
+            sec["sec_id"],
+            sec["title"],
+            sec["level"],
+            sec["page_start"],
+            sec["page_end"],
+            _array(embedding),
+        ]
+    )
+    writers["doc_sections"].writerow([doc_id, sec["sec_id"]])
+
+
+def build_indexes(timeout_seconds: int = 3600) -> None:
+    """Create all indexes on the imported database and wait until they are online."""
+    from pjs_neo_rag.corpus_generation import bump_generation
+    from pjs_neo_rag.create_neo_indexes import run as create_indexes
+    from pjs_neo_rag.neo4j_connection import get_driver, DB
+
+    create_indexes(force_recreate=False)
+    driver = get_driver()
+    try:
+        with driver.session(database=DB) as s:
+            print("⏳ Waiting for indexes to come online...")
+            s.run("CALL db.awaitIndexes($timeout)", timeout=timeout_seconds).consume()
+            # the database was replaced: invalidate cached search results
+            bump_generation(s)
+    finally:
+        driver.close()
+    print("✅ Indexes online")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline bulk load for Neo4j")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="write neo4j-admin import CSV files")
+    p_export.add_argument("out_dir", type=Path)
+    p_export.add_argument("--source", type=Path, default=settings.SOURCE_DIR)
+    p_index = sub.add_parser("indexes", help="create indexes after the import")
+    p_index.add_argument("--timeout", type=int, default=3600)
+    args = parser.parse_args(argv)
+
+    if args.command == "indexes":
+        build_indexes(args.timeout)
+        return
+
+    files = sorted(glob.glob(str(args.source / "**/*.pdf"), recursive=True))
+    if not files:
+        print(f"No PDFs found under {args.source}")
+        return
+    export(files, args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -37,6 +37,14 @@ class Settings:
         self.VLLM_URL = os.getenv("VLLM_URL", "http://127.0.0.1:8001")
         self.LMSTUDIO_URL = os.getenv("LMSTUDIO_URL", "http://127.0.0.1:1234")
 
+        # Shared HTTP transport for provider calls
+        self.HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+        self.HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+        self.HTTP_CIRCUIT_FAILURES = int(os.getenv("HTTP_CIRCUIT_FAILURES", "5"))
+        self.HTTP_CIRCUIT_RESET = float(os.getenv("HTTP_CIRCUIT_RESET", "30"))
+
         # Provider-specific embedding models and dimensions
         self.OLLAMA_EMBED_MODEL = os.getenv("OLLAMA_EMBED_MODEL", "bge-m3")
         self.VLLM_EMBED_MODEL = os.getenv("VLLM_EMBED_MODEL", "BAAI/bge-m3")
@@ -49,6 +57,9 @@ class Settings:
 
         # Provider-specific chat models
         self.OLLAMA_CHAT_MODEL = os.getenv("OLLAMA_CHAT_MODEL", "mistral:7b")
+        # How long Ollama keeps a model loaded after a request
+        # (Ollama duration, e.g. "30m"; "-1" = forever)
+        self.OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m").strip()
         self.VLLM_CHAT_MODEL = os.getenv(
             "VLLM_CHAT_MODEL", "mistralai/Mistral-7B-Instruct-v0.2"
         )
@@ -88,13 +99,131 @@ class Settings:
         self.CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "1000"))
         self.CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
 
+        # Number of texts sent to the embedding provider per request
+        self.EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+
+        # Chunks embedded and upserted together while streaming a document
+        self.INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+
+        # Neo4j write path: concurrent writer sessions, and optionally
+        # CALL {} IN TRANSACTIONS OF NEO4J_TX_ROWS ROWS for chunk upserts
+        self.NEO4J_WRITERS = int(os.getenv("NEO4J_WRITERS", "2"))
+        self.NEO4J_CALL_IN_TX = os.getenv("NEO4J_CALL_IN_TX", "false").strip().lower() in {
+            "1",
+            "true",
+            "yes",
+        }
+        self.NEO4J_TX_ROWS = int(os.getenv("NEO4J_TX_ROWS", "100"))
+
+        # Persistent embedding cache (empty EMBED_CACHE_PATH disables it)
+        cache_path = os.getenv("EMBED_CACHE_PATH", "./.embed-cache.sqlite").strip()
+        self.EMBED_CACHE_PATH = (
+            Path(cache_path).expanduser().resolve() if cache_path else None
+        )
+        self.EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "4096"))
+
+        # Near-duplicate chunk detection (off unless DEDUP_INDEX_PATH is set)
+        dedup_path = os.getenv("DEDUP_INDEX_PATH", "").strip()
+        self.DEDUP_INDEX_PATH = (
+            Path(dedup_path).expanduser().resolve() if dedup_path else None
+        )
+        self.DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+        self.DEDUP_SHINGLE = int(os.getenv("DEDUP_SHINGLE", "5"))
+
+        # Pipelined ingestion (ingest_files.py --pipeline)
+        self.INGEST_PARSE_WORKERS = int(
+            os.getenv("INGEST_PARSE_WORKERS", str(os.cpu_count() or 1))
+        )
+        self.INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "4"))
+        self.INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "8"))
+
         # Source documents directory
         self.SOURCE_DIR = (
             Path(os.getenv("SOURCE_DIR", "./corpus")).expanduser().resolve()
         )
 
+        # Manifest used by incremental ingestion (ingest_files.py --incremental)
+        self.INGEST_MANIFEST = (
+            Path(os.getenv("INGEST_MANIFEST", "./.ingest-manifest.json"))
+            .expanduser()
+            .resolve()
+        )
+
+        # Retrieval: candidate pools and hybrid (vector + BM25) rank fusion
+        self.SEARCH_MODE = os.getenv("SEARCH_MODE", "flat").strip().lower()
+        self.K_PROSE = int(os.getenv("K_PROSE", "40"))
+        self.K_LATEX = int(os.getenv("K_LATEX", "40"))
+        self.K_BM25 = int(os.getenv("K_BM25", "20"))
+        self.PROSE_QUERY_WEIGHT = float(os.getenv("PROSE_QUERY_WEIGHT", "0.6"))
+        self.LATEX_QUERY_WEIGHT = float(os.getenv("LATEX_QUERY_WEIGHT", "0.3"))
+        self.BM25_LATEX_WEIGHT = float(os.getenv("BM25_LATEX_WEIGHT", "0.1"))
+        self.MATHY_LATEX_BOOST = float(os.getenv("MATHY_LATEX_BOOST", "2.0"))
+        self.RRF_K = int(os.getenv("RRF_K", "60"))
+
+        # Vector candidates for flat/hybrid search: neo4j (vector indexes) or
+        # mmap (in-process memory-mapped index, see mmap_index.py); IVF lists
+        # are used from MMAP_IVF_MIN_ROWS vectors, MMAP_IVF_NPROBE probed
+        self.VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "neo4j").strip().lower()
+        self.MMAP_INDEX_DIR = (
+            Path(os.getenv("MMAP_INDEX_DIR", "./.vector-index")).expanduser().resolve()
+        )
+        self.MMAP_IVF_MIN_ROWS = int(os.getenv("MMAP_IVF_MIN_ROWS", "20000"))
+        self.MMAP_IVF_NPROBE = int(os.getenv("MMAP_IVF_NPROBE", "16"))
+
+        # Filtered search: exact scan when the filters admit at most
+        # FILTER_EXACT_MAX chunks, else ANN pools widened up to FILTER_MAX_POOL
+        self.FILTER_EXACT_MAX = int(os.getenv("FILTER_EXACT_MAX", "5000"))
+        self.FILTER_MAX_POOL = int(os.getenv("FILTER_MAX_POOL", "1000"))
+
+        # Most queries accepted by one POST /search/batch request
+        self.SEARCH_BATCH_MAX = int(os.getenv("SEARCH_BATCH_MAX", "2000"))
+
+        # Sections expanded by hierarchical (coarse-to-fine) search
+        self.SECTION_TOPK = int(os.getenv("SECTION_TOPK", "10"))
+
+        # In-process cache of query embeddings (0 entries disables it)
+        self.QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        self.QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+        # Search result cache, invalidated by the corpus generation counter.
+        # Backend: memory (per process), sqlite (file shared by API workers;
+        # place it on /dev/shm for shared memory) or none
+        self.RESULT_CACHE_BACKEND = (
+            os.getenv("RESULT_CACHE_BACKEND", "memory").strip().lower()
+        )
+        self.RESULT_CACHE_PATH = (
+            Path(os.getenv("RESULT_CACHE_PATH", "./.result-cache.sqlite"))
+            .expanduser()
+            .resolve()
+        )
+        self.RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "4096"))
+        self.RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "86400"))
+        self.RESULT_CACHE_GENERATION_POLL = float(
+            os.getenv("RESULT_CACHE_GENERATION_POLL", "2")
+        )
+
         # API configuration
         self.API_PORT = int(os.getenv("API_PORT", "8000"))
+        # POST /answer: retrieved context packed into the prompt, in tokens
+        self.ANSWER_CONTEXT_TOKENS = int(os.getenv("ANSWER_CONTEXT_TOKENS", "3000"))
+        # uvicorn worker processes; 0 = one per CPU core
+        workers = int(os.getenv("API_WORKERS", "1"))
+        self.API_WORKERS = workers if workers > 0 else (os.cpu_count() or 1)
+        # Neo4j driver pool, per process (API_WORKERS x NEO4J_POOL_SIZE in total)
+        self.NEO4J_POOL_SIZE = int(os.getenv("NEO4J_POOL_SIZE", "100"))
+        self.NEO4J_ACQUIRE_TIMEOUT = float(os.getenv("NEO4J_ACQUIRE_TIMEOUT", "60"))
+        self.NEO4J_MAX_CONN_LIFETIME = float(
+            os.getenv("NEO4J_MAX_CONN_LIFETIME", "3600")
+        )
+        # Startup warmup: load the embedding model and probe every index
+        # before /health reports ready
+        self.WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").strip().lower() in {
+            "1",
+            "true",
+            "yes",
+        }
+        self.WARMUP_PROBES = int(os.getenv("WARMUP_PROBES", "8"))
+        self.WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "120"))
 
         self.validate()
 
@@ -124,6 +253,107 @@ class Settings:
             raise ValueError("Chat model not specified for selected provider")
         if self.EMBED_DIM <= 0:
             raise ValueError(f"EMBED_DIM must be positive, got {self.EMBED_DIM}")
+        if self.EMBED_BATCH_SIZE <= 0:
+            raise ValueError(
+                f"EMBED_BATCH_SIZE must be positive, got {self.EMBED_BATCH_SIZE}"
+            )
+        if self.HTTP_POOL_SIZE <= 0:
+            raise ValueError(f"HTTP_POOL_SIZE must be positive, got {self.HTTP_POOL_SIZE}")
+        if self.HTTP_RETRIES < 0:
+            raise ValueError(f"HTTP_RETRIES must be >= 0, got {self.HTTP_RETRIES}")
+        if self.EMBED_CACHE_MAX_MB <= 0:
+            raise ValueError(
+                f"EMBED_CACHE_MAX_MB must be positive, got {self.EMBED_CACHE_MAX_MB}"
+            )
+        if self.SEARCH_MODE not in {"flat", "hybrid", "hierarchical"}:
+            raise ValueError(
+                f"SEARCH_MODE must be flat, hybrid or hierarchical, got '{self.SEARCH_MODE}'"
+            )
+        for label, value in (
+            ("K_PROSE", self.K_PROSE),
+            ("K_LATEX", self.K_LATEX),
+            ("RRF_K", self.RRF_K),
+        ):
+            if value <= 0:
+                raise ValueError(f"{label} must be positive, got {value}")
+        for label, weight in (
+            ("K_BM25", self.K_BM25),
+            ("PROSE_QUERY_WEIGHT", self.PROSE_QUERY_WEIGHT),
+            ("LATEX_QUERY_WEIGHT", self.LATEX_QUERY_WEIGHT),
+            ("BM25_LATEX_WEIGHT", self.BM25_LATEX_WEIGHT),
+            ("MATHY_LATEX_BOOST", self.MATHY_LATEX_BOOST),
+        ):
+            if weight < 0:
+                raise ValueError(f"{label} must be >= 0, got {weight}")
+        if self.QUERY_CACHE_SIZE < 0:
+            raise ValueError(
+                f"QUERY_CACHE_SIZE must be >= 0, got {self.QUERY_CACHE_SIZE}"
+            )
+        if self.QUERY_CACHE_TTL <= 0:
+            raise ValueError(f"QUERY_CACHE_TTL must be positive, got {self.QUERY_CACHE_TTL}")
+        if self.VECTOR_BACKEND not in {"neo4j", "mmap"}:
+            raise ValueError(
+                f"VECTOR_BACKEND must be neo4j or mmap, got '{self.VECTOR_BACKEND}'"
+            )
+        for label, value in (
+            ("MMAP_IVF_MIN_ROWS", self.MMAP_IVF_MIN_ROWS),
+            ("MMAP_IVF_NPROBE", self.MMAP_IVF_NPROBE),
+        ):
+            if value <= 0:
+                raise ValueError(f"{label} must be positive, got {value}")
+        if self.FILTER_EXACT_MAX < 0:
+            raise ValueError(
+                f"FILTER_EXACT_MAX must be >= 0, got {self.FILTER_EXACT_MAX}"
+            )
+        if self.FILTER_MAX_POOL < max(self.K_PROSE, self.K_LATEX):
+            raise ValueError(
+                "FILTER_MAX_POOL must be >= K_PROSE and K_LATEX, "
+                f"got {self.FILTER_MAX_POOL}"
+            )
+        if self.SEARCH_BATCH_MAX <= 0:
+            raise ValueError(
+                f"SEARCH_BATCH_MAX must be positive, got {self.SEARCH_BATCH_MAX}"
+            )
+        if self.RESULT_CACHE_BACKEND not in {"memory", "sqlite", "none"}:
+            raise ValueError(
+                "RESULT_CACHE_BACKEND must be memory, sqlite or none, "
+                f"got '{self.RESULT_CACHE_BACKEND}'"
+            )
+        if self.RESULT_CACHE_SIZE < 0:
+            raise ValueError(
+                f"RESULT_CACHE_SIZE must be >= 0, got {self.RESULT_CACHE_SIZE}"
+            )
+        if self.RESULT_CACHE_TTL <= 0:
+            raise ValueError(
+                f"RESULT_CACHE_TTL must be positive, got {self.RESULT_CACHE_TTL}"
+            )
+        if self.RESULT_CACHE_GENERATION_POLL < 0:
+            raise ValueError(
+                "RESULT_CACHE_GENERATION_POLL must be >= 0, "
+                f"got {self.RESULT_CACHE_GENERATION_POLL}"
+            )
+        if not 0.0 < self.DEDUP_THRESHOLD <= 1.0:
+            raise ValueError(
+                f"DEDUP_THRESHOLD must be in (0, 1], got {self.DEDUP_THRESHOLD}"
+            )
+        if self.DEDUP_SHINGLE <= 0:
+            raise ValueError(f"DEDUP_SHINGLE must be positive, got {self.DEDUP_SHINGLE}")
+        for label, value in (
+            ("NEO4J_WRITERS", self.NEO4J_WRITERS),
+            ("NEO4J_TX_ROWS", self.NEO4J_TX_ROWS),
+            ("INGEST_BATCH_SIZE", self.INGEST_BATCH_SIZE),
+            ("INGEST_PARSE_WORKERS", self.INGEST_PARSE_WORKERS),
+            ("INGEST_EMBED_WORKERS", self.INGEST_EMBED_WORKERS),
+            ("INGEST_QUEUE_SIZE", self.INGEST_QUEUE_SIZE),
+            ("NEO4J_POOL_SIZE", self.NEO4J_POOL_SIZE),
+            ("NEO4J_ACQUIRE_TIMEOUT", self.NEO4J_ACQUIRE_TIMEOUT),
+            ("NEO4J_MAX_CONN_LIFETIME", self.NEO4J_MAX_CONN_LIFETIME),
+            ("WARMUP_PROBES", self.WARMUP_PROBES),
+            ("ANSWER_CONTEXT_TOKENS", self.ANSWER_CONTEXT_TOKENS),
+            ("WARMUP_TIMEOUT", self.WARMUP_TIMEOUT),
+        ):
+            if value <= 0:
+                raise ValueError(f"{label} must be positive, got {value}")
 
 
 # Singleton instance
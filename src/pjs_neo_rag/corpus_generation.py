@@ -0,0 +1,76 @@
+"""Corpus generation counter.
+
+Every write to the corpus (ingest, sync deletes, bulk import) bumps
+``generation`` on a single ``(:Snapshot {snapshot_id: 'corpus'})`` node.
+Readers such as the search result cache compare generations to know when
+cached answers are stale.
+
+The node also carries a random ``corpus_id``. Clearing or recreating the
+database (``create_neo_indexes --force``, a bulk import) drops the node, so
+the next ``corpus_id`` call (or generation bump) creates a new id; the
+incremental-ingest manifest uses it to notice that its entries no longer
+describe the graph. The generation restarts with the node, so readers that
+must tell the old database from the new one (the search result cache) key on
+``(corpus_id, generation)`` as returned by ``read_snapshot``.
+"""
+
+from __future__ import annotations
+
+CORPUS_SNAPSHOT_ID = "corpus"
+
+BUMP_GENERATION = """
+MERGE (s:Snapshot {snapshot_id:$snapshot_id})
+SET s.generation = coalesce(s.generation, 0) + 1,
+    s.updated_at = timestamp(),
+    s.corpus_id = coalesce(s.corpus_id, randomUUID())
+RETURN s.generation AS generation
+"""
+
+READ_GENERATION = """
+OPTIONAL MATCH (s:Snapshot {snapshot_id:$snapshot_id})
+RETURN coalesce(s.generation, 0) AS generation
+"""
+
+READ_SNAPSHOT = """
+OPTIONAL MATCH (s:Snapshot {snapshot_id:$snapshot_id})
+RETURN s.corpus_id AS corpus_id, coalesce(s.generation, 0) AS generation
+"""
+
+ENSURE_CORPUS_ID = """
+MERGE (s:Snapshot {snapshot_id:$snapshot_id})
+SET s.corpus_id = coalesce(s.corpus_id, randomUUID())
+RETURN s.corpus_id AS corpus_id
+"""
+
+
+def bump_generation(session) -> int:
+    """Increment the corpus generation; returns the new value."""
+    record = session.run(BUMP_GENERATION, snapshot_id=CORPUS_SNAPSHOT_ID).single()
+    return int(record["generation"]) if record else 0
+
+
+def read_generation(session) -> int:
+    record = session.run(READ_GENERATION, snapshot_id=CORPUS_SNAPSHOT_ID).single()
+    return int(record["generation"]) if record else 0
+
+
+def corpus_id(session) -> str:
+    """Identity of this database's corpus, created on first use."""
+    record = session.run(ENSURE_CORPUS_ID, snapshot_id=CORPUS_SNAPSHOT_ID).single()
+    return str(record["corpus_id"])
+
+
+def read_snapshot(session) -> tuple[str | None, int]:
+    """``(corpus_id, generation)``; ``(None, 0)`` before the first write."""
+    record = session.run(READ_SNAPSHOT, snapshot_id=CORPUS_SNAPSHOT_ID).single()
+    if record is None:
+        return None, 0
+    return record["corpus_id"], int(record["generation"])
+
+
+async def aread_snapshot(session) -> tuple[str | None, int]:
+    result = await session.run(READ_SNAPSHOT, snapshot_id=CORPUS_SNAPSHOT_ID)
+    record = await result.single()
+    if record is None:
+        return None, 0
+    return record["corpus_id"], int(record["generation"])
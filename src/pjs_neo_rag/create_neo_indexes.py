@@ -1,6 +1,7 @@
 from typing import LiteralString
 
 from pjs_neo_rag.config import settings
+from pjs_neo_rag.corpus_generation import corpus_id
 from pjs_neo_rag.neo4j_connection import get_driver, DB
 
 DIM = settings.EMBED_DIM
@@ -11,6 +12,9 @@ BTREE: list[LiteralString] = [
     "CREATE INDEX chunk_id IF NOT EXISTS FOR (c:Chunk)    ON (c.chunk_id)",
     "CREATE INDEX fact_id  IF NOT EXISTS FOR (f:Fact)     ON (f.fact_id)",
     "CREATE INDEX snap_id  IF NOT EXISTS FOR (s:Snapshot) ON (s.snapshot_id)",
+    # filtered search: chunks of one document, documents under a path prefix
+    "CREATE INDEX chunk_source IF NOT EXISTS FOR (c:Chunk)    ON (c.source_hash)",
+    "CREATE INDEX doc_path     IF NOT EXISTS FOR (d:Document) ON (d.path)",
 ]
 
 VECTORS: list[LiteralString] = [
@@ -26,6 +30,12 @@ VECTORS: list[LiteralString] = [
     FOR (c:Chunk) ON (c.vec_latex)
     OPTIONS {indexConfig: {`vector.dimensions`: $dim, `vector.similarity_function`: 'cosine'}}
     """,
+    # Section embeddings (mean of chunk vec_text) for coarse-to-fine search
+    """
+    CREATE VECTOR INDEX section_vec IF NOT EXISTS
+    FOR (s:Section) ON (s.embedding)
+    OPTIONS {indexConfig: {`vector.dimensions`: $dim, `vector.similarity_function`: 'cosine'}}
+    """,
     # Facts vector index (optional but recommended if you’ll bias facts)
     """
     CREATE VECTOR INDEX fact_vec IF NOT EXISTS
@@ -47,6 +57,7 @@ def drop_vector_indexes():
         with driver.session(database=DB) as s:
             s.run("DROP INDEX chunk_vec_text IF EXISTS")
             s.run("DROP INDEX chunk_vec_latex IF EXISTS")
+            s.run("DROP INDEX section_vec IF EXISTS")
             s.run("DROP INDEX fact_vec IF EXISTS")
             print(f"🗑️  Dropped vector indexes on database '{DB}'")
     finally:
@@ -59,6 +70,9 @@ def clear_all_data():
     try:
         with driver.session(database=DB) as s:
             s.run("MATCH (n) DETACH DELETE n")
+            # new corpus identity right away, so nothing cached for the old
+            # data (search results, manifest, dedup index) matches again
+            corpus_id(s)
             print(f"🗑️  Cleared all data from database '{DB}'")
     finally:
         driver.close()
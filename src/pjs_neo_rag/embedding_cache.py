@@ -0,0 +1,216 @@
+"""Persistent content-addressed embedding cache (SQLite).
+
+Vectors are keyed by (provider, model, dim, sha256(text)) and stored as
+float32 blobs, so re-ingesting a document, resuming after a crash or
+ingesting a duplicate PDF only pays for text that has not been embedded
+before. The database is size-bounded: once it grows past ``max_bytes`` the
+least recently used entries are evicted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from pjs_neo_rag.config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    provider  TEXT    NOT NULL,
+    model     TEXT    NOT NULL,
+    dim       INTEGER NOT NULL,
+    text_hash BLOB    NOT NULL,
+    vec       BLOB    NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (provider, model, dim, text_hash)
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# How many inserts between size checks, and the share of rows dropped per eviction
+_EVICT_CHECK_EVERY = 1000
+_EVICT_FRACTION = 0.1
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Thread-safe SQLite cache of normalized float32 embeddings."""
+
+    def __init__(
+        self, path: Path, provider: str, model: str, dim: int, max_bytes: int
+    ) -> None:
+        self.path = Path(path)
+        self.provider = provider
+        self.model = model
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._inserts_since_check = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        # WAL lets several ingest processes share one cache file
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors in input order (``None`` for misses)."""
+        hashes = [_text_hash(t) for t in texts]
+        found: dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for i in range(0, len(unique), 500):
+                part = unique[i : i + 500]
+                marks = ",".join("?" * len(part))
+                cur = self._conn.execute(
+                    "SELECT text_hash, vec FROM embeddings "
+                    "WHERE provider=? AND model=? AND dim=? "
+                    f"AND text_hash IN ({marks})",
+                    (self.provider, self.model, self.dim, *part),
+                )
+                for text_hash, blob in cur:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).copy()
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used=? "
+                    "WHERE provider=? AND model=? AND dim=? AND text_hash=?",
+                    [
+                        (now, self.provider, self.model, self.dim, h)
+                        for h in found
+                    ],
+                )
+                self._conn.commit()
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]) -> None:
+        """Store vectors for texts (overwrites existing entries)."""
+        if not texts:
+            return
+        now = time.time_ns()
+        rows = [
+            (
+                self.provider,
+                self.model,
+                self.dim,
+                _text_hash(text),
+                np.asarray(vector, dtype=np.float32).tobytes(),
+                now,
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(provider, model, dim, text_hash, vec, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._inserts_since_check += len(rows)
+            if self._inserts_since_check >= _EVICT_CHECK_EVERY:
+                self._inserts_since_check = 0
+                self._evict_locked()
+
+    def _used_bytes_locked(self) -> int:
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free) * page_size
+
+    def _evict_locked(self) -> None:
+        while self._used_bytes_locked() > self.max_bytes:
+            total = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+            if not total:
+                return
+            drop = max(1, int(total * _EVICT_FRACTION))
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (drop,),
+            )
+            self._conn.commit()
+            self.evictions += drop
+
+    def stats(self) -> dict[str, float | int | str]:
+        with self._lock:
+            entries = self._conn.execute("SELECT count(*) FROM embeddings").fetchone()[0]
+            used = self._used_bytes_locked()
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": used,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide cache, or ``None`` when EMBED_CACHE_PATH is empty."""
+    if not settings.EMBED_CACHE_PATH:
+        return None
+    return EmbeddingCache(
+        path=settings.EMBED_CACHE_PATH,
+        provider=settings.EMBED_PROVIDER,
+        model=settings.EMBED_MODEL,
+        dim=settings.EMBED_DIM,
+        max_bytes=settings.EMBED_CACHE_MAX_MB * 1024 * 1024,
+    )
+
+
+def format_stats(stats: dict[str, float | int | str]) -> str:
+    return (
+        f"embedding cache: {stats['entries']} entries, "
+        f"{int(stats['bytes']) / 1024 / 1024:.1f}/{int(stats['max_bytes']) / 1024 / 1024:.0f} MB, "
+        f"hits={stats['hits']} misses={stats['misses']} "
+        f"hit_rate={float(stats['hit_rate']):.1%} evictions={stats['evictions']}"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    cache = get_embedding_cache()
+    if cache is None:
+        print("Embedding cache disabled (EMBED_CACHE_PATH is empty)")
+        sys.exit(0)
+    if "--clear" in sys.argv:
+        cache.clear()
+        print(f"🗑️  Cleared embedding cache at {cache.path}")
+    print(format_stats(cache.stats()))
@@ -1,30 +1,171 @@
-"""Embedding helper using the configured AI provider."""
+"""Embedding helper using the configured AI provider.
+
+Vectors are L2-normalized float32 NumPy arrays: ``embed_vector`` returns a
+1-D array, ``embed_vectors`` a ``(len(texts), EMBED_DIM)`` matrix.
+
+The async variants run embedding-cache lookups and writes (SQLite) in a
+worker thread, so they never block the event loop.
+
+The persistent embedding cache is meant for ingestion, where chunk texts
+recur across runs. Search queries pass ``use_cache=False``: they already go
+through the in-process ``query_cache``, and a SQLite lookup (plus its LRU
+touch and commit) on every query would only add latency.
+"""
 
 from __future__ import annotations
 
-import math
-from typing import List
+import asyncio
+from typing import Sequence
+
+import numpy as np
 
 from pjs_neo_rag.ai_providers import get_embedding_provider
 from pjs_neo_rag.config import settings
+from pjs_neo_rag.embedding_cache import EmbeddingCache, get_embedding_cache
+from pjs_neo_rag.metrics import embed_call
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of ``matrix`` with every row L2-normalized."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _check_dim(matrix: np.ndarray) -> None:
+    dim = matrix.shape[-1] if matrix.ndim else 0
+    if dim != settings.EMBED_DIM:
+        raise ValueError(
+            f"Embedding dimension {dim} does not match expected {settings.EMBED_DIM}"
+        )
 
 
-def _normalize_vector(vec: List[float]) -> List[float]:
-    """Return an L2-normalized copy of the vector."""
-    norm = math.sqrt(sum(x * x for x in vec)) or 1.0
-    return [x / norm for x in vec]
+def _check_batch(batch: np.ndarray, expected: int) -> None:
+    """Reject short, long or non-matrix batches before they reach the cache."""
+    rows = batch.shape[0] if batch.ndim == 2 else 0
+    if rows != expected:
+        raise ValueError(
+            f"Embedding provider returned {rows} vectors for {expected} inputs"
+        )
+    _check_dim(batch)
 
 
-def embed_vector(text: str) -> List[float]:
+def embed_vector(text: str, use_cache: bool = True) -> np.ndarray:
     """Generate an embedding vector from the configured provider."""
+    clean_text = text if text and text.strip() else " "
+    cache = get_embedding_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get_many([clean_text])[0]
+        if cached is not None:
+            return cached
+
     provider = get_embedding_provider()
+    with embed_call(1):
+        vector = np.asarray(provider.embed(clean_text), dtype=np.float32)
+    _check_dim(vector)
+    vector = _normalize_rows(vector)
+
+    if cache is not None:
+        cache.put_many([clean_text], vector[np.newaxis, :])
+    return vector
+
+
+async def aembed_vector(text: str, use_cache: bool = True) -> np.ndarray:
+    """Async ``embed_vector`` (non-blocking provider call, same cache)."""
     clean_text = text if text and text.strip() else " "
+    cache = get_embedding_cache() if use_cache else None
+    if cache is not None:
+        cached = (await asyncio.to_thread(cache.get_many, [clean_text]))[0]
+        if cached is not None:
+            return cached
 
-    vector = provider.embed(clean_text)
+    provider = get_embedding_provider()
+    with embed_call(1):
+        vector = np.asarray(await provider.aembed(clean_text), dtype=np.float32)
+    _check_dim(vector)
+    vector = _normalize_rows(vector)
+
+    if cache is not None:
+        await asyncio.to_thread(cache.put_many, [clean_text], vector[np.newaxis, :])
+    return vector
+
+
+def _split_cached(
+    texts: Sequence[str], cache: EmbeddingCache | None
+) -> tuple[list[str], np.ndarray, list[np.ndarray | None], list[str]]:
+    """Clean ``texts``, fill cached rows; return the unique texts still missing."""
+    clean = [text if text and text.strip() else " " for text in texts]
+    out = np.empty((len(clean), settings.EMBED_DIM), dtype=np.float32)
+
+    cached = cache.get_many(clean) if cache is not None else [None] * len(clean)
+    for i, vector in enumerate(cached):
+        if vector is not None:
+            out[i] = vector
+    # Unique texts still missing, each embedded once
+    missing = list(dict.fromkeys(t for t, v in zip(clean, cached) if v is None))
+    return clean, out, cached, missing
 
-    if len(vector) != settings.EMBED_DIM:
-        raise ValueError(
-            f"Embedding dimension {len(vector)} does not match expected {settings.EMBED_DIM}"
-        )
 
-    return _normalize_vector(vector)
+def _merge_fresh(
+    cache: EmbeddingCache | None,
+    clean: list[str],
+    out: np.ndarray,
+    cached: list[np.ndarray | None],
+    missing: list[str],
+    fresh: np.ndarray,
+) -> np.ndarray:
+    if cache is not None:
+        cache.put_many(missing, fresh)
+    row = {text: j for j, text in enumerate(missing)}
+    for i, (text, vector) in enumerate(zip(clean, cached)):
+        if vector is None:
+            out[i] = fresh[row[text]]
+    return out
+
+
+def embed_vectors(
+    texts: Sequence[str], batch_size: int | None = None, use_cache: bool = True
+) -> np.ndarray:
+    """Embed many texts, sending at most ``batch_size`` texts per provider call.
+
+    Results are returned in input order and normalized like ``embed_vector``.
+    Texts found in the embedding cache (and repeats within ``texts``) are not
+    sent to the provider.
+    """
+    size = batch_size or settings.EMBED_BATCH_SIZE
+    cache = get_embedding_cache() if use_cache else None
+    clean, out, cached, missing = _split_cached(texts, cache)
+    if not missing:
+        return out
+    provider = get_embedding_provider()
+    fresh = np.empty((len(missing), settings.EMBED_DIM), dtype=np.float32)
+    for i in range(0, len(missing), size):
+        part = missing[i : i + size]
+        with embed_call(len(part)):
+            batch = np.asarray(provider.embed_batch(part), dtype=np.float32)
+        _check_batch(batch, len(part))
+        fresh[i : i + len(part)] = _normalize_rows(batch)
+    return _merge_fresh(cache, clean, out, cached, missing, fresh)
+
+
+async def aembed_vectors(
+    texts: Sequence[str], batch_size: int | None = None, use_cache: bool = True
+) -> np.ndarray:
+    """Async ``embed_vectors`` (non-blocking provider calls, same cache)."""
+    size = batch_size or settings.EMBED_BATCH_SIZE
+    cache = get_embedding_cache() if use_cache else None
+    clean, out, cached, missing = await asyncio.to_thread(_split_cached, texts, cache)
+    if not missing:
+        return out
+    provider = get_embedding_provider()
+    fresh = np.empty((len(missing), settings.EMBED_DIM), dtype=np.float32)
+    for i in range(0, len(missing), size):
+        part = missing[i : i + size]
+        with embed_call(len(part)):
+            batch = np.asarray(await provider.aembed_batch(part), dtype=np.float32)
+        _check_batch(batch, len(part))
+        fresh[i : i + len(part)] = _normalize_rows(batch)
+    return await asyncio.to_thread(
+        _merge_fresh, cache, clean, out, cached, missing, fresh
+    )
@@ -0,0 +1,400 @@
+"""Neo4j write path for ingested chunks.
+
+Each batch of chunk rows is split into documents, sections and chunks:
+
+- documents and sections are MERGEd once, the first time a batch mentions
+  them, synchronously in the caller's thread (concurrent MERGEs on the same
+  key could create duplicates, as those keys are indexed but not unique)
+- chunks are MERGEd in a separate UNWIND and their vectors set with
+  ``db.create.setNodeVectorProperty``, which stores them as float32 arrays
+  (half the size of a plain list-of-doubles property); these writes run as managed
+  ``execute_write`` transactions on ``NEO4J_WRITERS`` concurrent sessions,
+  or as one ``CALL {} IN TRANSACTIONS`` statement when NEO4J_CALL_IN_TX is on
+- ``mark_ingested`` stamps a Document with ``ingested_at`` and
+  ``chunk_count`` once all of its batches are written; re-ingesting clears
+  the stamp, so a document left partial by a failure is never taken for a
+  complete one (incremental ingest only skips stamped documents); Sections
+  of an earlier sectioning of the document, left without chunks, are deleted
+  at the same time, together with their section embeddings
+- closing the writer bumps the corpus generation (see corpus_generation) so
+  search result caches drop answers computed before this write
+- near-duplicate chunks (``canonical_id`` set) are written without vectors;
+  their DUPLICATE_OF links are MERGEd by ``flush`` once every batch is
+  written, so the canonical chunk is guaranteed to exist by then; new
+  canonical chunks enter the LSH index only once their batch is written
+- consecutive chunks of a document are chained with ``NEXT`` (rows carry
+  ``prev_id``); links inside a batch are written with its chunks, the one
+  reaching back into the previous batch (possibly still being written on
+  another session) is deferred to ``flush``; the chain of a document that is
+  already in the graph (re-ingested) is dropped before its first batch, so
+  chunks of an earlier chunking do not stay linked into the new one
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.metrics import ingest_items, ingest_stage
+from pjs_neo_rag.corpus_generation import bump_generation
+from pjs_neo_rag.near_dup import confirm_canonical, link_duplicates
+from pjs_neo_rag.neo4j_connection import DB
+
+UPSERT_DOCS = """
+UNWIND $docs AS r
+MERGE (d:Document {doc_id:r.doc_id})
+  ON CREATE SET d.title=r.title, d.path=r.path, d.page_count=r.page_count, d.added_at=timestamp()
+  ON MATCH  SET d.path=r.path, d.page_count=r.page_count, d.ingested_at=null
+"""
+
+MARK_INGESTED = """
+MATCH (d:Document {doc_id:$doc_id})
+SET d.chunk_count=$chunk_count, d.ingested_at=timestamp()
+"""
+
+# Once all of a document's chunks are written, its chunkless Sections are
+# left over from an earlier sectioning (chunks are moved off them, see below)
+PRUNE_SECTIONS = """
+MATCH (:Document {doc_id:$doc_id})-[:CONTAINS]->(s:Section)
+WHERE NOT (s)-[:CONTAINS]->(:Chunk)
+DETACH DELETE s
+"""
+
+# NEXT chain of documents being re-ingested; rebuilt by the chunk writes
+CLEAR_NEXT = """
+UNWIND $doc_ids AS id
+MATCH (:Document {doc_id:id})-[:CONTAINS]->(:Section)-[:CONTAINS]->(:Chunk)-[l:NEXT]->()
+DELETE l
+"""
+
+UPSERT_SECTIONS = """
+UNWIND $sections AS r
+MATCH (d:Document {doc_id:r.doc_id})
+MERGE (s:Section {sec_id:r.sec_id})
+SET s.title=r.title, s.level=r.level, s.page_start=r.page_start, s.page_end=r.page_end
+MERGE (d)-[:CONTAINS]->(s)
+"""
+
+# Body shared by the UNWIND and CALL {} IN TRANSACTIONS variants; expects `r`.
+_CHUNK_BODY = """
+MATCH (s:Section {sec_id:r.sec_id})
+MERGE (c:Chunk {chunk_id:r.chunk_id})
+SET  c.text_norm=r.text_norm,
+     c.latex_raw=r.latex_raw,
+     c.page_start=r.page_start,
+     c.page_end=r.page_end,
+     c.source_hash=r.doc_id,
+     c.content_hash=r.content_hash,
+     c.source_type='pdf',
+     c.added_at=coalesce(c.added_at, timestamp())
+MERGE (s)-[:CONTAINS]->(c)
+// prose-only chunks carry no LaTeX vector and near-duplicates no vectors
+// at all (drops any stale one)
+FOREACH (_ IN CASE WHEN r.vec_text IS NULL THEN [1] ELSE [] END | REMOVE c.vec_text)
+FOREACH (_ IN CASE WHEN r.vec_latex IS NULL THEN [1] ELSE [] END | REMOVE c.vec_latex)
+WITH s, c, r
+CALL (c, r) {
+  WITH c, r WHERE r.vec_text IS NOT NULL
+  CALL db.create.setNodeVectorProperty(c, 'vec_text', r.vec_text)
+}
+CALL (c, r) {
+  WITH c, r WHERE r.vec_latex IS NOT NULL
+  CALL db.create.setNodeVectorProperty(c, 'vec_latex', r.vec_latex)
+}
+WITH s, c
+// DUPLICATE_OF links are (re)written after all chunk batches, see flush()
+OPTIONAL MATCH (c)-[dup:DUPLICATE_OF]->()
+DELETE dup
+WITH DISTINCT s, c
+// drop links left by an earlier sectioning of the same document
+OPTIONAL MATCH (old:Section)-[stale:CONTAINS]->(c)
+WHERE old <> s
+DELETE stale
+"""
+
+UPSERT_CHUNKS = "UNWIND $chunks AS r\n" + _CHUNK_BODY
+
+UPSERT_CHUNKS_IN_TX = (
+    "UNWIND $chunks AS r\nCALL (r) {\n"
+    + _CHUNK_BODY
+    + "\n} IN TRANSACTIONS OF $tx_rows ROWS"
+)
+
+# Section-level embedding = normalized mean of its chunks' vec_text
+SET_SECTION_VECTORS = """
+UNWIND $rows AS r
+MATCH (s:Section {sec_id:r.sec_id})
+CALL db.create.setNodeVectorProperty(s, 'embedding', r.embedding)
+"""
+
+LINK_NEXT = """
+UNWIND $pairs AS r
+MATCH (a:Chunk {chunk_id:r.prev_id}), (b:Chunk {chunk_id:r.chunk_id})
+// drop links left by an earlier chunking of the same document
+OPTIONAL MATCH (a)-[old:NEXT]->(x)
+WHERE x <> b
+DELETE old
+WITH DISTINCT a, b
+MERGE (a)-[:NEXT]->(b)
+"""
+
+_CHUNK_FIELDS = (
+    "doc_id",
+    "sec_id",
+    "chunk_id",
+    "text_norm",
+    "latex_raw",
+    "content_hash",
+    "page_start",
+    "page_end",
+    "vec_text",
+    "vec_latex",
+    "canonical_id",
+)
+
+
+def _write_chunks(
+    tx, chunks: list[dict[str, Any]], pairs: list[dict[str, str]]
+) -> None:
+    tx.run(UPSERT_CHUNKS, chunks=chunks).consume()
+    if pairs:
+        tx.run(LINK_NEXT, pairs=pairs).consume()
+
+
+def _link_next(tx, pairs: list[dict[str, str]]) -> None:
+    tx.run(LINK_NEXT, pairs=pairs).consume()
+
+
+def _write_section_vectors(tx, rows: list[dict[str, Any]]) -> None:
+    tx.run(SET_SECTION_VECTORS, rows=rows).consume()
+
+
+def _mark_ingested(tx, doc_id: str, chunk_count: int) -> None:
+    tx.run(PRUNE_SECTIONS, doc_id=doc_id).consume()
+    tx.run(MARK_INGESTED, doc_id=doc_id, chunk_count=chunk_count).consume()
+
+
+class GraphWriter:
+    """Writes embedded chunk rows to Neo4j, optionally on several sessions.
+
+    ``write_rows``/``write_section_vectors`` return futures; ``close`` (or
+    leaving the ``with`` block) waits for all of them and re-raises the first
+    failure. At most ``2 * concurrency`` writes are in flight, which bounds
+    the memory held by queued batches.
+    """
+
+    def __init__(
+        self,
+        driver,
+        concurrency: int = settings.NEO4J_WRITERS,
+        call_in_tx: bool = settings.NEO4J_CALL_IN_TX,
+        tx_rows: int = settings.NEO4J_TX_ROWS,
+        database: str = DB,
+    ) -> None:
+        self.driver = driver
+        self.database = database
+        self.call_in_tx = call_in_tx
+        self.tx_rows = tx_rows
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, concurrency), thread_name_prefix="neo4j-writer"
+        )
+        self._slots = threading.BoundedSemaphore(2 * max(1, concurrency))
+        self._futures: list[Future] = []
+        self._docs_seen: set[str] = set()
+        self._sections_seen: set[str] = set()
+        self._links: list[dict[str, str]] = []
+        self._next: list[dict[str, str]] = []
+        self._failed_ids: set[str] = set()
+        self._links_lock = threading.Lock()
+        self._dirty = False
+
+    # ---- documents / sections (synchronous) ----
+    def _ensure_parents(self, rows: list[dict[str, Any]]) -> None:
+        docs: dict[str, dict[str, Any]] = {}
+        sections: dict[str, dict[str, Any]] = {}
+        for r in rows:
+            if r["doc_id"] not in self._docs_seen:
+                docs.setdefault(
+                    r["doc_id"],
+                    {
+                        "doc_id": r["doc_id"],
+                        "title": r["title"],
+                        "path": r["path"],
+                        "page_count": r["page_count"],
+                    },
+                )
+            if r["sec_id"] not in self._sections_seen:
+                sections.setdefault(
+                    r["sec_id"],
+                    {
+                        "doc_id": r["doc_id"],
+                        "sec_id": r["sec_id"],
+                        "title": r["section"],
+                        "level": r["sec_level"],
+                        "page_start": r["sec_page_start"],
+                        "page_end": r["sec_page_end"],
+                    },
+                )
+        if not docs and not sections:
+            return
+
+        def work(tx) -> None:
+            if docs:
+                tx.run(CLEAR_NEXT, doc_ids=list(docs)).consume()
+                tx.run(UPSERT_DOCS, docs=list(docs.values())).consume()
+            if sections:
+                tx.run(UPSERT_SECTIONS, sections=list(sections.values())).consume()
+
+        with self.driver.session(database=self.database) as s:
+            s.execute_write(work)
+        self._docs_seen.update(docs)
+        self._sections_seen.update(sections)
+
+    # ---- chunks / vectors (concurrent) ----
+    def _submit(self, fn, *args) -> Future:
+        self._slots.acquire()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        # keep pending and failed futures only; flush() reports the failures
+        self._futures = [
+            f for f in self._futures if not f.done() or f.exception() is not None
+        ]
+        self._futures.append(future)
+        return future
+
+    def _run_chunks(
+        self, chunks: list[dict[str, Any]], pairs: list[dict[str, str]]
+    ) -> None:
+        canonical = [c["chunk_id"] for c in chunks if not c["canonical_id"]]
+        try:
+            with ingest_stage("upsert"):
+                with self.driver.session(database=self.database) as s:
+                    if self.call_in_tx:
+                        s.run(
+                            UPSERT_CHUNKS_IN_TX, chunks=chunks, tx_rows=self.tx_rows
+                        ).consume()
+                        if pairs:
+                            s.execute_write(_link_next, pairs)
+                    else:
+                        s.execute_write(_write_chunks, chunks, pairs)
+        except Exception:
+            # recorded before the future completes, so flush() sees it
+            with self._links_lock:
+                self._failed_ids.update(c["chunk_id"] for c in chunks)
+            confirm_canonical(canonical, written=False)
+            raise
+        confirm_canonical(canonical)
+        ingest_items("upsert", len(chunks))
+
+    def _run_section_vectors(self, rows: list[dict[str, Any]]) -> None:
+        with self.driver.session(database=self.database) as s:
+            s.execute_write(_write_section_vectors, rows)
+
+    def write_rows(self, rows: list[dict[str, Any]]) -> Future | None:
+        """Upsert embedded chunk rows (as produced by ``embed_rows``)."""
+        if not rows:
+            return None
+        self._dirty = True
+        chunks = [{k: r.get(k) for k in _CHUNK_FIELDS} for r in rows]
+        try:
+            self._ensure_parents(rows)
+        except Exception:
+            confirm_canonical(
+                [c["chunk_id"] for c in chunks if not c["canonical_id"]], written=False
+            )
+            raise
+        links = [
+            {"chunk_id": c["chunk_id"], "canonical_id": c["canonical_id"]}
+            for c in chunks
+            if c["canonical_id"]
+        ]
+        ids = {c["chunk_id"] for c in chunks}
+        pairs = [
+            {"prev_id": r["prev_id"], "chunk_id": r["chunk_id"]}
+            for r in rows
+            if r.get("prev_id")
+        ]
+        deferred = [p for p in pairs if p["prev_id"] not in ids]
+        if links or deferred:
+            with self._links_lock:
+                self._links.extend(links)
+                self._next.extend(deferred)
+        return self._submit(
+            self._run_chunks, chunks, [p for p in pairs if p["prev_id"] in ids]
+        )
+
+    def write_section_vectors(self, rows: list[dict[str, Any]]) -> Future | None:
+        """Set section embeddings produced by ``SectionCentroids``."""
+        if not rows:
+            return None
+        return self._submit(self._run_section_vectors, rows)
+
+    def flush(self) -> None:
+        """Wait for every submitted write and re-raise the first failure.
+
+        The pending DUPLICATE_OF and cross-batch NEXT links are written
+        first, except those touching a chunk whose batch failed, so a failed
+        batch does not cost the rest of the run its links.
+        """
+        futures, self._futures = self._futures, []
+        wait(futures)
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        with self._links_lock:
+            failed, self._failed_ids = self._failed_ids, set()
+            links = [x for x in self._links if x["chunk_id"] not in failed]
+            pairs = [
+                p
+                for p in self._next
+                if p["chunk_id"] not in failed and p["prev_id"] not in failed
+            ]
+            self._links, self._next = [], []
+        try:
+            if links or pairs:
+                with self.driver.session(database=self.database) as s:
+                    if pairs:
+                        s.execute_write(_link_next, pairs)
+                    if links:
+                        link_duplicates(s, links)
+        finally:
+            if errors:
+                raise errors[0]
+
+    def mark_ingested(self, doc_id: str, chunk_count: int) -> None:
+        """Stamp a document as complete and drop its stale Sections.
+
+        Call once all of the document's writes have succeeded.
+        """
+        with self.driver.session(database=self.database) as s:
+            s.execute_write(_mark_ingested, doc_id, chunk_count)
+
+    def _bump_generation(self) -> None:
+        if not self._dirty:
+            return
+        with self.driver.session(database=self.database) as s:
+            bump_generation(s)
+        self._dirty = False
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            try:
+                self._pool.shutdown(wait=True)
+            finally:
+                self._bump_generation()  # batches written before a failure are live
+
+    def __enter__(self) -> "GraphWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # Already failing: let queued writes finish but keep the original error
+        self._pool.shutdown(wait=True)
+        try:
+            self._bump_generation()  # batches written before the failure are live
+        except Exception:
+            pass
@@ -0,0 +1,291 @@
+"""Shared HTTP transport for the AI providers.
+
+One ``HttpTransport`` per base URL keeps a keep-alive connection pool,
+applies per-call timeouts, retries idempotent calls (embeddings) with
+exponential backoff and trips a circuit breaker when a backend keeps
+failing. ``apost_json`` is the async equivalent for the FastAPI path, and
+``astream_lines`` reads streaming (token-by-token) responses.
+
+Errors surface as ``requests`` exceptions from both the sync and async
+paths, so providers handle them in one place.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, AsyncIterator
+
+import httpx
+import requests
+from requests import RequestException
+from requests.adapters import HTTPAdapter
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.metrics import HTTP_IN_FLIGHT
+
+# Status codes worth retrying for idempotent calls
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RequestException):
+    """Raised without contacting the backend while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open)."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    def allow(self) -> bool:
+        """Return False while open; after ``reset_seconds`` let a trial call through."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                # half-open: re-arm the timer so only one trial goes through
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def _requests_error(exc: httpx.HTTPError) -> RequestException:
+    """Translate an httpx error into the equivalent requests exception."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        response = requests.Response()
+        response.status_code = exc.response.status_code
+        response.url = str(exc.request.url)
+        response._content = exc.response.content
+        return requests.HTTPError(str(exc), response=response)
+    if isinstance(exc, httpx.TimeoutException):
+        return requests.Timeout(str(exc))
+    return requests.ConnectionError(str(exc))
+
+
+class HttpTransport:
+    """Pooled, retrying JSON-over-HTTP client bound to one base URL."""
+
+    def __init__(
+        self,
+        base_url: str,
+        pool_size: int = settings.HTTP_POOL_SIZE,
+        connect_timeout: float = settings.HTTP_CONNECT_TIMEOUT,
+        retries: int = settings.HTTP_RETRIES,
+        backoff: float = settings.HTTP_BACKOFF,
+        breaker: CircuitBreaker | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker(
+            settings.HTTP_CIRCUIT_FAILURES, settings.HTTP_CIRCUIT_RESET
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._async_client: httpx.AsyncClient | None = None
+        self._in_flight = HTTP_IN_FLIGHT.labels(base_url=self.base_url)
+
+    # ---- helpers ----
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2**attempt) * (0.5 + random.random() / 2)
+
+    def _check_circuit(self) -> None:
+        if not self.breaker.allow():
+            raise CircuitOpenError(
+                f"Circuit open for {self.base_url} after repeated failures; "
+                f"retrying in up to {self.breaker.reset_seconds:.0f}s"
+            )
+
+    # ---- sync ----
+    def post_json(
+        self,
+        path: str,
+        payload: dict[str, Any],
+        timeout: float = 60,
+        idempotent: bool = False,
+        stream: bool = False,
+    ) -> requests.Response:
+        """POST JSON and return the response (raises for HTTP errors).
+
+        Idempotent calls are retried on connection errors, timeouts and
+        RETRY_STATUSES with exponential backoff and jitter.
+        """
+        self._check_circuit()
+        with self._in_flight.track_inprogress():
+            attempts = 1 + (self.retries if idempotent else 0)
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                try:
+                    response = self.session.post(
+                        f"{self.base_url}{path}",
+                        json=payload,
+                        timeout=(self.connect_timeout, timeout),
+                        stream=stream,
+                    )
+                    if response.status_code in RETRY_STATUSES and not last:
+                        response.close()
+                        time.sleep(self._delay(attempt))
+                        continue
+                    response.raise_for_status()
+                except requests.HTTPError as exc:
+                    status = exc.response.status_code if exc.response is not None else 0
+                    if status >= 500:
+                        self.breaker.record_failure()
+                    raise
+                except (requests.ConnectionError, requests.Timeout):
+                    if last:
+                        self.breaker.record_failure()
+                        raise
+                    time.sleep(self._delay(attempt))
+                    continue
+                self.breaker.record_success()
+                return response
+            raise AssertionError("unreachable")  # pragma: no cover
+
+    # ---- async ----
+    def _client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+        return self._async_client
+
+    async def apost_json(
+        self,
+        path: str,
+        payload: dict[str, Any],
+        timeout: float = 60,
+        idempotent: bool = False,
+    ) -> httpx.Response:
+        """Async ``post_json``; errors are raised as ``requests`` exceptions."""
+        self._check_circuit()
+        with self._in_flight.track_inprogress():
+            client = self._client()
+            attempts = 1 + (self.retries if idempotent else 0)
+            for attempt in range(attempts):
+                last = attempt == attempts - 1
+                try:
+                    response = await client.post(
+                        path,
+                        json=payload,
+                        timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+                    )
+                    if response.status_code in RETRY_STATUSES and not last:
+                        await asyncio.sleep(self._delay(attempt))
+                        continue
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as exc:
+                    if exc.response.status_code >= 500:
+                        self.breaker.record_failure()
+                    raise _requests_error(exc) from exc
+                except httpx.TransportError as exc:
+                    if last:
+                        self.breaker.record_failure()
+                        raise _requests_error(exc) from exc
+                    await asyncio.sleep(self._delay(attempt))
+                    continue
+                self.breaker.record_success()
+                return response
+            raise AssertionError("unreachable")  # pragma: no cover
+
+    async def astream_lines(
+        self, path: str, payload: dict[str, Any], timeout: float = 120
+    ) -> AsyncIterator[str]:
+        """POST JSON and yield the non-empty lines of the response as they arrive.
+
+        Never retried (generation is not idempotent); ``timeout`` applies to
+        each read, not to the whole stream.
+        """
+        self._check_circuit()
+        with self._in_flight.track_inprogress():
+            try:
+                async with self._client().stream(
+                    "POST",
+                    path,
+                    json=payload,
+                    timeout=httpx.Timeout(timeout, connect=self.connect_timeout),
+                ) as response:
+                    if response.is_error:
+                        await response.aread()
+                        response.raise_for_status()
+                    self.breaker.record_success()
+                    async for line in response.aiter_lines():
+                        if line:
+                            yield line
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code >= 500:
+                    self.breaker.record_failure()
+                raise _requests_error(exc) from exc
+            except httpx.TransportError as exc:
+                self.breaker.record_failure()
+                raise _requests_error(exc) from exc
+
+    def close(self) -> None:
+        self.session.close()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+_transports: dict[str, HttpTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url: str) -> HttpTransport:
+    """Return the shared transport for ``base_url`` (one pool per backend)."""
+    with _transports_lock:
+        transport = _transports.get(base_url)
+        if transport is None:
+            transport = _transports[base_url] = HttpTransport(base_url)
+        return transport
+
+
+async def aclose_transports() -> None:
+    """Close the pools of every shared transport (API shutdown).
+
+    Transports stay registered: providers keep their reference, and the
+    pools are reopened on next use.
+    """
+    with _transports_lock:
+        transports = list(_transports.values())
+    for transport in transports:
+        await transport.aclose()
+        transport.close()
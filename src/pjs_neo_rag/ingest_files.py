@@ -1,25 +1,495 @@
 """Batch ingest all PDFs from SOURCE_DIR."""
 
+import argparse
 import glob
+import multiprocessing
+import os
+import queue
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
 from pjs_neo_rag.config import settings
-from pjs_neo_rag.ingest_pdf import ingest_pdf
+from pjs_neo_rag.corpus_generation import bump_generation, corpus_id
 from pjs_neo_rag.create_neo_indexes import run as create_indexes
+from pjs_neo_rag.embedding_cache import format_stats, get_embedding_cache
+from pjs_neo_rag.graph_writer import GraphWriter
+from pjs_neo_rag.ingest_manifest import IngestManifest
+from pjs_neo_rag.ingest_pdf import (
+    SectionCentroids,
+    embed_rows,
+    extract_chunks,
+    file_doc_id,
+    ingest_pdf,
+)
+from pjs_neo_rag.metrics import serve as serve_metrics
+from pjs_neo_rag.near_dup import (
+    bind_dedup_index,
+    confirm_canonical,
+    format_stats as format_dedup_stats,
+    get_dedup_index,
+    mark_duplicates,
+    release_documents,
+)
+from pjs_neo_rag.neo4j_connection import DB, get_driver
+
+_DONE = object()
+
+# Only documents whose ingest completed: a failure midway leaves a partial
+# Document without ``ingested_at`` (see GraphWriter.mark_ingested)
+EXISTING_DOCS = """
+UNWIND $doc_ids AS id
+MATCH (d:Document {doc_id:id})
+WHERE d.ingested_at IS NOT NULL
+RETURN d.doc_id AS doc_id
+"""
+
+UPDATE_PATHS = """
+UNWIND $rows AS r
+MATCH (d:Document {doc_id:r.doc_id})
+SET d.path=r.path
+"""
+
+DOCS_UNDER = """
+MATCH (d:Document)
+WHERE d.path STARTS WITH $root
+RETURN d.doc_id AS doc_id, d.path AS path
+"""
+
+# Chunks, then sections, then documents; each in batched inner transactions
+# so deleting a large document never builds one huge transaction.
+DELETE_DOC_CHUNKS = """
+UNWIND $doc_ids AS id
+MATCH (:Document {doc_id:id})-[:CONTAINS]->(:Section)-[:CONTAINS]->(c:Chunk)
+CALL (c) { DETACH DELETE c } IN TRANSACTIONS OF $tx_rows ROWS
+"""
+
+DELETE_DOC_SECTIONS = """
+UNWIND $doc_ids AS id
+MATCH (:Document {doc_id:id})-[:CONTAINS]->(s:Section)
+CALL (s) { DETACH DELETE s } IN TRANSACTIONS OF $tx_rows ROWS
+"""
+
+DELETE_DOCS = """
+UNWIND $doc_ids AS id
+MATCH (d:Document {doc_id:id})
+CALL (d) { DETACH DELETE d } IN TRANSACTIONS OF $tx_rows ROWS
+"""
+
+
+def ingest_sequential(files: list[str]) -> dict[str, str]:
+    """Ingest one file at a time (parse, embed, upsert).
+
+    Returns ``{path: doc_id}`` for the files that were ingested.
+    """
+    ingested: dict[str, str] = {}
+    for f in files:
+        try:
+            ingested[f] = ingest_pdf(f)
+        except Exception as e:
+            print(f"[WARN] {f}: {e}")
+    return ingested
+
+
+def _release_canonical(rows: list[dict]) -> None:
+    """Drop the pending LSH entries of rows that will never be written."""
+    confirm_canonical([str(r["chunk_id"]) for r in rows], written=False)
+
+
+def ingest_pipelined(
+    files: list[str],
+    parse_workers: int = settings.INGEST_PARSE_WORKERS,
+    embed_workers: int = settings.INGEST_EMBED_WORKERS,
+    queue_size: int = settings.INGEST_QUEUE_SIZE,
+) -> dict[str, str]:
+    """Ingest files with overlapping parse, embed and write stages.
+
+    - parse:  ``extract_chunks`` in a process pool (PyMuPDF + chunking)
+    - embed:  ``embed_workers`` threads, INGEST_BATCH_SIZE chunks per batch
+    - write:  a writer thread feeding a ``GraphWriter`` (NEO4J_WRITERS sessions)
+
+    Stages are connected by queues bounded to ``queue_size`` entries, so
+    parsed documents and embedded batches never pile up in memory.
+
+    Returns ``{path: doc_id}`` for the files that were ingested.
+    """
+    parse_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    write_q: queue.Queue = queue.Queue(maxsize=queue_size)
+    failed: set[str] = set()
+    ingested: dict[str, str] = {}
+    failed_lock = threading.Lock()
+
+    def fail(path: str, exc: BaseException) -> None:
+        with failed_lock:
+            if path in failed:
+                return
+            failed.add(path)
+        print(f"[WARN] {path}: {exc}")
+
+    def feed(pool: ProcessPoolExecutor) -> None:
+        for f in files:
+            parse_q.put((f, pool.submit(extract_chunks, f)))
+        for _ in range(embed_workers):
+            parse_q.put(_DONE)
+
+    def embed_worker() -> None:
+        while True:
+            item = parse_q.get()
+            if item is _DONE:
+                return
+            path, future = item
+            rows = []
+            try:
+                doc_id, page_count, rows = future.result()
+                latex_memo: dict[str, np.ndarray] = {}
+                centroids = SectionCentroids()
+                for i in range(0, len(rows), settings.INGEST_BATCH_SIZE):
+                    batch = rows[i : i + settings.INGEST_BATCH_SIZE]
+                    mark_duplicates(batch)
+                    embed_rows(batch, latex_memo)
+                    write_q.put(("rows", path, batch))
+                    write_q.put(("sections", path, centroids.add(batch)))
+                write_q.put(("sections", path, centroids.finish()))
+            except Exception as e:
+                fail(path, e)
+                # batches still queued for this file will not be written
+                _release_canonical(rows)
+                continue
+            write_q.put(("done", path, (doc_id, page_count, len(rows))))
+
+    def writer() -> None:
+        pending: dict[str, list] = {}
+        driver = get_driver()
+        graph = GraphWriter(driver)
+        try:
+            while True:
+                item = write_q.get()
+                if item is _DONE:
+                    return
+                kind, path, payload = item
+                if path in failed:
+                    if kind == "done":
+                        pending.pop(path, None)
+                    elif kind == "rows":
+                        _release_canonical(payload)
+                    continue
+                if kind == "done":
+                    # wait for this file's in-flight writes before reporting it
+                    futures = pending.pop(path, [])
+                    wait(futures)
+                    errors = [f.exception() for f in futures if f.exception()]
+                    if errors:
+                        fail(path, errors[0])
+                        continue
+                    doc_id, page_count, n_chunks = payload
+                    try:
+                        graph.mark_ingested(doc_id, n_chunks)
+                    except Exception as e:
+                        fail(path, e)
+                        continue
+                    ingested[path] = doc_id
+                    print(f"✅ Ingested: {path}  pages={page_count}  chunks={n_chunks}")
+                    continue
+                try:
+                    if kind == "sections":
+                        future = graph.write_section_vectors(payload)
+                    else:
+                        future = graph.write_rows(payload)
+                except Exception as e:
+                    fail(path, e)
+                    continue
+                if future is not None:
+                    pending.setdefault(path, []).append(future)
+        finally:
+            try:
+                graph.close()
+            except Exception as e:
+                # per-file failures were reported above; the links of the
+                # batches that did commit are written before this is raised
+                print(f"[WARN] final graph writes failed: {e}")
+            driver.close()
+
+    # spawn: the feeder submits from a thread, and forking a threaded
+    # process is unsafe.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=parse_workers, mp_context=ctx) as pool:
+        write_thread = threading.Thread(target=writer, name="ingest-writer")
+        write_thread.start()
+        embed_threads = [
+            threading.Thread(target=embed_worker, name=f"ingest-embed-{i}")
+            for i in range(embed_workers)
+        ]
+        for t in embed_threads:
+            t.start()
+        feed(pool)
+        for t in embed_threads:
+            t.join()
+        write_q.put(_DONE)
+        write_thread.join()
+
+    print(f"\nPipelined ingest finished: {len(ingested)}/{len(files)} files ingested")
+    return ingested
+
+
+def bind_manifest(manifest: IngestManifest) -> None:
+    """Reset ``manifest`` if the database was cleared since it was written."""
+    driver = get_driver()
+    try:
+        with driver.session(database=DB) as s:
+            manifest.bind(corpus_id(s))
+    finally:
+        driver.close()
+
+
+def bind_dedup() -> None:
+    """Reset the near-duplicate index if the database was cleared since."""
+    driver = get_driver()
+    try:
+        with driver.session(database=DB) as s:
+            bind_dedup_index(s)
+    finally:
+        driver.close()
+
+
+def plan_incremental(files: list[str], manifest: IngestManifest) -> list[str]:
+    """Return the files that still need a full ingest.
+
+    Files whose size/mtime match the manifest are skipped without being read.
+    Changed or unknown files are hashed; if their doc_id already exists as a
+    completely ingested Document only its path is updated. ``manifest`` is
+    updated in place.
+    """
+    candidates: dict[str, tuple[os.stat_result, str]] = {}
+    unchanged = 0
+    for f in files:
+        try:
+            st = os.stat(f)
+            if manifest.is_unchanged(f, st):
+                unchanged += 1
+                continue
+            candidates[f] = (st, file_doc_id(f))
+        except OSError as e:
+            print(f"[WARN] {f}: {e}")
 
-# Step 1: Ensure indexes exist
-print("Step 1: Ensuring indexes...")
-create_indexes(force_recreate=False)
+    existing: set[str] = set()
+    if candidates:
+        driver = get_driver()
+        try:
+            with driver.session(database=DB) as s:
+                doc_ids = sorted({doc_id for _, doc_id in candidates.values()})
+                result = s.run(EXISTING_DOCS, doc_ids=doc_ids)
+                existing = {record["doc_id"] for record in result}
+                moved = [
+                    {"doc_id": doc_id, "path": f}
+                    for f, (_, doc_id) in candidates.items()
+                    if doc_id in existing
+                ]
+                if moved:
+                    s.run(UPDATE_PATHS, rows=moved)
+        finally:
+            driver.close()
 
-# Step 2: Ingest PDFs
-print(f"\nStep 2: Ingesting PDFs from {settings.SOURCE_DIR}...")
-SOURCE_DIR = settings.SOURCE_DIR
-files = sorted(glob.glob(str(SOURCE_DIR / "**/*.pdf"), recursive=True))
-if not files:
-    print(f"No PDFs found under {SOURCE_DIR}")
-    sys.exit(0)
+    to_ingest: list[str] = []
+    scheduled: set[str] = set()
+    for f, (st, doc_id) in candidates.items():
+        if doc_id in existing:
+            # Known content (renamed, touched or duplicate file)
+            manifest.record(f, st, doc_id)
+            continue
+        if doc_id in scheduled:
+            # Same bytes as another new file; picked up as "existing" next run
+            continue
+        scheduled.add(doc_id)
+        to_ingest.append(f)
 
-for f in files:
+    relinked = len(candidates) - len(to_ingest)
+    print(
+        f"Incremental: {unchanged} unchanged, {relinked} already indexed, "
+        f"{len(to_ingest)} to ingest"
+    )
+    return to_ingest
+
+
+def sync_corpus(
+    files: list[str],
+    ingested: dict[str, str],
+    todo: list[str],
+    manifest: IngestManifest | None,
+    root: str,
+    tx_rows: int = settings.NEO4J_TX_ROWS,
+) -> list[str]:
+    """Delete Documents under ``root`` that no current file resolves to.
+
+    A Document is stale when its content is no longer produced by any file:
+    the PDF was edited (superseded doc_id) or removed. Files that failed to
+    ingest in this run keep their previously indexed version. Runs after
+    ingest so replacements are searchable before old versions disappear.
+    Returns the deleted doc_ids.
+    """
+    live: set[str] = set(ingested.values())
+    keep_paths: set[str] = set()
+    pending = set(todo)
+    for f in files:
+        if f in ingested:
+            continue
+        entry = manifest.entries.get(f) if manifest is not None else None
+        if entry is not None and f not in pending:
+            live.add(entry.doc_id)
+        elif f in pending:
+            keep_paths.add(f)
+        else:
+            # not scheduled (duplicate content); resolve by hash
+            try:
+                live.add(file_doc_id(f))
+            except OSError as e:
+                print(f"[WARN] {f}: {e}")
+                keep_paths.add(f)
+
+    prefix = root.rstrip(os.sep) + os.sep
+    driver = get_driver()
     try:
-        ingest_pdf(f)
-    except Exception as e:
-        print(f"[WARN] {f}: {e}")
+        with driver.session(database=DB) as s:
+            indexed = s.run(DOCS_UNDER, root=prefix).data()
+            stale = sorted(
+                {
+                    r["doc_id"]
+                    for r in indexed
+                    if r["doc_id"] not in live and r["path"] not in keep_paths
+                }
+            )
+            if stale:
+                # duplicates elsewhere that point into stale docs get vectors
+                release_documents(s, stale)
+                # CALL {} IN TRANSACTIONS needs an auto-commit transaction
+                for query in (DELETE_DOC_CHUNKS, DELETE_DOC_SECTIONS, DELETE_DOCS):
+                    s.run(query, doc_ids=stale, tx_rows=tx_rows).consume()
+                bump_generation(s)
+    finally:
+        driver.close()
+
+    if manifest is not None:
+        current = set(files)
+        for f in [p for p in manifest.entries if p.startswith(prefix)]:
+            if f not in current:
+                manifest.forget(f)
+
+    print(f"Sync: {len(stale)} stale documents removed")
+    return stale
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="overlap PDF parsing, embedding and Neo4j writes across files",
+    )
+    parser.add_argument(
+        "--parse-workers", type=int, default=settings.INGEST_PARSE_WORKERS
+    )
+    parser.add_argument(
+        "--embed-workers", type=int, default=settings.INGEST_EMBED_WORKERS
+    )
+    parser.add_argument("--queue-size", type=int, default=settings.INGEST_QUEUE_SIZE)
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"skip files unchanged since the last run (manifest: {settings.INGEST_MANIFEST})",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="after ingesting, delete Documents under SOURCE_DIR whose file was "
+        "edited or removed",
+    )
+    parser.add_argument(
+        "--allow-empty-sync",
+        action="store_true",
+        help="let --sync run when no PDFs are found, deleting every Document "
+        "under SOURCE_DIR",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=0,
+        help="serve Prometheus metrics on this port during the run (set "
+        "PROMETHEUS_MULTIPROC_DIR to include --pipeline parse workers)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+        print(f"Metrics on http://0.0.0.0:{args.metrics_port}/metrics")
+
+    # Step 1: Ensure indexes exist
+    print("Step 1: Ensuring indexes...")
+    create_indexes(force_recreate=False)
+
+    # Step 2: Ingest PDFs
+    print(f"\nStep 2: Ingesting PDFs from {settings.SOURCE_DIR}...")
+    SOURCE_DIR = settings.SOURCE_DIR
+    files = sorted(glob.glob(str(SOURCE_DIR / "**/*.pdf"), recursive=True))
+    if not files:
+        print(f"No PDFs found under {SOURCE_DIR}")
+        if not args.sync:
+            sys.exit(0)
+        # an unmounted or mistyped SOURCE_DIR must not wipe the corpus
+        if not args.allow_empty_sync:
+            print("Refusing to --sync an empty source; pass --allow-empty-sync to")
+            print(f"delete every indexed Document under {SOURCE_DIR}")
+            sys.exit(1)
+
+    bind_dedup()
+    manifest = None
+    if args.incremental:
+        manifest = IngestManifest.load(settings.INGEST_MANIFEST)
+        bind_manifest(manifest)
+        todo = plan_incremental(files, manifest)
+        # stat before ingesting so a file edited mid-run is picked up next time
+        stats = {f: os.stat(f) for f in todo}
+    else:
+        todo = files
+
+    ingested: dict[str, str] = {}
+    try:
+        if not todo:
+            pass
+        elif args.pipeline:
+            ingested = ingest_pipelined(
+                todo,
+                parse_workers=max(1, args.parse_workers),
+                embed_workers=max(1, args.embed_workers),
+                queue_size=max(1, args.queue_size),
+            )
+        else:
+            ingested = ingest_sequential(todo)
+    finally:
+        if manifest is not None:
+            for f, doc_id in ingested.items():
+                manifest.record(f, stats[f], doc_id)
+            manifest.save()
+
+    if args.sync:
+        print("\nStep 3: Removing stale documents...")
+        sync_corpus(files, ingested, todo, manifest, str(SOURCE_DIR))
+        if manifest is not None:
+            manifest.save()
+
+    if settings.VECTOR_BACKEND == "mmap":
+        from pjs_neo_rag.mmap_index import build as build_vector_index
+
+        print("\nRefreshing the memory-mapped vector index...")
+        build_vector_index()
+
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(format_stats(cache.stats()))
+    dedup = get_dedup_index()
+    if dedup is not None:
+        print(format_dedup_stats(dedup.stats()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Local manifest of ingested files for incremental ingestion.
+
+Maps absolute path -> (size, mtime_ns, doc_id). A file whose size and mtime
+match its entry is treated as unchanged and never opened.
+
+The manifest also records the ``corpus_id`` of the database it describes
+(see ``corpus_generation``); ``bind`` drops every entry when the database
+was cleared or replaced since, so the next run re-checks every file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass(slots=True)
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    doc_id: str
+
+
+class IngestManifest:
+    """JSON-backed path -> ManifestEntry map."""
+
+    VERSION = 1
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.corpus_id: str | None = None
+        self.entries: dict[str, ManifestEntry] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "IngestManifest":
+        manifest = cls(path)
+        if not manifest.path.exists():
+            return manifest
+        try:
+            data = json.loads(manifest.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print(f"[WARN] Ignoring unreadable manifest {manifest.path}: {exc}")
+            return manifest
+        if data.get("version") != cls.VERSION:
+            return manifest
+        manifest.corpus_id = data.get("corpus_id")
+        for file_path, entry in (data.get("files") or {}).items():
+            try:
+                manifest.entries[file_path] = ManifestEntry(**entry)
+            except TypeError:
+                continue
+        return manifest
+
+    def save(self) -> None:
+        """Write atomically so an interrupted run never truncates the manifest."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        payload = {
+            "version": self.VERSION,
+            "corpus_id": self.corpus_id,
+            "files": {p: asdict(e) for p, e in sorted(self.entries.items())},
+        }
+        tmp.write_text(json.dumps(payload, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def bind(self, corpus_id: str) -> bool:
+        """Tie the manifest to ``corpus_id``; returns False if it was reset."""
+        if self.corpus_id == corpus_id:
+            return True
+        self.corpus_id = corpus_id
+        if not self.entries:
+            return True
+        print(
+            f"[WARN] {self.path} describes another database (cleared or "
+            "recreated); every file will be checked again"
+        )
+        self.entries.clear()
+        return False
+
+    def is_unchanged(self, file_path: str, st: os.stat_result) -> bool:
+        entry = self.entries.get(file_path)
+        return (
+            entry is not None
+            and entry.size == st.st_size
+            and entry.mtime_ns == st.st_mtime_ns
+        )
+
+    def record(self, file_path: str, st: os.stat_result, doc_id: str) -> None:
+        self.entries[file_path] = ManifestEntry(
+            size=st.st_size, mtime_ns=st.st_mtime_ns, doc_id=doc_id
+        )
+
+    def forget(self, file_path: str) -> None:
+        self.entries.pop(file_path, None)
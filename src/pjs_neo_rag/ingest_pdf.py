@@ -1,10 +1,17 @@
 import os
 import re
 import hashlib
+from itertools import batched
+from typing import Any, Iterator
+
 import fitz  # PyMuPDF
+import numpy as np
 from pjs_neo_rag.config import settings
-from pjs_neo_rag.embeddings import embed_vector
-from pjs_neo_rag.neo4j_connection import get_driver, DB
+from pjs_neo_rag.embeddings import embed_vectors
+from pjs_neo_rag.graph_writer import GraphWriter
+from pjs_neo_rag.metrics import ingest_items, ingest_stage
+from pjs_neo_rag.near_dup import bind_dedup_index, mark_duplicates
+from pjs_neo_rag.neo4j_connection import DB, get_driver
 
 # --- LaTeX splitter (keeps math verbatim) ---
 LTX = re.compile(
@@ -14,10 +21,18 @@ LTX = re.compile(
 
 
 def split_latex(text: str):
-    parts = LTX.split(text)
-    latex = [p for p in parts if LTX.fullmatch(p)]
-    prose = "".join(" ⟨EQ⟩ " if LTX.fullmatch(p) else p for p in parts)
-    return prose.strip(), "\n".join(latex).strip()
+    # finditer rather than LTX.split: split() also returns the inner
+    # environment-name group (or None), which corrupted the prose.
+    prose: list[str] = []
+    latex: list[str] = []
+    pos = 0
+    for m in LTX.finditer(text):
+        prose.append(text[pos : m.start()])
+        prose.append(" ⟨EQ⟩ ")
+        latex.append(m.group(0))
+        pos = m.end()
+    prose.append(text[pos:])
+    return "".join(prose).strip(), "\n".join(latex).strip()
 
 
 # --- Simple chunker (byte/char based; replace with token-aware later if you like) ---
@@ -39,88 +54,277 @@ def chunk_text(
         i = max(i + step - ovlp, 0)
 
 
-# --- Upsert batch into Neo4j ---
-UPSERT = """
-UNWIND $rows AS r
-MERGE (d:Document {doc_id:r.doc_id})
-  ON CREATE SET d.title=r.title, d.path=r.path, d.page_count=r.page_count, d.added_at=timestamp()
-  ON MATCH  SET d.path=r.path, d.page_count=r.page_count
-MERGE (s:Section {sec_id:r.sec_id})
-  ON CREATE SET s.title=r.section, s.page_start=r.page_start, s.page_end=r.page_end
-  ON MATCH  SET s.page_start=r.page_start, s.page_end=r.page_end
-MERGE (d)-[:CONTAINS]->(s)
-MERGE (c:Chunk {chunk_id:r.chunk_id})
-SET  c.text_norm=r.text_norm,
-     c.latex_raw=r.latex_raw,
-     c.vec_text=r.vec_text,
-     c.vec_latex=r.vec_latex,
-     c.page_start=r.page_start,
-     c.page_end=r.page_end,
-     c.source_hash=r.doc_id,
-     c.source_type='pdf',
-     c.added_at=coalesce(c.added_at, timestamp())
-MERGE (s)-[:CONTAINS]->(c);
-"""
-
-
-def ingest_pdf(pdf_path: str):
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(pdf_path)
-
-    # Stable doc_id = SHA256(file bytes)
+def file_doc_id(pdf_path: str) -> str:
+    """Return the stable doc_id (SHA-256 of the file bytes) without loading it whole."""
     with open(pdf_path, "rb") as f:
-        file_bytes = f.read()
-    doc_id = hashlib.sha256(file_bytes).hexdigest()
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
-    doc = fitz.open(stream=file_bytes, filetype="pdf")
-    rows: list[dict[str, object]] = []
-    page_count = 0
-    title = os.path.basename(pdf_path)
-    try:
-        page_count = doc.page_count
-        metadata = doc.metadata or {}
-        title = (metadata.get("title") or title).strip()
 
-        for p in range(page_count):
-            page_num = p + 1
+def content_hash(doc_id: str, text_norm: str, latex_raw: str) -> str:
+    """Hash of what a chunk's vectors are computed from (stored on the Chunk)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in (doc_id, text_norm, latex_raw):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def build_sections(doc, doc_id: str) -> list[dict[str, Any]]:
+    """Derive non-overlapping page spans from the PDF outline.
+
+    Each page belongs to the last outline entry (at any level) starting on or
+    before it; entries starting on the same page are merged. Pages before the
+    first entry form a front-matter section. Without an outline, every page
+    is its own section, as before.
+    """
+    page_count = doc.page_count
+    starts: dict[int, tuple[int, list[str]]] = {}
+    for level, title, page in doc.get_toc(simple=True):
+        if not 1 <= page <= page_count:
+            continue
+        lvl, titles = starts.setdefault(page, (level, []))
+        starts[page] = (min(lvl, level), titles + [str(title).strip()])
+
+    if not starts:
+        return [
+            {
+                "sec_id": f"{doc_id}:p{n}",
+                "title": f"Page {n}",
+                "level": 0,
+                "page_start": n,
+                "page_end": n,
+            }
+            for n in range(1, page_count + 1)
+        ]
+
+    pages = sorted(starts)
+    sections: list[dict[str, Any]] = []
+    if pages[0] > 1:
+        sections.append(
+            {
+                "sec_id": f"{doc_id}:front",
+                "title": "Front matter",
+                "level": 0,
+                "page_start": 1,
+                "page_end": pages[0] - 1,
+            }
+        )
+    for i, start in enumerate(pages):
+        level, titles = starts[start]
+        end = pages[i + 1] - 1 if i + 1 < len(pages) else page_count
+        sections.append(
+            {
+                "sec_id": f"{doc_id}:s{i}",
+                "title": " / ".join(t for t in titles if t) or f"Page {start}",
+                "level": level,
+                "page_start": start,
+                "page_end": end,
+            }
+        )
+    return sections
+
+
+def iter_chunks(doc, doc_id: str, pdf_path: str) -> Iterator[dict[str, object]]:
+    """Yield chunk rows (without embeddings) page by page from an open PDF.
+
+    ``prev_id`` is the previous chunk of the document (across page breaks),
+    from which the writers build the ``NEXT`` chain.
+    """
+    page_count = doc.page_count
+    metadata = doc.metadata or {}
+    title = (metadata.get("title") or os.path.basename(pdf_path)).strip()
+    path = os.path.abspath(pdf_path)
+    sections = iter(build_sections(doc, doc_id))
+    sec = next(sections, None)
+    prev_id: str | None = None
+
+    for p in range(page_count):
+        page_num = p + 1
+        while sec is not None and sec["page_end"] < page_num:
+            sec = next(sections, None)
+        assert sec is not None
+        with ingest_stage("extract"):
             raw_text = doc.load_page(p).get_text("text")
-            text = raw_text if isinstance(raw_text, str) else str(raw_text or "")
-            for off, chunk in chunk_text(text):
-                text_norm, latex_raw = split_latex(chunk)
-                vec_text = embed_vector(text_norm)
-                vec_latex = embed_vector(latex_raw or " ")
-                chunk_id = f"{doc_id}:p{page_num}:o{off}"
-                sec_id = f"{doc_id}:p{page_num}"
-                rows.append(
-                    {
-                        "doc_id": doc_id,
-                        "title": title,
-                        "path": os.path.abspath(pdf_path),
-                        "page_count": page_count,
-                        "sec_id": sec_id,
-                        "section": f"Page {page_num}",
-                        "page_start": page_num,
-                        "page_end": page_num,
-                        "chunk_id": chunk_id,
-                        "text_norm": text_norm,
-                        "latex_raw": latex_raw,
-                        "vec_text": vec_text,
-                        "vec_latex": vec_latex,
-                    }
-                )
+        ingest_items("extract", 1)
+        text = raw_text if isinstance(raw_text, str) else str(raw_text or "")
+        with ingest_stage("chunk"):
+            pieces = [(off, *split_latex(chunk)) for off, chunk in chunk_text(text)]
+        ingest_items("chunk", len(pieces))
+        for off, text_norm, latex_raw in pieces:
+            chunk_id = f"{doc_id}:p{page_num}:o{off}"
+            yield {
+                "doc_id": doc_id,
+                "title": title,
+                "path": path,
+                "page_count": page_count,
+                "sec_id": sec["sec_id"],
+                "section": sec["title"],
+                "sec_level": sec["level"],
+                "sec_page_start": sec["page_start"],
+                "sec_page_end": sec["page_end"],
+                "page_start": page_num,
+                "page_end": page_num,
+                "chunk_id": chunk_id,
+                "prev_id": prev_id,
+                "text_norm": text_norm,
+                "latex_raw": latex_raw,
+                "content_hash": content_hash(doc_id, text_norm, latex_raw),
+            }
+            prev_id = chunk_id
+
+
+class SectionCentroids:
+    """Running mean of chunk ``vec_text`` per section.
+
+    Chunks arrive in page order and sections are contiguous, so only the
+    current section is kept in memory. Rows without ``vec_text``
+    (near-duplicates) are skipped. ``add`` returns the sections that
+    finished in this batch; call ``finish`` after the last batch.
+    """
+
+    def __init__(self) -> None:
+        self.sec_id: str | None = None
+        self.total: np.ndarray | None = None
+
+    def _close(self) -> list[dict[str, object]]:
+        if self.sec_id is None or self.total is None:
+            return []
+        norm = float(np.linalg.norm(self.total)) or 1.0
+        done = {"sec_id": self.sec_id, "embedding": self.total / norm}
+        self.sec_id, self.total = None, None
+        return [done]
+
+    def add(self, rows: list[dict[str, object]]) -> list[dict[str, object]]:
+        finished: list[dict[str, object]] = []
+        for r in rows:
+            if r["sec_id"] != self.sec_id:
+                finished += self._close()
+                self.sec_id = str(r["sec_id"])
+            vec: np.ndarray | None = r["vec_text"]  # type: ignore[assignment]
+            if vec is None:
+                continue  # near-duplicate: counted with its canonical chunk
+            if self.total is None:
+                self.total = np.zeros(len(vec), dtype=np.float32)
+            self.total += vec
+        return finished
+
+    def finish(self) -> list[dict[str, object]]:
+        return self._close()
+
+
+def extract_chunks(pdf_path: str) -> tuple[str, int, list[dict[str, object]]]:
+    """Parse a PDF into chunk rows (without embeddings).
+
+    Runs PyMuPDF extraction plus ``chunk_text``/``split_latex`` only, so it is
+    safe to call from a worker process. Returns ``(doc_id, page_count, rows)``.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(pdf_path)
+
+    doc_id = file_doc_id(pdf_path)
+    doc = fitz.open(pdf_path)
+    try:
+        return doc_id, doc.page_count, list(iter_chunks(doc, doc_id, pdf_path))
     finally:
         doc.close()
 
-    driver = get_driver()
+
+# Per-document cap on memoized LaTeX vectors (keeps streaming memory bounded)
+LATEX_MEMO_MAX = 512
+
+
+def embed_rows(
+    rows: list[dict[str, object]],
+    latex_memo: dict[str, np.ndarray] | None = None,
+) -> None:
+    """Fill ``vec_text`` on every row and ``vec_latex`` on rows with LaTeX.
+
+    Vectors are float32 arrays (rows of one ``embed_vectors`` matrix).
+
+    Prose-only chunks get ``vec_latex=None`` so they stay out of the
+    ``chunk_vec_latex`` index. Near-duplicates (rows with a ``canonical_id``,
+    see ``near_dup.mark_duplicates``) are not embedded and get ``None`` for
+    both. Pass the same ``latex_memo`` for all batches of a document to embed
+    each distinct LaTeX string once per document.
+    """
+    for r in rows:
+        if r.get("canonical_id"):
+            r["vec_text"] = r["vec_latex"] = None
+    rows = [r for r in rows if not r.get("canonical_id")]
+    if not rows:
+        return
+    memo = latex_memo if latex_memo is not None else {}
+    texts = [str(r["text_norm"]) for r in rows]
+    new_latex = list(
+        dict.fromkeys(
+            str(r["latex_raw"])
+            for r in rows
+            if r["latex_raw"] and str(r["latex_raw"]) not in memo
+        )
+    )
+    with ingest_stage("embed"):
+        vectors = embed_vectors(texts + new_latex)
+    ingest_items("embed", len(rows))
+    n = len(rows)
+    batch_latex = dict(zip(new_latex, vectors[n:]))
+    for latex, vec in batch_latex.items():
+        if len(memo) >= LATEX_MEMO_MAX:
+            break
+        memo[latex] = vec
+    for r, vec_text in zip(rows, vectors[:n]):
+        r["vec_text"] = vec_text
+        latex = str(r["latex_raw"] or "")
+        if not latex:
+            r["vec_latex"] = None
+        else:
+            vec_latex = memo.get(latex)
+            r["vec_latex"] = vec_latex if vec_latex is not None else batch_latex[latex]
+
+
+def ingest_pdf(pdf_path: str) -> str:
+    """Parse, embed and upsert one PDF as a stream. Returns its doc_id.
+
+    The file is hashed incrementally and opened from disk; chunks are
+    embedded and written INGEST_BATCH_SIZE at a time as pages are read, so
+    peak memory is bounded by the batch size rather than the document, and
+    batches written before a failure are kept.
+    """
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(pdf_path)
+
+    doc_id = file_doc_id(pdf_path)
+    doc = fitz.open(pdf_path)
+    n_chunks = n_dups = 0
     try:
-        with driver.session(database=DB) as s:
-            BATCH = 200
-            for i in range(0, len(rows), BATCH):
-                s.run(UPSERT, rows=rows[i : i + BATCH])
+        page_count = doc.page_count
+        driver = get_driver()
+        try:
+            with driver.session(database=DB) as s:
+                bind_dedup_index(s)
+            with GraphWriter(driver) as writer:
+                chunks = iter_chunks(doc, doc_id, pdf_path)
+                latex_memo: dict[str, np.ndarray] = {}
+                centroids = SectionCentroids()
+                for batch in batched(chunks, settings.INGEST_BATCH_SIZE):
+                    rows = list(batch)
+                    n_dups += mark_duplicates(rows)
+                    embed_rows(rows, latex_memo)
+                    writer.write_rows(rows)
+                    writer.write_section_vectors(centroids.add(rows))
+                    n_chunks += len(rows)
+                writer.write_section_vectors(centroids.finish())
+                writer.flush()
+                writer.mark_ingested(doc_id, n_chunks)
+        finally:
+            driver.close()
     finally:
-        driver.close()
+        doc.close()
 
-    print(f"✅ Ingested: {pdf_path}  pages={page_count}  chunks={len(rows)}")
+    print(
+        f"✅ Ingested: {pdf_path}  pages={page_count}  chunks={n_chunks}"
+        f"  duplicates={n_dups}"
+    )
+    return doc_id
 
 
 if __name__ == "__main__":
@@ -0,0 +1,163 @@
+"""Prometheus metrics for search, ingestion and the API.
+
+The API serves them on ``/metrics``; ``ingest_files.py --metrics-port``
+exposes them for an ingest run. With several processes (API workers, the
+ingest parse pool) set PROMETHEUS_MULTIPROC_DIR to an empty directory
+before start-up so every process reports into it (``app.py`` does this
+for ``--workers`` > 1); the Neo4j pool gauge is then per scraped worker.
+
+Search time is split into ``embed`` (query embedding, cache included),
+``neo4j`` (one Cypher round-trip; the text and LaTeX ``queryNodes`` calls
+share it), ``filter_count``, ``mmap`` (in-process candidates) and ``merge``
+(fusion, windows, ranking).
+"""
+
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from pjs_neo_rag.config import settings
+
+# 1 ms .. ~30 s
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# ---- API ----
+API_REQUEST_SECONDS = Histogram(
+    "pjs_api_request_seconds",
+    "API request latency (streamed answers: to the end of the stream)",
+    ["endpoint", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+API_IN_FLIGHT = Gauge(
+    "pjs_api_requests_in_flight",
+    "API requests being handled",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+# ---- search ----
+SEARCH_STAGE_SECONDS = Histogram(
+    "pjs_search_stage_seconds",
+    "Search latency by stage",
+    ["mode", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# ---- embeddings (queries and ingestion) ----
+EMBED_SECONDS = Histogram(
+    "pjs_embed_request_seconds",
+    "Embedding provider call latency",
+    ["provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+EMBED_TEXTS = Counter(
+    "pjs_embed_texts",
+    "Texts sent to the embedding provider",
+    ["provider", "model"],
+)
+
+# ---- ingestion ----
+INGEST_STAGE_SECONDS = Histogram(
+    "pjs_ingest_stage_seconds",
+    "Ingestion latency by stage (extract per page, chunk per page, "
+    "embed and upsert per batch)",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+INGEST_ITEMS = Counter(
+    "pjs_ingest_items",
+    "Items through each ingestion stage "
+    "(pages, chunks, embedded rows, upserted rows)",
+    ["stage"],
+)
+
+# ---- connection pools ----
+HTTP_IN_FLIGHT = Gauge(
+    "pjs_http_requests_in_flight",
+    "Provider HTTP requests in flight (connections in use)",
+    ["base_url"],
+    multiprocess_mode="livesum",
+)
+NEO4J_POOL_IN_USE = Gauge(
+    "pjs_neo4j_pool_in_use",
+    "Neo4j connections checked out of the driver pool",
+    ["driver"],
+    multiprocess_mode="livesum",
+)
+NEO4J_POOL_SIZE = Gauge(
+    "pjs_neo4j_pool_size",
+    "Configured Neo4j pool size (NEO4J_POOL_SIZE)",
+    multiprocess_mode="max",
+)
+NEO4J_POOL_SIZE.set(settings.NEO4J_POOL_SIZE)
+
+
+def search_stage(mode: str, stage: str):
+    """Context manager timing one search stage."""
+    return SEARCH_STAGE_SECONDS.labels(mode=mode, stage=stage).time()
+
+
+def ingest_stage(stage: str):
+    """Context manager timing one ingestion step."""
+    return INGEST_STAGE_SECONDS.labels(stage=stage).time()
+
+
+def ingest_items(stage: str, count: int) -> None:
+    INGEST_ITEMS.labels(stage=stage).inc(count)
+
+
+@contextmanager
+def embed_call(texts: int) -> Iterator[None]:
+    """Time one embedding provider call of ``texts`` inputs."""
+    labels = {"provider": settings.EMBED_PROVIDER, "model": settings.EMBED_MODEL}
+    EMBED_TEXTS.labels(**labels).inc(texts)
+    with EMBED_SECONDS.labels(**labels).time():
+        yield
+
+
+def neo4j_pool_in_use(driver: Any) -> int:
+    """Connections checked out of ``driver``'s pool (0 if it is not open).
+
+    Reads driver internals; returns 0 rather than failing if they change.
+    """
+    pool = getattr(driver, "_pool", None)
+    try:
+        return sum(
+            pool.in_use_connection_count(address) for address in list(pool.connections)
+        )
+    except Exception:
+        return 0
+
+
+def _registry() -> CollectorRegistry:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition body and its content type."""
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def serve(port: int) -> None:
+    """Expose the metrics on ``port`` from a background thread (CLI runs)."""
+    start_http_server(port, registry=_registry())
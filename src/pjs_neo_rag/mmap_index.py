@@ -0,0 +1,464 @@
+"""In-process, memory-mapped vector index (VECTOR_BACKEND=mmap).
+
+Keeps every chunk's ``vec_text`` / ``vec_latex`` in float32 ``.npy`` files
+opened with ``mmap_mode="r"``, so the vector step of a search is a NumPy
+matrix product instead of Bolt round-trips, and all uvicorn workers on a host
+share the same pages through the OS page cache. Only the final passages are
+fetched from Neo4j, by chunk_id.
+
+Small corpora are searched exactly. From MMAP_IVF_MIN_ROWS vectors on, an
+IVF index is built (spherical k-means, about sqrt(n) lists, rows stored
+grouped by list) and a search scans the MMAP_IVF_NPROBE nearest lists only.
+
+Layout under MMAP_INDEX_DIR::
+
+    CURRENT                  name of the live version directory
+    v<generation>-<stamp>/
+        meta.json            corpus generation, embedding model, sizes
+        chunk_ids.npy        (n,) chunk ids
+        keys.npy             (n,) content hash of each chunk (Chunk.content_hash)
+        text/vectors.npy     (m, dim) float32 rows, grouped by IVF list
+        text/rows.npy        (m,) int32 index into chunk_ids
+        text/offsets.npy     IVF list boundaries   (IVF only)
+        text/centroids.npy   IVF list centroids    (IVF only)
+        latex/...            same for vec_latex
+
+``build`` is incremental: it lists the chunks that have vectors, keeps the
+rows of chunks whose id and content hash (set by the writers at ingest) are
+unchanged, fetches vectors only for new or rewritten chunks and writes a new
+version; readers switch to it on their next search. ``ingest_files.py``
+refreshes the index after ingesting when VECTOR_BACKEND=mmap.
+
+Usage:
+    python src/pjs_neo_rag/mmap_index.py build [--full]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from itertools import batched
+from pathlib import Path
+from typing import Any, Iterable
+
+import numpy as np
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.corpus_generation import read_generation
+
+FORMAT_VERSION = 3
+FETCH_BATCH = 1000
+COPY_BLOCK = 65536
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+# seconds before a version that failed to load is tried again
+LOAD_RETRY_SECONDS = 5.0
+
+LIST_VECTOR_IDS = """
+MATCH (c:Chunk)
+WHERE c.vec_text IS NOT NULL
+// chunks written before content hashes existed keep an empty key until
+// they are rewritten
+RETURN c.chunk_id AS chunk_id, coalesce(c.content_hash, '') AS content_hash
+"""
+
+FETCH_VECTORS = """
+UNWIND $ids AS id
+MATCH (c:Chunk {chunk_id:id})
+WHERE c.vec_text IS NOT NULL
+RETURN c.chunk_id AS chunk_id, c.vec_text AS vec_text, c.vec_latex AS vec_latex
+"""
+
+
+# ---- search ----
+class VectorSet:
+    """One embedding field: vector rows plus their chunk index, maybe IVF."""
+
+    def __init__(self, path: Path) -> None:
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.rows = np.load(path / "rows.npy", mmap_mode="r")
+        ivf = (path / "centroids.npy").exists()
+        self.centroids = np.load(path / "centroids.npy") if ivf else None
+        self.offsets = np.load(path / "offsets.npy") if ivf else None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def topk(
+        self, v: np.ndarray, k: int, nprobe: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Chunk indexes and cosine similarities of the ``k`` nearest rows."""
+        if k <= 0 or not len(self):
+            return np.empty(0, np.int64), np.empty(0, np.float32)
+        if self.centroids is None:
+            scores = self.vectors @ v
+            positions = None
+        else:
+            probes = _top(self.centroids @ v, nprobe)
+            spans = [(self.offsets[i], self.offsets[i + 1]) for i in probes]
+            scores = np.concatenate([self.vectors[a:b] @ v for a, b in spans])
+            positions = np.concatenate([np.arange(a, b) for a, b in spans])
+        best = _top(scores, k)
+        rows = best if positions is None else positions[best]
+        return np.asarray(self.rows[rows], dtype=np.int64), scores[best]
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the ``k`` largest scores, best first."""
+    if k < len(scores):
+        part = np.argpartition(scores, -k)[-k:]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def _neo4j_score(cosine: np.ndarray) -> np.ndarray:
+    # Neo4j reports cosine similarity rescaled to [0, 1]
+    return (1.0 + cosine) / 2.0
+
+
+class MmapIndex:
+    """A loaded index version."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.meta = json.loads((path / "meta.json").read_text())
+        self.chunk_ids = np.load(path / "chunk_ids.npy", mmap_mode="r")
+        self.text = VectorSet(path / "text")
+        self.latex = VectorSet(path / "latex")
+
+    @property
+    def generation(self) -> int:
+        return int(self.meta["generation"])
+
+    def candidates(
+        self, v: np.ndarray, k_prose: int, k_latex: int
+    ) -> list[dict[str, Any]]:
+        """Prose and LaTeX neighbours as ``{source, chunk_id, score}`` rows."""
+        v = np.asarray(v, dtype=np.float32)
+        nprobe = settings.MMAP_IVF_NPROBE
+        out = []
+        for source, vset, k in (
+            ("prose", self.text, k_prose),
+            ("latex", self.latex, k_latex),
+        ):
+            rows, scores = vset.topk(v, k, nprobe)
+            for row, score in zip(rows, _neo4j_score(scores)):
+                out.append(
+                    {
+                        "source": source,
+                        "chunk_id": str(self.chunk_ids[row]),
+                        "score": float(score),
+                    }
+                )
+        return out
+
+    def search(
+        self, v: np.ndarray, k: int, k_prose: int, k_latex: int
+    ) -> list[dict[str, Any]]:
+        """Flat search: best of both fields per chunk, top ``k``."""
+        best: dict[str, float] = {}
+        for hit in self.candidates(v, k_prose, k_latex):
+            if hit["score"] > best.get(hit["chunk_id"], -1.0):
+                best[hit["chunk_id"]] = hit["score"]
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{"chunk_id": chunk_id, "score": score} for chunk_id, score in ranked]
+
+
+_lock = threading.Lock()
+_loaded: tuple[int, MmapIndex | None] | None = None
+_failed: tuple[int, float] | None = None  # (stamp, monotonic time) of a failed load
+
+
+def get_mmap_index() -> MmapIndex | None:
+    """The live index version, or ``None`` when none has been built.
+
+    Re-opened whenever ``CURRENT`` changes (one ``stat`` per call). A version
+    that fails to load is not remembered: it is retried after
+    LOAD_RETRY_SECONDS, and the previously loaded version (if any) is served
+    meanwhile.
+    """
+    global _loaded, _failed
+    pointer = settings.MMAP_INDEX_DIR / "CURRENT"
+    try:
+        stamp = pointer.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _loaded is not None and _loaded[0] == stamp:
+        return _loaded[1]
+    with _lock:
+        if _loaded is not None and _loaded[0] == stamp:
+            return _loaded[1]
+        previous = _loaded[1] if _loaded is not None else None
+        if (
+            _failed is not None
+            and _failed[0] == stamp
+            and time.monotonic() - _failed[1] < LOAD_RETRY_SECONDS
+        ):
+            return previous
+        try:
+            index = MmapIndex(settings.MMAP_INDEX_DIR / pointer.read_text().strip())
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"[WARN] Cannot load vector index {settings.MMAP_INDEX_DIR}: {exc}")
+            _failed = (stamp, time.monotonic())
+            return previous
+        if (
+            index.meta.get("model") != settings.EMBED_MODEL
+            or index.meta.get("dim") != settings.EMBED_DIM
+        ):
+            print(
+                "[WARN] Vector index was built for another embedding model or "
+                "dimension; ignored"
+            )
+            index = None
+        _loaded, _failed = (stamp, index), None
+        return index
+
+
+# ---- build ----
+def _load_current(root: Path) -> tuple[MmapIndex, np.ndarray] | None:
+    """The current version and its content hashes, if it can be reused."""
+    pointer = root / "CURRENT"
+    if not pointer.exists():
+        return None
+    try:
+        index = MmapIndex(root / pointer.read_text().strip())
+        meta = index.meta
+        if (
+            meta.get("format") != FORMAT_VERSION
+            or meta.get("model") != settings.EMBED_MODEL
+            or meta.get("dim") != settings.EMBED_DIM
+        ):
+            return None
+        keys = np.load(index.path / "keys.npy")
+    except (OSError, ValueError, KeyError):
+        return None
+    return index, keys
+
+
+def _fetch_vectors(session, ids: list[str]) -> Iterable[dict[str, Any]]:
+    for batch in batched(ids, FETCH_BATCH):
+        yield from session.run(FETCH_VECTORS, ids=list(batch))
+
+
+def _normalized(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def _train_ivf(vectors: Any, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids from a sample of ``vectors``."""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample_size = min(n, nlist * KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(n, sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~np.bincount(assign, minlength=nlist).astype(bool)
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+        centroids = _normalized(sums)
+    return centroids
+
+
+class _Rows:
+    """Rows kept from the previous version (mmap) followed by new ones (RAM)."""
+
+    def __init__(
+        self, old: np.ndarray | None, keep: np.ndarray, new: np.ndarray
+    ) -> None:
+        self.old, self.keep, self.new = old, keep, new
+
+    def __len__(self) -> int:
+        return len(self.keep) + len(self.new)
+
+    def take(self, idx: np.ndarray) -> np.ndarray:
+        out = np.empty((len(idx), settings.EMBED_DIM), dtype=np.float32)
+        from_old = idx < len(self.keep)
+        if from_old.any():
+            out[from_old] = self.old[self.keep[idx[from_old]]]
+        out[~from_old] = self.new[idx[~from_old] - len(self.keep)]
+        return out
+
+
+class _Sample:
+    """Array-like view that materializes only the rows k-means samples."""
+
+    def __init__(self, rows: _Rows) -> None:
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, idx: np.ndarray) -> np.ndarray:
+        return self.rows.take(np.asarray(idx))
+
+
+def _write_set(
+    path: Path, rows: _Rows, chunk_rows: np.ndarray, old: VectorSet | None
+) -> None:
+    """Write one ``VectorSet``, grouped by IVF list when the set is large."""
+    path.mkdir(parents=True)
+    n = len(rows)
+    order = np.arange(n)
+    centroids = None
+    if n >= settings.MMAP_IVF_MIN_ROWS:
+        nlist = max(1, int(math.sqrt(n)))
+        # incremental builds reuse the trained lists; --full retrains
+        if old is not None and old.centroids is not None:
+            centroids = old.centroids
+        else:
+            centroids = _train_ivf(_Sample(rows), nlist)
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, COPY_BLOCK):
+            block = np.arange(start, min(n, start + COPY_BLOCK))
+            assign[block] = np.argmax(rows.take(block) @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=len(centroids))
+        np.save(path / "offsets.npy", np.concatenate([[0], np.cumsum(counts)]))
+        np.save(path / "centroids.npy", centroids)
+
+    out = np.lib.format.open_memmap(
+        path / "vectors.npy", mode="w+", dtype=np.float32, shape=(n, settings.EMBED_DIM)
+    )
+    for start in range(0, n, COPY_BLOCK):
+        out[start : start + COPY_BLOCK] = rows.take(order[start : start + COPY_BLOCK])
+    out.flush()
+    del out
+    np.save(path / "rows.npy", chunk_rows[order].astype(np.int32))
+
+
+def build(full: bool = False, driver=None) -> Path:
+    """Write a new index version from Neo4j and make it current.
+
+    Incremental unless ``full`` (or the stored format/model/dimension
+    differ): only vectors of chunks missing from the current version, or
+    whose content hash changed, are fetched.
+    """
+    from pjs_neo_rag.neo4j_connection import DB, get_driver
+
+    root = settings.MMAP_INDEX_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    current = None if full else _load_current(root)
+    old, old_keys = current if current is not None else (None, np.empty(0, str))
+    own_driver = driver is None
+    driver = driver or get_driver()
+    t0 = time.perf_counter()
+    try:
+        with driver.session(database=DB) as s:
+            generation = read_generation(s)
+            live = {
+                r["chunk_id"]: r["content_hash"] for r in s.run(LIST_VECTOR_IDS)
+            }
+            old_ids = np.asarray(old.chunk_ids) if old is not None else np.empty(0, str)
+            # a row is reused only if its chunk was not rewritten since
+            keep_chunk = np.fromiter(
+                (
+                    live.get(cid) == key
+                    for cid, key in zip(old_ids.tolist(), old_keys.tolist())
+                ),
+                dtype=bool,
+                count=len(old_ids),
+            )
+            known = set(old_ids[keep_chunk].tolist())
+            new_ids = [cid for cid in live if cid not in known]
+
+            new_text: list[np.ndarray] = []
+            new_latex: list[np.ndarray] = []
+            latex_of: list[int] = []
+            for i, r in enumerate(_fetch_vectors(s, new_ids)):
+                new_text.append(np.asarray(r["vec_text"], dtype=np.float32))
+                if r["vec_latex"] is not None:
+                    new_latex.append(np.asarray(r["vec_latex"], dtype=np.float32))
+                    latex_of.append(i)
+                new_ids[i] = r["chunk_id"]
+            del new_ids[len(new_text) :]  # ids whose vectors vanished meanwhile
+    finally:
+        if own_driver:
+            driver.close()
+
+    # kept chunks first (renumbered), then the new ones
+    chunk_ids = np.concatenate([old_ids[keep_chunk], np.asarray(new_ids, dtype=str)])
+    keys = np.concatenate(
+        [old_keys[keep_chunk], np.asarray([live[cid] for cid in new_ids], dtype=str)]
+    )
+    renumber = np.cumsum(keep_chunk) - 1
+    n_kept = int(keep_chunk.sum())
+
+    version = f"v{generation}-{time.time_ns()}"
+    path = root / version
+    path.mkdir()
+    np.save(path / "chunk_ids.npy", chunk_ids)
+    np.save(path / "keys.npy", keys)
+    dim = settings.EMBED_DIM
+    for name, fresh, fresh_rows in (
+        ("text", new_text, np.arange(len(new_text))),
+        ("latex", new_latex, np.asarray(latex_of, dtype=np.int64)),
+    ):
+        old_set = getattr(old, name) if old is not None else None
+        if old_set is not None:
+            old_rows = np.asarray(old_set.rows)
+            keep = np.flatnonzero(keep_chunk[old_rows])
+            kept_rows = renumber[old_rows[keep]]
+        else:
+            keep, kept_rows = np.empty(0, np.int64), np.empty(0, np.int64)
+        matrix = _normalized(np.stack(fresh)) if fresh else np.empty((0, dim), np.float32)
+        _write_set(
+            path / name,
+            _Rows(old_set.vectors if old_set is not None else None, keep, matrix),
+            np.concatenate([kept_rows, n_kept + fresh_rows]),
+            old_set,
+        )
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "generation": generation,
+        "model": settings.EMBED_MODEL,
+        "dim": dim,
+        "chunks": int(len(chunk_ids)),
+        "text_rows": int(len(np.load(path / "text" / "rows.npy", mmap_mode="r"))),
+        "latex_rows": int(len(np.load(path / "latex" / "rows.npy", mmap_mode="r"))),
+        "ivf": (path / "text" / "centroids.npy").exists(),
+        "built_at": time.time(),
+    }
+    (path / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    pointer = root / "CURRENT"
+    tmp = root / "CURRENT.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, pointer)
+    # readers that still map an old version keep their open files (POSIX)
+    for stale in root.iterdir():
+        if stale.is_dir() and stale.name != version:
+            shutil.rmtree(stale, ignore_errors=True)
+
+    print(
+        f"✅ Vector index {version}: chunks={meta['chunks']} kept={n_kept} "
+        f"fetched={len(new_ids)} ivf={meta['ivf']} "
+        f"({time.perf_counter() - t0:.1f}s) -> {root}"
+    )
+    return path
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Memory-mapped vector index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_build = sub.add_parser("build", help="build or refresh the index from Neo4j")
+    p_build.add_argument(
+        "--full", action="store_true", help="refetch every vector and retrain IVF lists"
+    )
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build(full=args.full)
+
+
+if __name__ == "__main__":
+    main()
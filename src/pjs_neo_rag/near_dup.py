@@ -0,0 +1,478 @@
+"""Near-duplicate chunk detection (MinHash + LSH).
+
+Each chunk's ``text_norm`` plus ``latex_raw`` is reduced to a MinHash
+signature of its word shingles. Signatures of canonical chunks are kept in a
+local SQLite LSH index (``DEDUP_INDEX_PATH``), banded so that candidate pairs
+are found with a few indexed lookups; candidates are then verified against
+DEDUP_THRESHOLD using the estimated Jaccard similarity.
+
+A chunk that matches an indexed one gets ``canonical_id`` set by
+``mark_duplicates``. It is written without vectors of its own and linked with
+``(dup)-[:DUPLICATE_OF]->(canonical)``, so it is never embedded, takes no
+vector-index space and search returns the canonical passage once.
+
+New canonical chunks are held in memory (and matched against) until
+``GraphWriter`` has written them; only then are they stored, so a failed
+write never leaves a canonical in the index that is not in the graph.
+
+Detection is off unless DEDUP_INDEX_PATH is set. The index is bound to the
+database's ``corpus_id`` (see corpus_generation): after the database is
+cleared or replaced its entries name chunks that no longer exist, so it is
+emptied. ``bulk_import`` does not detect duplicates; the index starts empty
+after a bulk import and only covers chunks ingested afterwards.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.corpus_generation import corpus_id
+from pjs_neo_rag.embeddings import embed_vectors
+
+NUM_PERM = 128
+# 16 bands x 8 rows: pairs above ~0.7 Jaccard become candidates, which are
+# then checked against DEDUP_THRESHOLD
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS signatures (chunk_id TEXT PRIMARY KEY, sig BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS bands (
+    band     INTEGER NOT NULL,
+    key      INTEGER NOT NULL,
+    chunk_id TEXT    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_key ON bands (band, key);
+CREATE INDEX IF NOT EXISTS bands_chunk ON bands (chunk_id);
+"""
+
+
+class MinHasher:
+    """MinHash signatures over word shingles (stable across processes)."""
+
+    def __init__(
+        self, num_perm: int = NUM_PERM, shingle: int = settings.DEDUP_SHINGLE, seed: int = 1
+    ) -> None:
+        rng = np.random.default_rng(seed)
+        self.shingle = shingle
+        self.a = rng.integers(1, _PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """Return a uint32 signature, or ``None`` for text without words."""
+        words = text.lower().split()
+        if not words:
+            return None
+        k = self.shingle
+        shingles = {" ".join(words[i : i + k]) for i in range(max(1, len(words) - k + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # universal hashing (a*x + b) mod p per permutation; uint64 wraps like datasketch
+        permuted = (hashes[:, np.newaxis] * self.a + self.b) % _PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+
+def jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+def _band_keys(sig: np.ndarray) -> list[int]:
+    return [
+        int.from_bytes(
+            hashlib.blake2b(sig[i * ROWS : (i + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            "big",
+            signed=True,
+        )
+        for i in range(BANDS)
+    ]
+
+
+def _doc_range(doc_id: str) -> tuple[str, str]:
+    # chunk_ids are "{doc_id}:p{page}:o{offset}"; ';' sorts right after ':'
+    return f"{doc_id}:", f"{doc_id};"
+
+
+class DedupIndex:
+    """Thread-safe SQLite LSH index of canonical chunk signatures."""
+
+    def __init__(self, path: Path, threshold: float, shingle: int) -> None:
+        self.path = Path(path)
+        self.threshold = threshold
+        self.hasher = MinHasher(shingle=shingle)
+        self.duplicates = 0
+        self.canonical = 0
+        self._lock = threading.Lock()
+        # canonical chunks not written yet: chunk_id -> signature, band -> ids
+        self._pending: dict[str, np.ndarray] = {}
+        self._pending_bands: dict[tuple[int, int], set[str]] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        params = f"perm={NUM_PERM};bands={BANDS};shingle={shingle}"
+        row = self._conn.execute("SELECT value FROM meta WHERE key='params'").fetchone()
+        if row is None or row[0] != params:
+            # signatures from other parameters are not comparable
+            self._conn.execute("DELETE FROM signatures")
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('params', ?)", (params,)
+            )
+        self._conn.commit()
+
+    # ---- lookups (caller holds the lock) ----
+    def _find_locked(self, chunk_id: str, sig: np.ndarray) -> str | None:
+        candidates: set[str] = set()
+        for band, key in enumerate(_band_keys(sig)):
+            cur = self._conn.execute(
+                "SELECT chunk_id FROM bands WHERE band=? AND key=?", (band, key)
+            )
+            candidates.update(r[0] for r in cur)
+            candidates.update(self._pending_bands.get((band, key), ()))
+        candidates.discard(chunk_id)
+        best, best_sim = None, self.threshold
+        for cid in sorted(candidates):
+            other = self._pending.get(cid)
+            if other is None:
+                row = self._conn.execute(
+                    "SELECT sig FROM signatures WHERE chunk_id=?", (cid,)
+                ).fetchone()
+                if row is None:
+                    continue
+                other = np.frombuffer(row[0], dtype=np.uint32)
+            sim = jaccard(sig, other)
+            if sim >= best_sim:
+                best, best_sim = cid, sim
+        return best
+
+    def _add_locked(self, chunk_id: str, sig: np.ndarray) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO signatures (chunk_id, sig) VALUES (?, ?)",
+            (chunk_id, sig.tobytes()),
+        )
+        self._conn.execute("DELETE FROM bands WHERE chunk_id=?", (chunk_id,))
+        self._conn.executemany(
+            "INSERT INTO bands (band, key, chunk_id) VALUES (?, ?, ?)",
+            [(band, key, chunk_id) for band, key in enumerate(_band_keys(sig))],
+        )
+
+    def _hold_locked(self, chunk_id: str, sig: np.ndarray) -> None:
+        self._pending[chunk_id] = sig
+        for band, key in enumerate(_band_keys(sig)):
+            self._pending_bands.setdefault((band, key), set()).add(chunk_id)
+
+    def _unhold_locked(self, chunk_id: str) -> np.ndarray | None:
+        sig = self._pending.pop(chunk_id, None)
+        if sig is not None:
+            for band, key in enumerate(_band_keys(sig)):
+                ids = self._pending_bands.get((band, key))
+                if ids is not None:
+                    ids.discard(chunk_id)
+                    if not ids:
+                        del self._pending_bands[(band, key)]
+        return sig
+
+    # ---- public API ----
+    def match(
+        self, items: Sequence[tuple[str, np.ndarray | None]]
+    ) -> list[str | None]:
+        """For each ``(chunk_id, signature)`` return its canonical chunk_id.
+
+        Returns ``None`` for chunks that are canonical themselves; those are
+        held as pending, so later items (in this call or another) can match
+        them, until ``confirm`` or ``release``. A chunk already indexed as
+        canonical stays canonical.
+        """
+        out: list[str | None] = []
+        with self._lock:
+            for chunk_id, sig in items:
+                if sig is None:
+                    out.append(None)
+                    continue
+                known = self._conn.execute(
+                    "SELECT 1 FROM signatures WHERE chunk_id=?", (chunk_id,)
+                ).fetchone()
+                match = None if known else self._find_locked(chunk_id, sig)
+                if match is None:
+                    if not known:
+                        self._hold_locked(chunk_id, sig)
+                    self.canonical += 1
+                else:
+                    self.duplicates += 1
+                out.append(match)
+        return out
+
+    def confirm(self, chunk_ids: Sequence[str]) -> None:
+        """Store pending canonical chunks once they are written to the graph."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                sig = self._unhold_locked(chunk_id)
+                if sig is not None:
+                    self._add_locked(chunk_id, sig)
+            self._conn.commit()
+
+    def release(self, chunk_ids: Sequence[str]) -> None:
+        """Forget pending canonical chunks whose write failed or was skipped."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._unhold_locked(chunk_id)
+
+    def add(self, items: Sequence[tuple[str, np.ndarray | None]]) -> None:
+        """Index chunks as canonical (e.g. promoted duplicates)."""
+        with self._lock:
+            for chunk_id, sig in items:
+                if sig is not None:
+                    self._add_locked(chunk_id, sig)
+            self._conn.commit()
+
+    def remove(self, chunk_ids: Sequence[str]) -> None:
+        with self._lock:
+            rows = [(cid,) for cid in chunk_ids]
+            self._conn.executemany("DELETE FROM signatures WHERE chunk_id=?", rows)
+            self._conn.executemany("DELETE FROM bands WHERE chunk_id=?", rows)
+            self._conn.commit()
+
+    def remove_docs(self, doc_ids: Sequence[str]) -> None:
+        """Drop every indexed chunk of the given documents."""
+        with self._lock:
+            for doc_id in doc_ids:
+                lo, hi = _doc_range(doc_id)
+                for table in ("signatures", "bands"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE chunk_id >= ? AND chunk_id < ?",
+                        (lo, hi),
+                    )
+            self._conn.commit()
+
+    def bind(self, corpus_id: str) -> bool:
+        """Tie the index to ``corpus_id``; returns False if it was reset."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE key='corpus_id'"
+            ).fetchone()
+            if row is not None and row[0] == corpus_id:
+                return True
+            entries = self._conn.execute("SELECT count(*) FROM signatures").fetchone()[0]
+            self._conn.execute("DELETE FROM signatures")
+            self._conn.execute("DELETE FROM bands")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('corpus_id', ?)",
+                (corpus_id,),
+            )
+            self._conn.commit()
+            self._pending.clear()
+            self._pending_bands.clear()
+        if not entries:
+            return True
+        print(
+            f"[WARN] {self.path} describes another database (cleared or "
+            "recreated); near-duplicate detection starts over"
+        )
+        return False
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT count(*) FROM signatures").fetchone()[0]
+        return {
+            "entries": entries,
+            "canonical": self.canonical,
+            "duplicates": self.duplicates,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@lru_cache(maxsize=None)
+def get_dedup_index() -> Optional[DedupIndex]:
+    """Return the process-wide index, or ``None`` when DEDUP_INDEX_PATH is empty."""
+    if not settings.DEDUP_INDEX_PATH:
+        return None
+    return DedupIndex(
+        path=settings.DEDUP_INDEX_PATH,
+        threshold=settings.DEDUP_THRESHOLD,
+        shingle=settings.DEDUP_SHINGLE,
+    )
+
+
+def bind_dedup_index(session) -> None:
+    """Reset the index if it was built against another database."""
+    index = get_dedup_index()
+    if index is not None:
+        index.bind(corpus_id(session))
+
+
+def _dedup_text(row: dict[str, Any]) -> str:
+    return f"{row.get('text_norm') or ''} {row.get('latex_raw') or ''}"
+
+
+def mark_duplicates(
+    rows: list[dict[str, object]], index: DedupIndex | None = None
+) -> int:
+    """Set ``canonical_id`` on near-duplicate rows (``None`` on the others).
+
+    Returns the number of duplicates found. A no-op when dedup is disabled.
+    """
+    index = index or get_dedup_index()
+    if index is None or not rows:
+        return 0
+    items = [(str(r["chunk_id"]), index.hasher.signature(_dedup_text(r))) for r in rows]
+    matches = index.match(items)
+    for r, canonical in zip(rows, matches):
+        r["canonical_id"] = canonical
+    return sum(1 for m in matches if m is not None)
+
+
+def confirm_canonical(chunk_ids: Sequence[str], written: bool = True) -> None:
+    """Settle the pending canonical chunks of a write (see ``DedupIndex``).
+
+    Written chunks are stored in the index; with ``written=False`` they are
+    dropped, so later chunks no longer match them.
+    """
+    index = get_dedup_index()
+    if index is None or not chunk_ids:
+        return
+    if written:
+        index.confirm(chunk_ids)
+    else:
+        index.release(chunk_ids)
+
+
+# ---- graph maintenance ----
+
+LINK_DUPLICATES = """
+UNWIND $links AS r
+MATCH (c:Chunk {chunk_id:r.chunk_id})
+OPTIONAL MATCH (canon:Chunk {chunk_id:r.canonical_id})
+WHERE canon.vec_text IS NOT NULL
+FOREACH (_ IN CASE WHEN canon IS NULL THEN [] ELSE [1] END |
+  MERGE (c)-[:DUPLICATE_OF]->(canon))
+WITH r, canon WHERE canon IS NULL
+RETURN r.chunk_id AS chunk_id, r.canonical_id AS canonical_id
+"""
+
+CHUNK_TEXTS = """
+UNWIND $chunk_ids AS id
+MATCH (c:Chunk {chunk_id:id})
+RETURN c.chunk_id AS chunk_id, c.text_norm AS text_norm, c.latex_raw AS latex_raw
+"""
+
+# Give a duplicate its own vectors and make it canonical
+PROMOTE_CHUNKS = """
+UNWIND $rows AS r
+MATCH (c:Chunk {chunk_id:r.chunk_id})
+OPTIONAL MATCH (c)-[dup:DUPLICATE_OF]->()
+DELETE dup
+WITH DISTINCT c, r
+CALL db.create.setNodeVectorProperty(c, 'vec_text', r.vec_text)
+WITH c, r
+CALL (c, r) {
+  WITH c, r WHERE r.vec_latex IS NOT NULL
+  CALL db.create.setNodeVectorProperty(c, 'vec_latex', r.vec_latex)
+}
+"""
+
+# Duplicates of chunks in the given documents, from other documents
+DEPENDENT_DUPLICATES = """
+UNWIND $doc_ids AS id
+MATCH (:Document {doc_id:id})-[:CONTAINS]->(:Section)-[:CONTAINS]->(canon:Chunk)
+MATCH (d:Chunk)-[:DUPLICATE_OF]->(canon)
+WHERE NOT d.source_hash IN $doc_ids
+RETURN canon.chunk_id AS canonical_id, collect(d.chunk_id) AS duplicates
+"""
+
+
+def link_duplicates(session, links: list[dict[str, str]]) -> list[str]:
+    """MERGE DUPLICATE_OF links; promote chunks whose canonical is gone.
+
+    A canonical can be missing when its document failed to ingest after it
+    was indexed; such chunks are embedded after all. Returns promoted ids.
+    """
+    if not links:
+        return []
+    orphans = session.run(LINK_DUPLICATES, links=links).data()
+    if not orphans:
+        return []
+    index = get_dedup_index()
+    if index is not None:
+        index.remove(sorted({o["canonical_id"] for o in orphans}))
+    promoted = [o["chunk_id"] for o in orphans]
+    promote_chunks(session, promoted)
+    return promoted
+
+
+def promote_chunks(session, chunk_ids: list[str]) -> None:
+    """Embed duplicate chunks, drop their DUPLICATE_OF link, index them."""
+    rows = session.run(CHUNK_TEXTS, chunk_ids=chunk_ids).data()
+    if not rows:
+        return
+    texts = [str(r["text_norm"] or "") for r in rows]
+    latex = [str(r["latex_raw"]) for r in rows if r["latex_raw"]]
+    vectors = embed_vectors(texts + latex)
+    latex_vecs = iter(vectors[len(rows) :])
+    for r, vec_text in zip(rows, vectors[: len(rows)]):
+        r["vec_text"] = vec_text
+        r["vec_latex"] = next(latex_vecs) if r["latex_raw"] else None
+    session.run(PROMOTE_CHUNKS, rows=rows).consume()
+    index = get_dedup_index()
+    if index is not None:
+        index.add([(r["chunk_id"], index.hasher.signature(_dedup_text(r))) for r in rows])
+
+
+def release_documents(session, doc_ids: list[str]) -> int:
+    """Prepare documents for deletion: re-home duplicates that point into them.
+
+    For each canonical chunk in ``doc_ids`` with duplicates elsewhere, one
+    duplicate is promoted (embedded) and the others are re-linked to it.
+    The documents' chunks are dropped from the LSH index. Returns the number
+    of promoted chunks.
+    """
+    groups = session.run(DEPENDENT_DUPLICATES, doc_ids=doc_ids).data()
+    index = get_dedup_index()
+    if index is not None:
+        index.remove_docs(doc_ids)
+    if not groups:
+        return 0
+    heirs = [sorted(g["duplicates"])[0] for g in groups]
+    promote_chunks(session, heirs)
+    relinks = [
+        {"chunk_id": d, "canonical_id": heir}
+        for g, heir in zip(groups, heirs)
+        for d in g["duplicates"]
+        if d != heir
+    ]
+    if relinks:
+        # drop links to the doomed canonical before re-linking
+        session.run(
+            "UNWIND $ids AS id MATCH (:Chunk {chunk_id:id})-[l:DUPLICATE_OF]->() DELETE l",
+            ids=[r["chunk_id"] for r in relinks],
+        ).consume()
+        link_duplicates(session, relinks)
+    return len(heirs)
+
+
+def format_stats(stats: dict[str, int]) -> str:
+    return (
+        f"near-duplicates: {stats['duplicates']} linked, "
+        f"{stats['canonical']} canonical, {stats['entries']} indexed"
+    )
@@ -1,22 +1,185 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Literal
+
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from pjs_neo_rag.neo_search import dual_vector_search
+from pjs_neo_rag.ai_providers import get_chat_provider, get_embedding_provider
+from pjs_neo_rag.answer import build_prompt
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.http_transport import aclose_transports
+from pjs_neo_rag.metrics import (
+    API_IN_FLIGHT,
+    API_REQUEST_SECONDS,
+    NEO4J_POOL_IN_USE,
+    neo4j_pool_in_use,
+    render,
+)
+from pjs_neo_rag.neo_search import (
+    BatchQuery,
+    SearchFilters,
+    aclose_async_driver,
+    active_drivers,
+    adual_vector_search,
+    ahierarchical_search,
+    ahybrid_search,
+    asearch_batch,
+    close_sync_driver,
+    get_async_driver,
+)
+from pjs_neo_rag.query_cache import get_query_cache
+from pjs_neo_rag.result_cache import (
+    Snapshot,
+    aget_many,
+    aput_many,
+    get_generation_tracker,
+    get_result_cache,
+    result_key,
+)
+from pjs_neo_rag.warmup import WarmupReport, awarmup
+
+
+async def _warmup(app: FastAPI) -> None:
+    try:
+        report = await asyncio.wait_for(
+            awarmup(get_async_driver()), settings.WARMUP_TIMEOUT
+        )
+    except TimeoutError:
+        report = WarmupReport(
+            seconds=settings.WARMUP_TIMEOUT,
+            errors=[f"timed out after {settings.WARMUP_TIMEOUT:g}s"],
+        )
+        print(f"[WARN] Warmup timed out after {settings.WARMUP_TIMEOUT:g}s")
+    else:
+        print(f"✅ Warmup finished in {report.seconds:.1f}s")
+    app.state.warmup = report
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # runs once per worker process: the Neo4j pool and the embedding
+    # backend's HTTP clients belong to this worker's event loop
+    get_async_driver()
+    get_embedding_provider()
+    get_chat_provider()
+    # warm up in the background; /health answers 503 until it is done
+    app.state.warmup = None
+    warmup = asyncio.create_task(_warmup(app)) if settings.WARMUP_ENABLED else None
+    yield
+    if warmup is not None:
+        warmup.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmup
+    await aclose_async_driver()
+    await aclose_transports()
+    close_sync_driver()
+
+
+app = FastAPI(title="GraphRAG Retriever", version="0.1", lifespan=lifespan)
+
 
-app = FastAPI(title="GraphRAG Retriever", version="0.1")
+@app.middleware("http")
+async def track_requests(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    # label by route, not raw path, to keep the series count bounded
+    path = request.url.path
+    endpoint = path if path in _ROUTES else "other"
+    start = time.perf_counter()
+    if endpoint in _STREAMED:
+        # the stream records itself when it ends (see _answer_events); only
+        # requests rejected before streaming are recorded here
+        response = await call_next(request)
+        if response.status_code != 200:
+            API_REQUEST_SECONDS.labels(
+                endpoint=endpoint, status=str(response.status_code)
+            ).observe(time.perf_counter() - start)
+        return response
+    status = 500
+    with API_IN_FLIGHT.labels(endpoint=endpoint).track_inprogress():
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            API_REQUEST_SECONDS.labels(endpoint=endpoint, status=str(status)).observe(
+                time.perf_counter() - start
+            )
 
 
 # ---- Health check ----
 @app.get("/health", tags=["system"], summary="Health check endpoint")
-def health_check() -> dict[str, str]:
-    """Return service health status for container orchestration."""
-    return {"status": "healthy"}
+def health_check(response: Response) -> dict[str, Any]:
+    """Readiness for container orchestration: 503 until the warmup has run.
+
+    A warmup step that failed (backend down, index missing) is reported as
+    ``degraded``; the service still takes traffic.
+    """
+    if not settings.WARMUP_ENABLED:
+        return {"status": "healthy"}
+    report: WarmupReport | None = getattr(app.state, "warmup", None)
+    if report is None:
+        response.status_code = 503
+        return {"status": "warming_up"}
+    return {
+        "status": "degraded" if report.errors else "healthy",
+        "warmup": report.as_dict(),
+    }
+
+
+@app.get("/metrics", tags=["system"], summary="Prometheus metrics")
+def metrics() -> Response:
+    """Latency histograms, counters and pool gauges in Prometheus text format."""
+    for name, driver in active_drivers().items():
+        NEO4J_POOL_IN_USE.labels(driver=name).set(neo4j_pool_in_use(driver))
+    body, content_type = render()
+    return Response(body, media_type=content_type)
+
+
+@app.get("/stats", tags=["system"], summary="Cache statistics")
+def stats() -> dict[str, dict[str, float | int | str] | None]:
+    """Size and hit rate of the query embedding and search result caches."""
+    results = get_result_cache()
+    return {
+        "query_embeddings": get_query_cache().stats(),
+        "search_results": results.stats() if results is not None else None,
+    }
 
 
 # ---- request/response ----
 class SearchReq(BaseModel):
     query: str
     k: int = 8
-    mathy: bool = False  # allow UI to hint "math-heavy"
+    mathy: bool = False  # allow UI to hint "math-heavy" (weights LaTeX signals up)
+    # "hybrid": vector + BM25 with rank fusion; "flat": max cosine score of
+    # the two vector indexes; "hierarchical": rank sections first, then score
+    # chunks inside them. Defaults to SEARCH_MODE (flat). Hybrid scores are
+    # rank-fusion sums (~0.01-0.05), not cosine similarities in [0, 1].
+    mode: Literal["flat", "hybrid", "hierarchical"] | None = None
+    # Also return up to ``window`` neighbouring chunks (max 5) on each side of
+    # every hit; overlapping windows are merged into one passage
+    window: int = 0
+    # Optional filters ("chat with this paper"). Filtered and windowed
+    # requests are always served by the flat dual-vector search, whatever
+    # ``mode`` says.
+    doc_id: str | None = None
+    path_prefix: str | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+    source_type: str | None = None
+
+    def filters(self) -> SearchFilters:
+        return SearchFilters(
+            doc_id=self.doc_id,
+            path_prefix=self.path_prefix,
+            page_from=self.page_from,
+            page_to=self.page_to,
+            source_type=self.source_type,
+        )
 
 
 class Passage(BaseModel):
@@ -25,7 +188,31 @@ class Passage(BaseModel):
     latex: str | None = ""
     page_start: int
     page_end: int
+    duplicates: int = 0  # near-duplicate copies collapsed into this passage
     score: float
+    chunk_ids: list[str] = []  # window requests: the merged chunks, in order
+
+
+def _flat_only(req: SearchReq) -> bool:
+    return bool(req.filters()) or req.window > 0
+
+
+def _mode(req: SearchReq) -> str:
+    return "flat" if _flat_only(req) else req.mode or settings.SEARCH_MODE
+
+
+def _result_key(snapshot: Snapshot, mode: str, req: SearchReq) -> str:
+    mathy = req.mathy and mode == "hybrid"  # other modes ignore the hint
+    filters = req.filters()
+    return result_key(
+        snapshot,
+        mode,
+        req.query,
+        req.k,
+        mathy,
+        filters.params() if filters else None,
+        req.window,
+    )
 
 
 @app.post(
@@ -34,8 +221,156 @@ class Passage(BaseModel):
     response_model=list[Passage],
     tags=["graphrag"],
     summary="Search Neo4j knowledge graph",
-    description="Dual-vector search across text and LaTeX embeddings",
+    description=(
+        "Search passages by meaning. `mode` picks flat (best text or LaTeX "
+        "vector score, the default), hybrid (text and LaTeX vectors plus LaTeX "
+        "BM25, fused by rank; `mathy` boosts the LaTeX signals) or "
+        "hierarchical (top sections first). Filtered and windowed requests "
+        "are always flat."
+    ),
 )
-def graphrag_search(req: SearchReq) -> list[Passage]:
-    results = dual_vector_search(req.query, req.k)
-    return [Passage(**result) for result in results]
+async def graphrag_search(req: SearchReq) -> list[Passage]:
+    return [Passage(**result) for result in await _search(req)]
+
+
+async def _search(req: SearchReq) -> list[dict[str, Any]]:
+    # async end to end: no threadpool thread is held while waiting on the
+    # embedding backend or Neo4j
+    mode = _mode(req)
+    # cache hits skip embedding and Neo4j (bar a periodic generation check)
+    cache = get_result_cache()
+    if cache is not None:
+        snapshot = await get_generation_tracker().acurrent(get_async_driver())
+        key = _result_key(snapshot, mode, req)
+        (cached,) = await aget_many(cache, [key])
+        if cached is not None:
+            return cached
+
+    if mode == "hierarchical":
+        results = await ahierarchical_search(req.query, req.k)
+    elif mode == "hybrid":
+        results = await ahybrid_search(req.query, req.k, mathy=req.mathy)
+    else:
+        results = await adual_vector_search(
+            req.query, req.k, req.filters(), req.window
+        )
+    if cache is not None:
+        await aput_many(cache, [(key, results)])
+    return results
+
+
+@app.post(
+    "/search/batch",
+    operation_id="graphrag_search_batch",
+    response_model=list[list[Passage]],
+    tags=["graphrag"],
+    summary="Run many searches in one request",
+    description=(
+        "Batch form of /search for evaluation jobs and agents: all queries are "
+        "embedded in one call and searched with one Cypher query per mode. "
+        "Results are returned in input order."
+    ),
+)
+async def graphrag_search_batch(reqs: list[SearchReq]) -> list[list[Passage]]:
+    if len(reqs) > settings.SEARCH_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.SEARCH_BATCH_MAX} queries per batch",
+        )
+    modes = [_mode(req) for req in reqs]
+    results: list[list[dict[str, Any]] | None] = [None] * len(reqs)
+    keys: list[str] = []
+    cache = get_result_cache()
+    if cache is not None:
+        snapshot = await get_generation_tracker().acurrent(get_async_driver())
+        keys = [_result_key(snapshot, m, req) for m, req in zip(modes, reqs)]
+        results = await aget_many(cache, keys)
+
+    missing = [i for i, found in enumerate(results) if found is None]
+    # filtered/windowed queries plan their own Cypher; the rest share UNWIND
+    # queries
+    filtered = [i for i in missing if _flat_only(reqs[i])]
+    todo = [i for i in missing if not _flat_only(reqs[i])]
+    fresh, *fresh_filtered = await asyncio.gather(
+        asearch_batch(
+            [BatchQuery(reqs[i].query, reqs[i].k, modes[i], reqs[i].mathy) for i in todo]
+        ),
+        *(
+            adual_vector_search(
+                reqs[i].query, reqs[i].k, reqs[i].filters(), reqs[i].window
+            )
+            for i in filtered
+        ),
+    )
+    for i, found in zip(todo + filtered, fresh + fresh_filtered):
+        results[i] = found
+    if cache is not None:
+        await aput_many(cache, [(keys[i], results[i]) for i in todo + filtered])
+    return [[Passage(**result) for result in found or []] for found in results]
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _answer_events(req: SearchReq, start: float) -> AsyncIterator[str]:
+    # timed from ``start`` (request arrival) to the end of the stream; a
+    # client that disconnects mid-stream is recorded as "cancelled"
+    status = "cancelled"
+    in_flight = API_IN_FLIGHT.labels(endpoint="/answer")
+    in_flight.inc()
+    provider = get_chat_provider()
+    # load the chat model while retrieval runs
+    load = asyncio.create_task(provider.aload_chat_model())
+    try:
+        passages = await _search(req)
+        prompt, used = build_prompt(req.query, passages)
+        yield _sse(
+            "passages",
+            [
+                {key: p[key] for key in ("chunk_id", "page_start", "page_end", "score")}
+                for p in passages[:used]
+            ],
+        )
+        with suppress(Exception):
+            await load  # best effort: a real failure surfaces in the stream
+        async for piece in provider.astream_chat(prompt):
+            yield _sse("token", {"text": piece})
+        status = "200"
+        yield _sse("done", {})
+    except Exception as e:  # the 200 is already sent; report in-band
+        status = "error"
+        print(f"[WARN] /answer failed: {e}")
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        load.cancel()
+        in_flight.dec()
+        API_REQUEST_SECONDS.labels(endpoint="/answer", status=status).observe(
+            time.perf_counter() - start
+        )
+
+
+@app.post(
+    "/answer",
+    operation_id="graphrag_answer",
+    response_class=StreamingResponse,
+    tags=["graphrag"],
+    summary="Answer a question from the knowledge graph",
+    description=(
+        "Retrieves passages like /search, packs them into a prompt within "
+        "ANSWER_CONTEXT_TOKENS and streams the chat model's answer as "
+        "server-sent events: `passages` (cited as [n], in order), then one "
+        "`token` event per text piece, then `done` (or `error`)."
+    ),
+)
+async def graphrag_answer(req: SearchReq) -> StreamingResponse:
+    return StreamingResponse(
+        _answer_events(req, time.perf_counter()),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+_ROUTES = frozenset(route.path for route in app.routes)
+# endpoints whose response is a stream that records its own metrics
+_STREAMED = frozenset({"/answer"})
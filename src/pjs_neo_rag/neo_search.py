@@ -1,76 +1,994 @@
 """
 Core search logic for dual-vector RAG retrieval.
 Separate from API layer for reusability and testing.
+
+Each search has a sync form (scripts, tests) and an async form for the API,
+which uses the non-blocking embedding client and ``AsyncGraphDatabase``.
+
+With VECTOR_BACKEND=mmap the flat and hybrid searches (single and batch)
+take their vector candidates from the in-process index in ``mmap_index`` and
+use Neo4j only to fetch the passages (plus BM25 for hybrid) in a single
+round-trip.
 """
 
-from typing import Any
+import asyncio
+import math
+import re
+import threading
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Sequence
 
-from neo4j import GraphDatabase
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
 
 from pjs_neo_rag.config import settings
-from pjs_neo_rag.embeddings import embed_vector
+from pjs_neo_rag.metrics import search_stage
+from pjs_neo_rag.query_cache import (
+    aembed_queries,
+    aembed_query,
+    embed_queries,
+    embed_query,
+)
+
+if TYPE_CHECKING:
+    from pjs_neo_rag.mmap_index import MmapIndex
 
 
 # ---- database connection ----
-driver = GraphDatabase.driver(
-    settings.NEO4J_URI, auth=(settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD)
-)
+# One sync and one async driver per process, created on first use with the
+# NEO4J_POOL_* settings; the API opens and closes them in its lifespan hook.
+_driver: Driver | None = None
+_driver_lock = threading.Lock()
+_async_driver: AsyncDriver | None = None
+
+
+def _driver_config() -> dict[str, Any]:
+    return {
+        "auth": (settings.NEO4J_USERNAME, settings.NEO4J_PASSWORD),
+        "max_connection_pool_size": settings.NEO4J_POOL_SIZE,
+        "connection_acquisition_timeout": settings.NEO4J_ACQUIRE_TIMEOUT,
+        "max_connection_lifetime": settings.NEO4J_MAX_CONN_LIFETIME,
+    }
+
+
+def get_sync_driver() -> Driver:
+    """Shared sync driver for scripts and tests."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(settings.NEO4J_URI, **_driver_config())
+    return _driver
+
+
+def get_async_driver() -> AsyncDriver:
+    """Shared async driver, created on first use inside the event loop."""
+    global _async_driver
+    if _async_driver is None:
+        _async_driver = AsyncGraphDatabase.driver(
+            settings.NEO4J_URI, **_driver_config()
+        )
+    return _async_driver
+
+
+def close_sync_driver() -> None:
+    global _driver
+    with _driver_lock:
+        if _driver is not None:
+            _driver.close()
+            _driver = None
+
+
+def active_drivers() -> dict[str, Driver | AsyncDriver]:
+    """The drivers opened so far in this process, by kind."""
+    drivers: dict[str, Driver | AsyncDriver] = {}
+    if _driver is not None:
+        drivers["sync"] = _driver
+    if _async_driver is not None:
+        drivers["async"] = _async_driver
+    return drivers
+
+
+async def aclose_async_driver() -> None:
+    global _async_driver
+    if _async_driver is not None:
+        await _async_driver.close()
+        _async_driver = None
+
+
+# ---- queries ----
+# Flat searches are a "hits" prefix binding (n, score) in rank order plus
+# one of the RETURN tails below (see ``_passages``).
+PASSAGE_RETURN = """
+RETURN n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       // n is a canonical, or (filtered search) a duplicate standing in for it
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) }
+         + COUNT { (n)-[:DUPLICATE_OF]->(:Chunk)<-[:DUPLICATE_OF]-(:Chunk) } AS duplicates,
+       score
+"""
+
+# Each hit with up to {window} chunks before and after it along NEXT, in
+# document order; merged into passages by ``_merge_windows``
+WINDOW_RETURN = """
+WITH n, score,
+     COUNT {{ (:Chunk)-[:DUPLICATE_OF]->(n) }}
+       + COUNT {{ (n)-[:DUPLICATE_OF]->(:Chunk)<-[:DUPLICATE_OF]-(:Chunk) }} AS duplicates
+CALL (n) {{
+  MATCH p = (x:Chunk)-[:NEXT*0..{window}]->(n)
+  RETURN x, -length(p) AS offset
+  UNION
+  MATCH p = (n)-[:NEXT*1..{window}]->(x:Chunk)
+  RETURN x, length(p) AS offset
+}}
+WITH n, score, duplicates, x, offset
+ORDER BY offset
+WITH n, score, duplicates,
+     collect({{chunk_id: x.chunk_id,
+               text: x.text_norm,
+               latex: x.latex_raw,
+               page_start: x.page_start,
+               page_end: x.page_end}}) AS window
+RETURN n.chunk_id AS chunk_id, duplicates, score, window
+ORDER BY score DESC
+"""
+
+# Text and LaTeX indexes are searched in one round-trip; a chunk found by
+# both keeps its higher score.
+DUAL_VECTOR_HITS = """
+CALL () {
+  CALL db.index.vector.queryNodes('chunk_vec_text', $k_prose, $v)
+    YIELD node, score
+  RETURN node AS n, score
+  UNION
+  CALL db.index.vector.queryNodes('chunk_vec_latex', $k_latex, $v)
+    YIELD node, score
+  RETURN node AS n, score
+}
+WITH n, max(score) AS score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+DUAL_VECTOR_CYPHER = DUAL_VECTOR_HITS + PASSAGE_RETURN
+
+# Ranked candidates from each signal; fused in Python (``_rrf``)
+HYBRID_CYPHER = """
+CALL () {
+  CALL db.index.vector.queryNodes('chunk_vec_text', $k_prose, $v)
+    YIELD node, score
+  RETURN 'prose' AS source, node AS n, score
+  UNION ALL
+  CALL db.index.vector.queryNodes('chunk_vec_latex', $k_latex, $v)
+    YIELD node, score
+  RETURN 'latex' AS source, node AS n, score
+  UNION ALL
+  WITH $ft_query AS ft WHERE ft <> '' AND $k_bm25 > 0
+  CALL db.index.fulltext.queryNodes('latex_fulltext', ft, {limit: $k_bm25})
+    YIELD node, score
+  // near-duplicates stand in for their canonical chunk
+  OPTIONAL MATCH (node)-[:DUPLICATE_OF]->(canon:Chunk)
+  RETURN 'bm25' AS source, coalesce(canon, node) AS n, score
+}
+RETURN source,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+# VECTOR_BACKEND=mmap: passages for vector hits found in-process
+FETCH_CHUNKS_HITS = """
+UNWIND $hits AS h
+MATCH (n:Chunk {chunk_id:h.chunk_id})
+WITH n, h.score AS score
+"""
+
+MMAP_HYBRID_CYPHER = """
+CALL () {
+  UNWIND $hits AS h
+  MATCH (n:Chunk {chunk_id:h.chunk_id})
+  RETURN h.source AS source, n, h.score AS score
+  UNION ALL
+  WITH $ft_query AS ft WHERE ft <> '' AND $k_bm25 > 0
+  CALL db.index.fulltext.queryNodes('latex_fulltext', ft, {limit: $k_bm25})
+    YIELD node, score
+  OPTIONAL MATCH (node)-[:DUPLICATE_OF]->(canon:Chunk)
+  RETURN 'bm25' AS source, coalesce(canon, node) AS n, score
+}
+RETURN source,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+HIERARCHICAL_CYPHER = """
+CALL db.index.vector.queryNodes('section_vec', $n_sections, $v)
+  YIELD node AS s
+MATCH (s)-[:CONTAINS]->(m:Chunk)
+// near-duplicates stand in for their canonical chunk
+OPTIONAL MATCH (m)-[:DUPLICATE_OF]->(canon:Chunk)
+WITH DISTINCT coalesce(canon, m) AS n
+WHERE n.vec_text IS NOT NULL
+WITH n,
+     vector.similarity.cosine(n.vec_text, $v) AS t_score,
+     CASE WHEN n.vec_latex IS NULL THEN 0.0
+          ELSE vector.similarity.cosine(n.vec_latex, $v) END AS l_score
+RETURN n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       CASE WHEN l_score > t_score THEN l_score ELSE t_score END AS score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+# Batch forms: one row per query in $queries ({i, v, ft}), results tagged with
+# the query index ``i``. $k is the largest k in the batch; each query's list
+# is cut to its own k in Python.
+BATCH_DUAL_VECTOR_CYPHER = """
+UNWIND $queries AS q
+CALL (q) {
+  CALL (q) {
+    CALL db.index.vector.queryNodes('chunk_vec_text', $k_prose, q.v)
+      YIELD node, score
+    RETURN node AS n, score
+    UNION
+    CALL db.index.vector.queryNodes('chunk_vec_latex', $k_latex, q.v)
+      YIELD node, score
+    RETURN node AS n, score
+  }
+  WITH n, max(score) AS score
+  ORDER BY score DESC
+  LIMIT $k
+  RETURN n, score
+}
+RETURN q.i AS i,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+BATCH_HYBRID_CYPHER = """
+UNWIND $queries AS q
+CALL (q) {
+  CALL db.index.vector.queryNodes('chunk_vec_text', $k_prose, q.v)
+    YIELD node, score
+  RETURN 'prose' AS source, node AS n, score
+  UNION ALL
+  CALL db.index.vector.queryNodes('chunk_vec_latex', $k_latex, q.v)
+    YIELD node, score
+  RETURN 'latex' AS source, node AS n, score
+  UNION ALL
+  WITH q WHERE q.ft <> '' AND $k_bm25 > 0
+  CALL db.index.fulltext.queryNodes('latex_fulltext', q.ft, {limit: $k_bm25})
+    YIELD node, score
+  OPTIONAL MATCH (node)-[:DUPLICATE_OF]->(canon:Chunk)
+  RETURN 'bm25' AS source, coalesce(canon, node) AS n, score
+}
+RETURN q.i AS i,
+       source,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+BATCH_HIERARCHICAL_CYPHER = """
+UNWIND $queries AS q
+CALL (q) {
+  CALL db.index.vector.queryNodes('section_vec', $n_sections, q.v)
+    YIELD node AS s
+  MATCH (s)-[:CONTAINS]->(m:Chunk)
+  OPTIONAL MATCH (m)-[:DUPLICATE_OF]->(canon:Chunk)
+  WITH DISTINCT q, coalesce(canon, m) AS n
+  WHERE n.vec_text IS NOT NULL
+  WITH n,
+       vector.similarity.cosine(n.vec_text, q.v) AS t_score,
+       CASE WHEN n.vec_latex IS NULL THEN 0.0
+            ELSE vector.similarity.cosine(n.vec_latex, q.v) END AS l_score
+  RETURN n, CASE WHEN l_score > t_score THEN l_score ELSE t_score END AS score
+  ORDER BY score DESC
+  LIMIT $k
+}
+RETURN q.i AS i,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+BATCH_CYPHER = {
+    "flat": BATCH_DUAL_VECTOR_CYPHER,
+    "hybrid": BATCH_HYBRID_CYPHER,
+    "hierarchical": BATCH_HIERARCHICAL_CYPHER,
+}
+
+# VECTOR_BACKEND=mmap: each query row carries its in-process hits ({i, hits, ft})
+BATCH_MMAP_FLAT_CYPHER = """
+UNWIND $queries AS q
+UNWIND q.hits AS h
+MATCH (n:Chunk {chunk_id:h.chunk_id})
+RETURN q.i AS i,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       h.score AS score
+"""
+
+BATCH_MMAP_HYBRID_CYPHER = """
+UNWIND $queries AS q
+CALL (q) {
+  UNWIND q.hits AS h
+  MATCH (n:Chunk {chunk_id:h.chunk_id})
+  RETURN h.source AS source, n, h.score AS score
+  UNION ALL
+  WITH q WHERE q.ft <> '' AND $k_bm25 > 0
+  CALL db.index.fulltext.queryNodes('latex_fulltext', q.ft, {limit: $k_bm25})
+    YIELD node, score
+  OPTIONAL MATCH (node)-[:DUPLICATE_OF]->(canon:Chunk)
+  RETURN 'bm25' AS source, coalesce(canon, node) AS n, score
+}
+RETURN q.i AS i,
+       source,
+       n.chunk_id AS chunk_id,
+       n.text_norm AS text,
+       n.latex_raw AS latex,
+       n.page_start AS page_start,
+       n.page_end AS page_end,
+       COUNT { (:Chunk)-[:DUPLICATE_OF]->(n) } AS duplicates,
+       score
+"""
+
+BATCH_MMAP_CYPHER = {
+    "flat": BATCH_MMAP_FLAT_CYPHER,
+    "hybrid": BATCH_MMAP_HYBRID_CYPHER,
+}
+
+
+# ---- filtered search ----
+# Neo4j vector indexes cannot pre-filter, so a filtered search first counts
+# the chunks the filters admit. Few enough -> exact cosine scan of just those
+# chunks; otherwise the ANN pools are widened by 1/selectivity and the hits
+# filtered afterwards (falling back to the exact scan if that comes up short).
+# Near-duplicates have no vectors and are scored with their canonical's.
+FILTER_COUNT_CYPHER = """
+{match}
+WITH count(DISTINCT c) AS matched
+RETURN matched, COUNT {{ (:Chunk) }} AS total
+"""
+
+FILTER_EXACT_HITS = """
+{match}
+WITH DISTINCT c
+OPTIONAL MATCH (c)-[:DUPLICATE_OF]->(canon:Chunk)
+WITH c, coalesce(canon, c) AS v
+WHERE v.vec_text IS NOT NULL
+// one hit per canonical, as in FILTER_ANN_HITS: itself if it passes the
+// filters, else one of its admitted near-duplicates
+WITH v, collect(c) AS hits
+WITH CASE WHEN v IN hits THEN v ELSE hits[0] END AS n,
+     vector.similarity.cosine(v.vec_text, $v) AS t_score,
+     CASE WHEN v.vec_latex IS NULL THEN 0.0
+          ELSE vector.similarity.cosine(v.vec_latex, $v) END AS l_score
+WITH n, CASE WHEN l_score > t_score THEN l_score ELSE t_score END AS score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+FILTER_ANN_HITS = """
+CALL () {{
+  CALL db.index.vector.queryNodes('chunk_vec_text', $k_prose, $v)
+    YIELD node, score
+  RETURN node AS n, score
+  UNION
+  CALL db.index.vector.queryNodes('chunk_vec_latex', $k_latex, $v)
+    YIELD node, score
+  RETURN node AS n, score
+}}
+WITH n, max(score) AS score
+// a hit counts if it, or one of its near-duplicates, passes the filters
+CALL (n) {{
+  RETURN n AS c
+  UNION
+  MATCH (c:Chunk)-[:DUPLICATE_OF]->(n)
+  RETURN c
+}}
+WITH n, score, c
+WHERE {where}
+WITH n, score, collect(c) AS hits
+WITH CASE WHEN n IN hits THEN n ELSE hits[0] END AS n, score
+ORDER BY score DESC
+LIMIT $k
+"""
+
+
+@dataclass(slots=True)
+class SearchFilters:
+    """Restrict a search to one document, a path prefix, pages or a source type."""
+
+    doc_id: str | None = None
+    path_prefix: str | None = None
+    page_from: int | None = None
+    page_to: int | None = None
+    source_type: str | None = None
+
+    def __bool__(self) -> bool:
+        return any(
+            value is not None
+            for value in (
+                self.doc_id,
+                self.path_prefix,
+                self.page_from,
+                self.page_to,
+                self.source_type,
+            )
+        )
+
+    def params(self) -> dict[str, Any]:
+        return {
+            "doc_id": self.doc_id,
+            "path_prefix": self.path_prefix,
+            "page_from": self.page_from,
+            "page_to": self.page_to,
+            "source_type": self.source_type,
+        }
+
+    def where(self, var: str = "c", path: bool = True) -> str:
+        """Cypher predicate on chunk ``var`` (only the filters that are set)."""
+        conds = []
+        if self.doc_id is not None:
+            conds.append(f"{var}.source_hash = $doc_id")
+        if self.source_type is not None:
+            conds.append(f"{var}.source_type = $source_type")
+        if self.page_from is not None:
+            conds.append(f"{var}.page_end >= $page_from")
+        if self.page_to is not None:
+            conds.append(f"{var}.page_start <= $page_to")
+        if path and self.path_prefix is not None:
+            conds.append(
+                "EXISTS { (d:Document)-[:CONTAINS]->(:Section)-[:CONTAINS]->"
+                f"({var}) WHERE d.path STARTS WITH $path_prefix }}"
+            )
+        return " AND ".join(conds) or "true"
+
+    def match(self) -> str:
+        """MATCH clause binding ``c`` to the admitted chunks."""
+        if self.path_prefix is not None and self.doc_id is None:
+            # anchor on the (indexed) document path
+            return (
+                "MATCH (d:Document)-[:CONTAINS]->(:Section)-[:CONTAINS]->(c:Chunk)\n"
+                f"WHERE d.path STARTS WITH $path_prefix AND {self.where(path=False)}"
+            ).removesuffix(" AND true")
+        return f"MATCH (c:Chunk)\nWHERE {self.where()}"
+
+
+def _filtered_pool(matched: int, total: int) -> int | None:
+    """ANN pool size for a filter admitting ``matched`` of ``total`` chunks,
+    or ``None`` when an exact scan is cheaper."""
+    if matched <= settings.FILTER_EXACT_MAX:
+        return None
+    pool = math.ceil(max(settings.K_PROSE, settings.K_LATEX) * total / matched)
+    return min(pool, settings.FILTER_MAX_POOL)
+
+
+def _filtered_params(
+    filters: SearchFilters, v_query: Any, k: int, pool: int
+) -> dict[str, Any]:
+    return {
+        "v": v_query,
+        "k": k,
+        "k_prose": max(settings.K_PROSE, pool),
+        "k_latex": max(settings.K_LATEX, pool),
+        **filters.params(),
+    }
+
+
+def _filtered_search(
+    s, filters: SearchFilters, v_query: Any, k: int, window: int = 0
+) -> list[dict[str, Any]]:
+    params = {"v": v_query, "k": k, **filters.params()}
+    with search_stage("flat", "filter_count"):
+        counts = s.run(
+            FILTER_COUNT_CYPHER.format(match=filters.match()), **params
+        ).single()
+    if not counts or not counts["matched"]:
+        return []
+    pool = _filtered_pool(counts["matched"], counts["total"])
+    if pool is not None:
+        with search_stage("flat", "neo4j"):
+            rows = s.run(
+                _passages(FILTER_ANN_HITS.format(where=filters.where()), window),
+                **_filtered_params(filters, v_query, k, pool),
+            ).data()
+        if len(rows) >= min(k, counts["matched"]):
+            return rows
+    exact = _passages(FILTER_EXACT_HITS.format(match=filters.match()), window)
+    with search_stage("flat", "neo4j"):
+        return s.run(exact, **params).data()
+
+
+async def _afiltered_search(
+    s, filters: SearchFilters, v_query: Any, k: int, window: int = 0
+) -> list[dict[str, Any]]:
+    params = {"v": v_query, "k": k, **filters.params()}
+    with search_stage("flat", "filter_count"):
+        result = await s.run(
+            FILTER_COUNT_CYPHER.format(match=filters.match()), **params
+        )
+        counts = await result.single()
+    if not counts or not counts["matched"]:
+        return []
+    pool = _filtered_pool(counts["matched"], counts["total"])
+    if pool is not None:
+        with search_stage("flat", "neo4j"):
+            result = await s.run(
+                _passages(FILTER_ANN_HITS.format(where=filters.where()), window),
+                **_filtered_params(filters, v_query, k, pool),
+            )
+            rows = await result.data()
+        if len(rows) >= min(k, counts["matched"]):
+            return rows
+    exact = _passages(FILTER_EXACT_HITS.format(match=filters.match()), window)
+    with search_stage("flat", "neo4j"):
+        result = await s.run(exact, **params)
+        return await result.data()
+
+
+def _limit(k: int) -> int:
+    return max(1, min(k, 20))
+
+
+def _window(window: int) -> int:
+    return max(0, min(window, 5))
+
+
+def _passages(hits: str, window: int) -> str:
+    """Complete a hits prefix with plain or ``window``-expanded passages."""
+    if window <= 0:
+        return hits + PASSAGE_RETURN
+    return hits + WINDOW_RETURN.format(window=window)
+
+
+def _union(a: list[dict[str, Any]], b: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Union of two overlapping runs of the same NEXT chain, in chain order."""
+    a_ids = {c["chunk_id"] for c in a}
+    if b[0]["chunk_id"] in a_ids:
+        return a + [c for c in b if c["chunk_id"] not in a_ids]
+    b_ids = {c["chunk_id"] for c in b}
+    return b + [c for c in a if c["chunk_id"] not in b_ids]
+
+
+def _merge_windows(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Turn windowed rows into passages; overlapping windows become one.
+
+    A merged passage keeps the chunk_id, score and duplicates of its best
+    hit and lists its chunks in document order in ``chunk_ids``.
+    """
+    groups: list[dict[str, Any]] = []
+    for row in sorted(rows, key=lambda r: r["score"], reverse=True):
+        chunks = row["window"]
+        ids = {c["chunk_id"] for c in chunks}
+        overlapping = [g for g in groups if ids & g["ids"]]
+        if not overlapping:
+            groups.append({"hit": row, "chunks": chunks, "ids": ids})
+            continue
+        # a window can bridge several earlier groups; fold them into the first
+        target = overlapping[0]
+        target["chunks"] = _union(target["chunks"], chunks)
+        for other in overlapping[1:]:
+            target["chunks"] = _union(target["chunks"], other["chunks"])
+            groups.remove(other)
+        target["ids"] = {c["chunk_id"] for c in target["chunks"]}
+
+    passages = []
+    for group in groups:
+        hit, chunks = group["hit"], group["chunks"]
+        passages.append(
+            {
+                "chunk_id": hit["chunk_id"],
+                "text": "\n".join(c["text"] or "" for c in chunks),
+                "latex": "\n".join(c["latex"] for c in chunks if c["latex"]),
+                "page_start": min(c["page_start"] for c in chunks),
+                "page_end": max(c["page_end"] for c in chunks),
+                "duplicates": hit["duplicates"],
+                "score": hit["score"],
+                "chunk_ids": [c["chunk_id"] for c in chunks],
+            }
+        )
+    return passages
+
+
+def _pools() -> dict[str, int]:
+    return {"k_prose": settings.K_PROSE, "k_latex": settings.K_LATEX}
+
+
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+def fulltext_query(query: str) -> str:
+    """Turn free text into a Lucene query (escaped terms, OR-ed together)."""
+    terms = []
+    for token in query.split():
+        if token in {"AND", "OR", "NOT"}:
+            token = token.lower()
+        terms.append(_LUCENE_SPECIAL.sub(r"\\\1", token))
+    return " ".join(terms)
+
+
+def fusion_weights(mathy: bool = False) -> dict[str, float]:
+    """Per-signal RRF weights; ``mathy`` boosts the LaTeX signals."""
+    boost = settings.MATHY_LATEX_BOOST if mathy else 1.0
+    return {
+        "prose": settings.PROSE_QUERY_WEIGHT,
+        "latex": settings.LATEX_QUERY_WEIGHT * boost,
+        "bm25": settings.BM25_LATEX_WEIGHT * boost,
+    }
+
+
+def _rrf(rows: list[dict[str, Any]], mathy: bool, k: int) -> list[dict[str, Any]]:
+    """Weighted reciprocal rank fusion: sum of w_source / (RRF_K + rank)."""
+    weights = fusion_weights(mathy)
+    by_source: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        by_source.setdefault(row["source"], []).append(row)
+
+    fused: dict[str, dict[str, Any]] = {}
+    for source, hits in by_source.items():
+        hits.sort(key=lambda r: r["score"], reverse=True)
+        seen: set[str] = set()
+        rank = 0
+        for hit in hits:
+            if hit["chunk_id"] in seen:  # several duplicates of one canonical
+                continue
+            seen.add(hit["chunk_id"])
+            rank += 1
+            entry = fused.get(hit["chunk_id"])
+            if entry is None:
+                entry = {key: v for key, v in hit.items() if key != "source"}
+                entry["score"] = 0.0
+                fused[hit["chunk_id"]] = entry
+            entry["score"] += weights.get(source, 0.0) / (settings.RRF_K + rank)
+
+    ranked = sorted(fused.values(), key=lambda r: r["score"], reverse=True)
+    return ranked[:k]
+
+
+def _mmap() -> "MmapIndex | None":
+    """The in-process index when VECTOR_BACKEND=mmap and one has been built."""
+    if settings.VECTOR_BACKEND != "mmap":
+        return None
+    from pjs_neo_rag.mmap_index import get_mmap_index
+
+    return get_mmap_index()
+
+
+def _by_score(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return sorted(rows, key=lambda r: r["score"], reverse=True)
+
+
+def _bm25_params(query: str) -> dict[str, Any]:
+    return {"ft_query": fulltext_query(query), "k_bm25": settings.K_BM25}
+
+
+def _hybrid_params(query: str, v_query: Any) -> dict[str, Any]:
+    return {"v": v_query, **_bm25_params(query), **_pools()}
 
 
 # ---- core search logic ----
-def dual_vector_search(query: str, k: int = 8) -> list[dict[str, Any]]:
+def dual_vector_search(
+    query: str,
+    k: int = 8,
+    filters: SearchFilters | None = None,
+    window: int = 0,
+) -> list[dict[str, Any]]:
     """
     Perform dual vector search (text + latex embeddings) and merge results.
 
     Args:
         query: Search query string
         k: Number of results to return (max 20)
+        filters: Optional document / path / page / source type restriction;
+            selective filters switch to an exact scan of the admitted chunks,
+            broad ones widen the ANN candidate pools
+        window: Also return up to this many chunks (max 5) before and after
+            each hit along NEXT, in the same query; overlapping windows are
+            merged into one passage whose ``chunk_ids`` lists its chunks
 
     Returns:
-        List of result dicts with chunk_id, text, latex, page_start, page_end, score
+        List of result dicts with chunk_id, text, latex, page_start, page_end,
+        duplicates, score. Near-duplicate chunks have no vectors of their own,
+        so each passage appears once; ``duplicates`` counts the copies linked
+        to it with DUPLICATE_OF.
     """
-    v_text: list[float] = embed_vector(query)
-    v_latex: list[float] = embed_vector(query)
-
-    # Query text embeddings
-    cypher_text = """
-    CALL db.index.vector.queryNodes('chunk_vec_text', 40, $v_text)
-      YIELD node AS n, score
-    RETURN n.chunk_id AS chunk_id,
-           n.text_norm AS text,
-           n.latex_raw AS latex,
-           n.page_start AS page_start,
-           n.page_end AS page_end,
-           score
+    # One embedding serves both indexes (they share the embedding model)
+    with search_stage("flat", "embed"):
+        v_query = embed_query(query)
+    window = _window(window)
+    with get_sync_driver().session(database=settings.NEO4J_DATABASE) as s:
+        if filters:
+            rows = _filtered_search(s, filters, v_query, _limit(k), window)
+        elif (index := _mmap()) is not None:
+            with search_stage("flat", "mmap"):
+                hits = index.search(v_query, _limit(k), **_pools())
+            with search_stage("flat", "neo4j"):
+                rows = s.run(_passages(FETCH_CHUNKS_HITS, window), hits=hits).data()
+        else:
+            with search_stage("flat", "neo4j"):
+                rows = s.run(
+                    _passages(DUAL_VECTOR_HITS, window),
+                    v=v_query,
+                    k=_limit(k),
+                    **_pools(),
+                ).data()
+    with search_stage("flat", "merge"):
+        return _merge_windows(rows) if window else _by_score(rows)
+
+
+async def adual_vector_search(
+    query: str,
+    k: int = 8,
+    filters: SearchFilters | None = None,
+    window: int = 0,
+) -> list[dict[str, Any]]:
+    """Async ``dual_vector_search``."""
+    with search_stage("flat", "embed"):
+        v_query = await aembed_query(query)
+    window = _window(window)
+    async with get_async_driver().session(database=settings.NEO4J_DATABASE) as s:
+        if filters:
+            rows = await _afiltered_search(s, filters, v_query, _limit(k), window)
+        elif (index := _mmap()) is not None:
+            with search_stage("flat", "mmap"):
+                hits = index.search(v_query, _limit(k), **_pools())
+            with search_stage("flat", "neo4j"):
+                result = await s.run(_passages(FETCH_CHUNKS_HITS, window), hits=hits)
+                rows = await result.data()
+        else:
+            with search_stage("flat", "neo4j"):
+                result = await s.run(
+                    _passages(DUAL_VECTOR_HITS, window),
+                    v=v_query,
+                    k=_limit(k),
+                    **_pools(),
+                )
+                rows = await result.data()
+    with search_stage("flat", "merge"):
+        return _merge_windows(rows) if window else _by_score(rows)
+
+
+def hybrid_search(query: str, k: int = 8, mathy: bool = False) -> list[dict[str, Any]]:
     """
+    Hybrid search: text vectors, LaTeX vectors and BM25 over ``latex_raw``.
 
-    # Query latex embeddings
-    cypher_latex = """
-    CALL db.index.vector.queryNodes('chunk_vec_latex', 40, $v_latex)
-      YIELD node AS n, score
-    RETURN n.chunk_id AS chunk_id,
-           n.text_norm AS text,
-           n.latex_raw AS latex,
-           n.page_start AS page_start,
-           n.page_end AS page_end,
-           score
+    The three ranked candidate lists (K_PROSE, K_LATEX, K_BM25) are merged
+    with weighted reciprocal rank fusion, so exact-symbol BM25 hits can
+    promote passages the vector pools missed. ``mathy`` shifts weight to the
+    LaTeX vector and BM25 signals (MATHY_LATEX_BOOST).
+
+    Returns:
+        Same shape as ``dual_vector_search``; ``score`` is the fused RRF score.
     """
+    with search_stage("hybrid", "embed"):
+        v_query = embed_query(query)
+    index = _mmap()
+    with get_sync_driver().session(database=settings.NEO4J_DATABASE) as s:
+        if index is not None:
+            with search_stage("hybrid", "mmap"):
+                hits = index.candidates(v_query, **_pools())
+            with search_stage("hybrid", "neo4j"):
+                rows = s.run(
+                    MMAP_HYBRID_CYPHER, hits=hits, **_bm25_params(query)
+                ).data()
+        else:
+            with search_stage("hybrid", "neo4j"):
+                rows = s.run(HYBRID_CYPHER, **_hybrid_params(query, v_query)).data()
+    with search_stage("hybrid", "merge"):
+        return _rrf(rows, mathy, _limit(k))
+
+
+async def ahybrid_search(
+    query: str, k: int = 8, mathy: bool = False
+) -> list[dict[str, Any]]:
+    """Async ``hybrid_search``."""
+    with search_stage("hybrid", "embed"):
+        v_query = await aembed_query(query)
+    index = _mmap()
+    async with get_async_driver().session(database=settings.NEO4J_DATABASE) as s:
+        if index is not None:
+            with search_stage("hybrid", "mmap"):
+                hits = index.candidates(v_query, **_pools())
+        with search_stage("hybrid", "neo4j"):
+            if index is not None:
+                result = await s.run(
+                    MMAP_HYBRID_CYPHER, hits=hits, **_bm25_params(query)
+                )
+            else:
+                result = await s.run(HYBRID_CYPHER, **_hybrid_params(query, v_query))
+            rows = await result.data()
+    with search_stage("hybrid", "merge"):
+        return _rrf(rows, mathy, _limit(k))
+
+
+def hierarchical_search(
+    query: str, k: int = 8, sections: int | None = None
+) -> list[dict[str, Any]]:
+    """
+    Coarse-to-fine search: pick the top sections, then score only their chunks.
+
+    Args:
+        query: Search query string
+        k: Number of results to return (max 20)
+        sections: Number of sections to expand (defaults to SECTION_TOPK)
+
+    Returns:
+        Same shape as ``dual_vector_search``; a chunk's score is the higher of
+        its text and LaTeX cosine similarity to the query.
+    """
+    with search_stage("hierarchical", "embed"):
+        v_query = embed_query(query)
+    with get_sync_driver().session(database=settings.NEO4J_DATABASE) as s:
+        with search_stage("hierarchical", "neo4j"):
+            return s.run(
+                HIERARCHICAL_CYPHER,
+                v=v_query,
+                n_sections=sections or settings.SECTION_TOPK,
+                k=_limit(k),
+            ).data()
+
+
+async def ahierarchical_search(
+    query: str, k: int = 8, sections: int | None = None
+) -> list[dict[str, Any]]:
+    """Async ``hierarchical_search``."""
+    with search_stage("hierarchical", "embed"):
+        v_query = await aembed_query(query)
+    async with get_async_driver().session(database=settings.NEO4J_DATABASE) as s:
+        with search_stage("hierarchical", "neo4j"):
+            result = await s.run(
+                HIERARCHICAL_CYPHER,
+                v=v_query,
+                n_sections=sections or settings.SECTION_TOPK,
+                k=_limit(k),
+            )
+            return await result.data()
+
+
+# ---- batch search ----
+@dataclass(slots=True)
+class BatchQuery:
+    """One query of a batch search; ``mode`` is flat, hybrid or hierarchical."""
+
+    query: str
+    k: int = 8
+    mode: str = settings.SEARCH_MODE
+    mathy: bool = False
+
+
+def _batch_cypher(mode: str, index: "MmapIndex | None") -> str:
+    if index is not None and mode in BATCH_MMAP_CYPHER:
+        return BATCH_MMAP_CYPHER[mode]
+    return BATCH_CYPHER[mode]
+
+
+def _batch_groups(
+    items: Sequence[BatchQuery],
+    vectors: Sequence[Any],
+    index: "MmapIndex | None" = None,
+) -> dict[str, dict[str, Any]]:
+    """Cypher parameters per search mode present in the batch.
+
+    With an mmap ``index``, flat and hybrid queries are searched in-process
+    here and carry their hits instead of the query vector.
+    """
+    groups: dict[str, dict[str, Any]] = {}
+    for i, (item, vector) in enumerate(zip(items, vectors)):
+        params = groups.setdefault(
+            item.mode,
+            {
+                "queries": [],
+                "k": 1,
+                "k_bm25": settings.K_BM25,
+                "n_sections": settings.SECTION_TOPK,
+                **_pools(),
+            },
+        )
+        ft = fulltext_query(item.query) if item.mode == "hybrid" else ""
+        if index is not None and item.mode == "flat":
+            hits = index.search(vector, _limit(item.k), **_pools())
+            params["queries"].append({"i": i, "hits": hits, "ft": ft})
+        elif index is not None and item.mode == "hybrid":
+            hits = index.candidates(vector, **_pools())
+            params["queries"].append({"i": i, "hits": hits, "ft": ft})
+        else:
+            params["queries"].append({"i": i, "v": vector, "ft": ft})
+        params["k"] = max(params["k"], _limit(item.k))
+    return groups
+
+
+def _batch_results(
+    items: Sequence[BatchQuery], rows: list[dict[str, Any]]
+) -> list[list[dict[str, Any]]]:
+    """Split tagged rows back into per-query result lists, in input order."""
+    out: list[list[dict[str, Any]]] = [[] for _ in items]
+    for row in rows:
+        out[row.pop("i")].append(row)
+    for i, item in enumerate(items):
+        if item.mode == "hybrid":
+            out[i] = _rrf(out[i], item.mathy, _limit(item.k))
+        else:
+            out[i].sort(key=lambda r: r["score"], reverse=True)
+            del out[i][_limit(item.k) :]
+    return out
+
+
+def search_batch(items: Sequence[BatchQuery]) -> list[list[dict[str, Any]]]:
+    """
+    Run many searches at once: every query is embedded in one provider call
+    and each search mode in the batch is a single UNWIND-driven Cypher query.
+
+    Returns:
+        One result list per item, in input order, each shaped like the
+        corresponding single-query search.
+    """
+    if not items:
+        return []
+    with search_stage("batch", "embed"):
+        vectors = embed_queries([item.query for item in items])
+    index = _mmap()
+    with search_stage("batch", "mmap") if index is not None else nullcontext():
+        groups = _batch_groups(items, vectors, index)
+    rows: list[dict[str, Any]] = []
+    with get_sync_driver().session(database=settings.NEO4J_DATABASE) as s:
+        for mode, params in groups.items():
+            with search_stage("batch", "neo4j"):
+                rows.extend(s.run(_batch_cypher(mode, index), **params).data())
+    with search_stage("batch", "merge"):
+        return _batch_results(items, rows)
+
+
+async def asearch_batch(items: Sequence[BatchQuery]) -> list[list[dict[str, Any]]]:
+    """Async ``search_batch``; the per-mode queries run concurrently."""
+    if not items:
+        return []
+    with search_stage("batch", "embed"):
+        vectors = await aembed_queries([item.query for item in items])
+
+    index = _mmap()
+
+    async def run(mode: str, params: dict[str, Any]) -> list[dict[str, Any]]:
+        async with get_async_driver().session(database=settings.NEO4J_DATABASE) as s:
+            with search_stage("batch", "neo4j"):
+                result = await s.run(_batch_cypher(mode, index), **params)
+                return await result.data()
 
-    with driver.session(database=settings.NEO4J_DATABASE) as s:
-        text_results: list[dict[str, Any]] = s.run(cypher_text, v_text=v_text).data()
-        latex_results: list[dict[str, Any]] = s.run(
-            cypher_latex, v_latex=v_latex
-        ).data()
-
-    # Merge and deduplicate by chunk_id, keeping highest score
-    merged: dict[str, dict[str, Any]] = {}
-    for result in text_results + latex_results:
-        chunk_id: str = result["chunk_id"]
-        if chunk_id not in merged or result["score"] > merged[chunk_id]["score"]:
-            merged[chunk_id] = result
-
-    # Sort by score and limit
-    rows: list[dict[str, Any]] = sorted(
-        merged.values(), key=lambda x: x["score"], reverse=True
-    )
-    return rows[: max(1, min(k, 20))]
+    with search_stage("batch", "mmap") if index is not None else nullcontext():
+        groups = _batch_groups(items, vectors, index)
+    parts = await asyncio.gather(*(run(m, p) for m, p in groups.items()))
+    with search_stage("batch", "merge"):
+        return _batch_results(items, [row for part in parts for row in part])
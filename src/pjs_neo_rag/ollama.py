@@ -2,80 +2,181 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Sequence
 
+import numpy as np
 import requests
 from requests import RequestException
 
+from pjs_neo_rag.http_transport import HttpTransport, get_transport
+
 
 @dataclass(slots=True)
 class OllamaProvider:
     base_url: str
     embed_model: str
     chat_model: str
+    keep_alive: str | None = None  # Ollama duration; None = server default
     name: str = "ollama"
+    transport: HttpTransport = field(default=None, repr=False)  # type: ignore[assignment]
 
-    def embed(self, text: str) -> List[float]:
-        payload = {
-            "model": self.embed_model,
-            "prompt": text if text and text.strip() else " ",
-        }
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/embeddings", json=payload, timeout=60
-            )
-            response.raise_for_status()
-        except requests.HTTPError as exc:
+    def __post_init__(self) -> None:
+        if self.transport is None:
+            self.transport = get_transport(self.base_url)
+
+    def _error(self, exc: RequestException, model: str, kind: str) -> RuntimeError:
+        if isinstance(exc, requests.HTTPError):
             if exc.response is not None and exc.response.status_code == 404:
-                raise RuntimeError(
-                    f"Ollama model '{self.embed_model}' not found. "
-                    f"Pull it with: ollama pull {self.embed_model}"
-                ) from exc
-            raise RuntimeError(
-                f"Ollama embedding request failed: {exc.response.status_code if exc.response else 'unknown'}"
-            ) from exc
-        except RequestException as exc:  # connection/refused/timeouts etc.
-            raise RuntimeError(
-                f"Ollama embedding provider not reachable at {self.base_url}. "
-                "Ensure ollama is running and OLLAMA_URL is correct."
-            ) from exc
+                return RuntimeError(
+                    f"Ollama model '{model}' not found. "
+                    f"Pull it with: ollama pull {model}"
+                )
+            status = exc.response.status_code if exc.response is not None else "unknown"
+            return RuntimeError(f"Ollama {kind} request failed: {status}")
+        # connection/refused/timeouts/open circuit etc.
+        return RuntimeError(
+            f"Ollama {kind} provider not reachable at {self.base_url}. "
+            "Ensure ollama is running and OLLAMA_URL is correct."
+        )
 
-        data = response.json()
-        return data["embedding"]
+    def _embed_payload(self, text: str) -> Dict[str, Any]:
+        return self._with_keep_alive(
+            {
+                "model": self.embed_model,
+                "prompt": text if text and text.strip() else " ",
+            }
+        )
 
-    def chat(self, prompt: str, **kwargs: Any) -> str:
+    def _batch_payload(self, texts: Sequence[str]) -> Dict[str, Any]:
+        return self._with_keep_alive(
+            {
+                "model": self.embed_model,
+                "input": [text if text and text.strip() else " " for text in texts],
+            }
+        )
+
+    def _with_keep_alive(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.keep_alive:
+            # Ollama takes a number as seconds and a string as a duration
+            keep_alive = self.keep_alive
+            payload["keep_alive"] = (
+                int(keep_alive) if keep_alive.lstrip("-").isdigit() else keep_alive
+            )
+        return payload
+
+    @staticmethod
+    def _batch_result(data: Dict[str, Any], expected: int) -> np.ndarray:
+        embeddings = data.get("embeddings") or []
+        if len(embeddings) != expected:
+            raise ValueError(
+                f"Ollama returned {len(embeddings)} embeddings for {expected} inputs"
+            )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def _chat_body(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
         body: Dict[str, Any] = {
             "model": self.chat_model,
             "prompt": prompt,
             "stream": False,
         }
         body.update(kwargs)
+        return self._with_keep_alive(body)
+
+    def embed(self, text: str) -> np.ndarray:
         try:
-            response = requests.post(
-                f"{self.base_url}/api/generate", json=body, timeout=120
+            response = self.transport.post_json(
+                "/api/embeddings",
+                self._embed_payload(text),
+                timeout=60,
+                idempotent=True,
+            )
+        except RequestException as exc:
+            raise self._error(exc, self.embed_model, "embedding") from exc
+
+        data = response.json()
+        return np.asarray(data["embedding"], dtype=np.float32)
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        try:
+            response = self.transport.post_json(
+                "/api/embed", self._batch_payload(texts), timeout=300, idempotent=True
+            )
+        except RequestException as exc:
+            raise self._error(exc, self.embed_model, "embedding") from exc
+
+        return self._batch_result(response.json(), len(texts))
+
+    def chat(self, prompt: str, **kwargs: Any) -> str:
+        try:
+            response = self.transport.post_json(
+                "/api/generate", self._chat_body(prompt, **kwargs), timeout=120
             )
-            response.raise_for_status()
-        except requests.HTTPError as exc:
-            if exc.response is not None and exc.response.status_code == 404:
-                raise RuntimeError(
-                    f"Ollama model '{self.chat_model}' not found. "
-                    f"Pull it with: ollama pull {self.chat_model}"
-                ) from exc
-            raise RuntimeError(
-                f"Ollama chat request failed: {exc.response.status_code if exc.response else 'unknown'}"
-            ) from exc
         except RequestException as exc:
-            raise RuntimeError(
-                f"Ollama chat provider not reachable at {self.base_url}. "
-                "Ensure ollama is running and OLLAMA_URL is correct."
-            ) from exc
+            raise self._error(exc, self.chat_model, "chat") from exc
 
         data = response.json()
         return data.get("response", "")
 
+    # ---- async variants (non-blocking, for the API event loop) ----
+    async def aembed(self, text: str) -> np.ndarray:
+        try:
+            response = await self.transport.apost_json(
+                "/api/embeddings",
+                self._embed_payload(text),
+                timeout=60,
+                idempotent=True,
+            )
+        except RequestException as exc:
+            raise self._error(exc, self.embed_model, "embedding") from exc
+
+        data = response.json()
+        return np.asarray(data["embedding"], dtype=np.float32)
+
+    async def aembed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        try:
+            response = await self.transport.apost_json(
+                "/api/embed", self._batch_payload(texts), timeout=300, idempotent=True
+            )
+        except RequestException as exc:
+            raise self._error(exc, self.embed_model, "embedding") from exc
+
+        return self._batch_result(response.json(), len(texts))
+
+    async def astream_chat(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """Yield the completion piece by piece as Ollama generates it."""
+        body = self._chat_body(prompt, **kwargs)
+        body["stream"] = True
+        try:
+            async for line in self.transport.astream_lines("/api/generate", body):
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama chat failed: {data['error']}")
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    return
+        except RequestException as exc:
+            raise self._error(exc, self.chat_model, "chat") from exc
+
+    async def aload_chat_model(self) -> None:
+        """Load the chat model into memory (a generate call without a prompt)."""
+        try:
+            await self.transport.apost_json(
+                "/api/generate",
+                self._with_keep_alive({"model": self.chat_model}),
+                timeout=120,
+            )
+        except RequestException as exc:
+            raise self._error(exc, self.chat_model, "chat") from exc
+
 
-def embed_ollama(text: str) -> List[float]:
+def embed_ollama(text: str) -> np.ndarray:
     """Convenience function for embedding via Ollama with default settings."""
     from pjs_neo_rag.config import settings  # local import to avoid cycles
 
@@ -0,0 +1,166 @@
+"""In-process LRU/TTL cache for query embeddings.
+
+Chat front ends resend the same questions constantly, and the embedding
+round-trip dominates search latency. ``embed_query`` memoizes query vectors
+keyed by (provider, model, normalized query text); entries expire after
+QUERY_CACHE_TTL seconds and the least recently used ones are dropped beyond
+QUERY_CACHE_SIZE entries.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.embeddings import (
+    aembed_vector,
+    aembed_vectors,
+    embed_vector,
+    embed_vectors,
+)
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]  # expired
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, float | int]:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_query_cache() -> LRUCache:
+    return LRUCache(settings.QUERY_CACHE_SIZE, settings.QUERY_CACHE_TTL)
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace so trivially different resends share an entry."""
+    return " ".join(query.split())
+
+
+def query_key(query: str) -> tuple[str, str, str]:
+    return (settings.EMBED_PROVIDER, settings.EMBED_MODEL, normalize_query(query))
+
+
+def embed_query(query: str) -> np.ndarray:
+    """Embed a search query, reusing the cached vector when possible.
+
+    The returned array is shared with the cache and therefore read-only.
+    """
+    cache = get_query_cache()
+    key = query_key(query)
+    vector = cache.get(key)
+    if vector is None:
+        vector = embed_vector(key[2], use_cache=False)
+        vector.setflags(write=False)
+        cache.put(key, vector)
+    return vector
+
+
+async def aembed_query(query: str) -> np.ndarray:
+    """Async ``embed_query`` for the API event loop."""
+    cache = get_query_cache()
+    key = query_key(query)
+    vector = cache.get(key)
+    if vector is None:
+        vector = await aembed_vector(key[2], use_cache=False)
+        vector.setflags(write=False)
+        cache.put(key, vector)
+    return vector
+
+
+def _cached_queries(
+    queries: Sequence[str],
+) -> tuple[list[tuple[str, str, str]], list[np.ndarray | None], list[str]]:
+    cache = get_query_cache()
+    keys = [query_key(query) for query in queries]
+    vectors = [cache.get(key) for key in keys]
+    missing = list(dict.fromkeys(k[2] for k, v in zip(keys, vectors) if v is None))
+    return keys, vectors, missing
+
+
+def _store_queries(
+    keys: list[tuple[str, str, str]],
+    vectors: list[np.ndarray | None],
+    missing: list[str],
+    fresh: np.ndarray | None,
+) -> list[np.ndarray]:
+    cache = get_query_cache()
+    row = {text: j for j, text in enumerate(missing)}
+    for i, key in enumerate(keys):
+        if vectors[i] is None:
+            vector = fresh[row[key[2]]].copy()  # type: ignore[index]
+            vector.setflags(write=False)
+            cache.put(key, vector)
+            vectors[i] = vector
+    return vectors  # type: ignore[return-value]
+
+
+def embed_queries(queries: Sequence[str]) -> list[np.ndarray]:
+    """Embed many search queries; all cache misses go in one provider call."""
+    keys, vectors, missing = _cached_queries(queries)
+    fresh = (
+        embed_vectors(missing, batch_size=len(missing), use_cache=False)
+        if missing
+        else None
+    )
+    return _store_queries(keys, vectors, missing, fresh)
+
+
+async def aembed_queries(queries: Sequence[str]) -> list[np.ndarray]:
+    """Async ``embed_queries``."""
+    keys, vectors, missing = _cached_queries(queries)
+    fresh = (
+        await aembed_vectors(missing, batch_size=len(missing), use_cache=False)
+        if missing
+        else None
+    )
+    return _store_queries(keys, vectors, missing, fresh)
@@ -0,0 +1,249 @@
+"""Search result cache keyed by corpus generation.
+
+``/search`` answers are cached under (corpus snapshot, mode, normalized
+query, k, mathy, filters, window, embedding model), where the snapshot is
+the ``(corpus_id, generation)`` pair of the ``Snapshot`` node (see
+``corpus_generation``). Ingestion bumps the generation, so entries from an
+older corpus simply stop matching and age out of the LRU; clearing or
+replacing the database restarts the generation but changes ``corpus_id``.
+
+The current snapshot is re-read from Neo4j at most every
+RESULT_CACHE_GENERATION_POLL seconds; within that window a cache hit touches
+neither the embedding backend nor Neo4j.
+
+Backends (RESULT_CACHE_BACKEND):
+
+- ``memory``: per-process LRU (default)
+- ``sqlite``: LRU in a SQLite file at RESULT_CACHE_PATH, shared by all API
+  workers on the host; put the file on tmpfs (e.g. ``/dev/shm``) for a
+  shared-memory cache
+- ``none``: disabled
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional, Protocol
+
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.corpus_generation import aread_snapshot, read_snapshot
+from pjs_neo_rag.query_cache import LRUCache, normalize_query
+
+Results = list[dict[str, Any]]
+# (corpus_id, generation), see corpus_generation.read_snapshot
+Snapshot = tuple[Optional[str], int]
+
+
+class ResultCacheBackend(Protocol):
+    """Storage for cached search results (string keys, JSON-able values)."""
+
+    def get(self, key: str) -> Results | None:  # pragma: no cover - interface
+        ...
+
+    def put(self, key: str, value: Results) -> None:  # pragma: no cover - interface
+        ...
+
+    def stats(self) -> dict[str, float | int | str]:  # pragma: no cover - interface
+        ...
+
+
+class MemoryResultCache:
+    """Per-process LRU backend."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._lru = LRUCache(maxsize, ttl)
+
+    def get(self, key: str) -> Results | None:
+        return self._lru.get(key)
+
+    def put(self, key: str, value: Results) -> None:
+        self._lru.put(key, value)
+
+    def stats(self) -> dict[str, float | int | str]:
+        return {"backend": "memory", **self._lru.stats()}
+
+
+class SQLiteResultCache:
+    """LRU backend in a SQLite file shared by every worker on the host."""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS results (
+        key       TEXT    PRIMARY KEY,
+        value     TEXT    NOT NULL,
+        expires   REAL    NOT NULL,
+        last_used INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+    """
+
+    def __init__(self, path: Path, maxsize: int, ttl: float) -> None:
+        self.path = Path(path)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")  # a cache; losing it is fine
+        self._conn.executescript(self._SCHEMA)
+        self._conn.commit()
+
+    def get(self, key: str) -> Results | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key=? AND expires>?", (key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET last_used=? WHERE key=?", (time.time_ns(), key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Results) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), time.time() + self.ttl, time.time_ns()),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,),
+                )
+            self._conn.commit()
+
+    def stats(self) -> dict[str, float | int | str]:
+        with self._lock:
+            size = self._conn.execute("SELECT count(*) FROM results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": str(self.path),
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_result_cache() -> Optional[ResultCacheBackend]:
+    """Return the configured backend, or ``None`` when disabled."""
+    backend = settings.RESULT_CACHE_BACKEND
+    if backend == "none" or settings.RESULT_CACHE_SIZE <= 0:
+        return None
+    if backend == "sqlite":
+        return SQLiteResultCache(
+            settings.RESULT_CACHE_PATH, settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL
+        )
+    return MemoryResultCache(settings.RESULT_CACHE_SIZE, settings.RESULT_CACHE_TTL)
+
+
+def _get_many(cache: ResultCacheBackend, keys: list[str]) -> list[Results | None]:
+    return [cache.get(key) for key in keys]
+
+
+def _put_many(cache: ResultCacheBackend, items: list[tuple[str, Results]]) -> None:
+    for key, value in items:
+        cache.put(key, value)
+
+
+async def aget_many(
+    cache: ResultCacheBackend, keys: list[str]
+) -> list[Results | None]:
+    """Look ``keys`` up; SQLite lookups run off the event loop."""
+    if isinstance(cache, MemoryResultCache):
+        return _get_many(cache, keys)
+    return await asyncio.to_thread(_get_many, cache, keys)
+
+
+async def aput_many(cache: ResultCacheBackend, items: list[tuple[str, Results]]) -> None:
+    """Store ``(key, results)`` pairs; SQLite writes run off the event loop."""
+    if isinstance(cache, MemoryResultCache):
+        _put_many(cache, items)
+        return
+    await asyncio.to_thread(_put_many, cache, items)
+
+
+class GenerationTracker:
+    """Current corpus snapshot, re-read from Neo4j at most every ``poll`` s."""
+
+    def __init__(self, poll_seconds: float) -> None:
+        self.poll_seconds = poll_seconds
+        self.snapshot: Snapshot | None = None
+        self._checked = 0.0
+
+    def _fresh(self) -> bool:
+        return (
+            self.snapshot is not None
+            and time.monotonic() - self._checked < self.poll_seconds
+        )
+
+    def _set(self, snapshot: Snapshot) -> Snapshot:
+        self.snapshot, self._checked = snapshot, time.monotonic()
+        return snapshot
+
+    def current(self, driver) -> Snapshot:
+        if self._fresh():
+            return self.snapshot  # type: ignore[return-value]
+        with driver.session(database=settings.NEO4J_DATABASE) as s:
+            return self._set(read_snapshot(s))
+
+    async def acurrent(self, driver) -> Snapshot:
+        if self._fresh():
+            return self.snapshot  # type: ignore[return-value]
+        async with driver.session(database=settings.NEO4J_DATABASE) as s:
+            return self._set(await aread_snapshot(s))
+
+
+@lru_cache(maxsize=None)
+def get_generation_tracker() -> GenerationTracker:
+    return GenerationTracker(settings.RESULT_CACHE_GENERATION_POLL)
+
+
+def result_key(
+    snapshot: Snapshot,
+    mode: str,
+    query: str,
+    k: int,
+    mathy: bool,
+    filters: dict[str, Any] | None = None,
+    window: int = 0,
+) -> str:
+    raw = json.dumps(
+        [
+            list(snapshot),
+            mode,
+            normalize_query(query),
+            k,
+            mathy,
+            filters or {},
+            window,
+            settings.EMBED_PROVIDER,
+            settings.EMBED_MODEL,
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Dict, List
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Sequence
 
-import requests
+import numpy as np
 from requests import RequestException
 
+from pjs_neo_rag.http_transport import HttpTransport, get_transport
+
 
 @dataclass(slots=True)
 class VLLMProvider:
@@ -15,45 +18,85 @@ class VLLMProvider:
     embed_model: str
     chat_model: str
     name: str = "vllm"
+    transport: HttpTransport = field(default=None, repr=False)  # type: ignore[assignment]
 
-    def embed(self, text: str) -> List[float]:
-        payload = {
-            "model": self.embed_model,
-            "input": text if text and text.strip() else " ",
-        }
-        try:
-            response = requests.post(
-                f"{self.base_url}/v1/embeddings", json=payload, timeout=60
-            )
-            response.raise_for_status()
-        except RequestException as exc:
-            raise RuntimeError(
-                f"vLLM embedding provider not reachable at {self.base_url}. "
-                "Ensure vLLM is running and VLLM_URL is correct."
-            ) from exc
+    def __post_init__(self) -> None:
+        if self.transport is None:
+            self.transport = get_transport(self.base_url)
 
-        data = response.json()
+    def _error(self, kind: str) -> RuntimeError:
+        return RuntimeError(
+            f"vLLM {kind} provider not reachable at {self.base_url}. "
+            "Ensure vLLM is running and VLLM_URL is correct."
+        )
+
+    def _embed_payload(self, text: str | Sequence[str]) -> Dict[str, Any]:
+        if isinstance(text, str):
+            value: str | List[str] = text if text and text.strip() else " "
+        else:
+            value = [t if t and t.strip() else " " for t in text]
+        return {"model": self.embed_model, "input": value}
+
+    @staticmethod
+    def _embed_result(data: Dict[str, Any]) -> np.ndarray:
         entries = data.get("data") or []
         if not entries:
             raise ValueError("vLLM embedding response missing data entries")
-        return entries[0]["embedding"]
+        return np.asarray(entries[0]["embedding"], dtype=np.float32)
 
-    def chat(self, prompt: str, **kwargs: Any) -> str:
+    @staticmethod
+    def _batch_result(data: Dict[str, Any], expected: int) -> np.ndarray:
+        entries = data.get("data") or []
+        if len(entries) != expected:
+            raise ValueError(
+                f"vLLM returned {len(entries)} embeddings for {expected} inputs"
+            )
+        # OpenAI-style responses carry an index; don't rely on ordering alone
+        entries = sorted(entries, key=lambda e: e.get("index", 0))
+        return np.asarray(
+            [entry["embedding"] for entry in entries], dtype=np.float32
+        )
+
+    def _chat_body(self, prompt: str, **kwargs: Any) -> Dict[str, Any]:
         body: Dict[str, Any] = {
             "model": self.chat_model,
             "messages": [{"role": "user", "content": prompt}],
         }
         body.update(kwargs)
+        return body
+
+    def embed(self, text: str) -> np.ndarray:
+        try:
+            response = self.transport.post_json(
+                "/v1/embeddings", self._embed_payload(text), timeout=60, idempotent=True
+            )
+        except RequestException as exc:
+            raise self._error("embedding") from exc
+
+        return self._embed_result(response.json())
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        try:
+            response = self.transport.post_json(
+                "/v1/embeddings",
+                self._embed_payload(list(texts)),
+                timeout=300,
+                idempotent=True,
+            )
+        except RequestException as exc:
+            raise self._error("embedding") from exc
+
+        return self._batch_result(response.json(), len(texts))
+
+    def chat(self, prompt: str, **kwargs: Any) -> str:
         try:
-            response = requests.post(
-                f"{self.base_url}/v1/chat/completions", json=body, timeout=120
+            response = self.transport.post_json(
+                "/v1/chat/completions", self._chat_body(prompt, **kwargs), timeout=120
             )
-            response.raise_for_status()
         except RequestException as exc:
-            raise RuntimeError(
-                f"vLLM chat provider not reachable at {self.base_url}. "
-                "Ensure vLLM is running and VLLM_URL is correct."
-            ) from exc
+            raise self._error("chat") from exc
 
         data = response.json()
         choices = data.get("choices") or []
@@ -61,3 +104,52 @@ class VLLMProvider:
             raise ValueError("vLLM chat response missing choices")
         message = choices[0].get("message") or {}
         return message.get("content", "")
+
+    # ---- async variants (non-blocking, for the API event loop) ----
+    async def aembed(self, text: str) -> np.ndarray:
+        try:
+            response = await self.transport.apost_json(
+                "/v1/embeddings", self._embed_payload(text), timeout=60, idempotent=True
+            )
+        except RequestException as exc:
+            raise self._error("embedding") from exc
+
+        return self._embed_result(response.json())
+
+    async def aembed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        try:
+            response = await self.transport.apost_json(
+                "/v1/embeddings",
+                self._embed_payload(list(texts)),
+                timeout=300,
+                idempotent=True,
+            )
+        except RequestException as exc:
+            raise self._error("embedding") from exc
+
+        return self._batch_result(response.json(), len(texts))
+
+    async def astream_chat(self, prompt: str, **kwargs: Any) -> AsyncIterator[str]:
+        """Yield the completion piece by piece (OpenAI-style SSE stream)."""
+        body = self._chat_body(prompt, **kwargs)
+        body["stream"] = True
+        try:
+            async for line in self.transport.astream_lines(
+                "/v1/chat/completions", body
+            ):
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:") :].strip()
+                if data == "[DONE]":
+                    return
+                for choice in json.loads(data).get("choices") or []:
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        yield piece
+        except RequestException as exc:
+            raise self._error("chat") from exc
+
+    async def aload_chat_model(self) -> None:
+        """vLLM serves one model, loaded at startup: nothing to do."""
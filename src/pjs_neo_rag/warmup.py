@@ -0,0 +1,141 @@
+"""Startup warmup for the API.
+
+After a restart the first ``/search`` would otherwise pay for loading the
+embedding model and for cold Neo4j index pages. ``awarmup`` runs once per
+worker before ``/health`` reports ready:
+
+1. embed a probe query, which loads the model (Ollama keeps it loaded for
+   OLLAMA_KEEP_ALIVE);
+2. run WARMUP_PROBES vector queries on every vector index -- the probe
+   embedding plus random directions, so different parts of the graph are
+   paged in -- one BM25 query on the fulltext index, and the same probes on
+   the memory-mapped index when VECTOR_BACKEND=mmap;
+3. read the corpus generation and open the result cache.
+
+A failed step is reported, not raised: the API still comes up, degraded.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable
+
+import numpy as np
+
+from pjs_neo_rag.ai_providers import get_embedding_provider
+from pjs_neo_rag.config import settings
+from pjs_neo_rag.result_cache import get_generation_tracker, get_result_cache
+
+WARMUP_QUERY = "warmup: the integral of x^2 over [0, 1]"
+WARMUP_FULLTEXT = "frac OR sum OR int"
+VECTOR_INDEXES = ("chunk_vec_text", "chunk_vec_latex", "section_vec")
+
+PROBE_VECTOR_INDEX = """
+CALL db.index.vector.queryNodes($index, $k, $v) YIELD node
+RETURN count(node) AS hits
+"""
+
+PROBE_FULLTEXT_INDEX = """
+CALL db.index.fulltext.queryNodes('latex_fulltext', $q, {limit: $k}) YIELD node
+RETURN count(node) AS hits
+"""
+
+
+@dataclass(slots=True)
+class WarmupReport:
+    seconds: float = 0.0
+    steps: dict[str, float] = field(default_factory=dict)  # step -> seconds
+    errors: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {"seconds": self.seconds, "steps": self.steps, "errors": self.errors}
+
+
+def _probe_vectors(v: np.ndarray | None, n: int, dim: int) -> list[list[float]]:
+    """``v`` (when the model answered) plus random unit vectors, ``n`` in all."""
+    rng = np.random.default_rng(0)
+    extra = rng.standard_normal((n - (v is not None), dim)).astype(np.float32)
+    extra /= np.linalg.norm(extra, axis=1, keepdims=True)
+    probes = extra.tolist()
+    return [v.tolist(), *probes] if v is not None else probes
+
+
+async def _probe(driver, queries: list[tuple[str, dict[str, Any]]]) -> None:
+    async with driver.session(database=settings.NEO4J_DATABASE) as s:
+        for cypher, params in queries:
+            result = await s.run(cypher, params)
+            await result.consume()
+
+
+def _probe_mmap(probes: list[list[float]]) -> None:
+    from pjs_neo_rag.mmap_index import get_mmap_index
+
+    index = get_mmap_index()
+    if index is None:
+        return
+    for v in probes:
+        index.search(
+            np.asarray(v, dtype=np.float32),
+            settings.K_PROSE,
+            settings.K_PROSE,
+            settings.K_LATEX,
+        )
+
+
+async def _step(report: WarmupReport, name: str, work: Awaitable[Any]) -> Any:
+    start = time.perf_counter()
+    try:
+        value = await work
+    except Exception as e:  # a cold backend must not keep the API down
+        report.errors.append(f"{name}: {e}")
+        print(f"[WARN] Warmup step {name} failed: {e}")
+        return None
+    report.steps[name] = round(time.perf_counter() - start, 3)
+    return value
+
+
+async def awarmup(driver) -> WarmupReport:
+    """Load the embedding model and page in every index (see module doc)."""
+    report = WarmupReport()
+    start = time.perf_counter()
+
+    v = await _step(
+        report, "embedding_model", get_embedding_provider().aembed(WARMUP_QUERY)
+    )
+    dim = len(v) if v is not None else settings.EMBED_DIM
+    probes = _probe_vectors(v, settings.WARMUP_PROBES, dim)
+    # the largest candidate pool a search asks for (filtered searches)
+    k = settings.FILTER_MAX_POOL
+
+    steps = [
+        _step(
+            report,
+            f"index:{name}",
+            _probe(
+                driver,
+                [(PROBE_VECTOR_INDEX, {"index": name, "k": k, "v": p}) for p in probes],
+            ),
+        )
+        for name in VECTOR_INDEXES
+    ]
+    steps.append(
+        _step(
+            report,
+            "index:latex_fulltext",
+            _probe(driver, [(PROBE_FULLTEXT_INDEX, {"q": WARMUP_FULLTEXT, "k": k})]),
+        )
+    )
+    steps.append(
+        _step(report, "corpus_generation", get_generation_tracker().acurrent(driver))
+    )
+    if settings.VECTOR_BACKEND == "mmap":
+        steps.append(
+            _step(report, "mmap_index", asyncio.to_thread(_probe_mmap, probes))
+        )
+    await asyncio.gather(*steps)
+    get_result_cache()
+
+    report.seconds = round(time.perf_counter() - start, 3)
+    return report
@@ -0,0 +1,98 @@
+"""
+In-memory stand-ins for the Neo4j driver, shared by the unit tests.
+
+``FakeDriver`` records every query with its parameters; an optional handler
+``(query, params) -> rows`` supplies results or raises to simulate failures.
+``AsyncFakeDriver`` is the same for code written against the async driver.
+"""
+
+import threading
+
+
+class FakeResult(list):
+    def consume(self):
+        return None
+
+    def single(self):
+        return self[0] if self else None
+
+    def data(self):
+        return [dict(r) for r in self]
+
+
+class FakeSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, parameters=None, **params):
+        return self.driver.run(query, {**(parameters or {}), **params})
+
+    def execute_write(self, fn, *args, **kwargs):
+        return fn(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, handler=None):
+        self.handler = handler
+        self.runs = []
+        self._lock = threading.Lock()
+
+    def session(self, **kwargs):
+        return FakeSession(self)
+
+    def run(self, query, params):
+        with self._lock:
+            self.runs.append((query, params))
+        rows = self.handler(query, params) if self.handler else None
+        return FakeResult(rows or [])
+
+    def params(self, query):
+        """Parameters of every run of ``query``, in order."""
+        return [p for q, p in self.runs if q == query]
+
+    def close(self):
+        pass
+
+
+class AsyncFakeResult(FakeResult):
+    async def consume(self):
+        return None
+
+    async def single(self):
+        return FakeResult.single(self)
+
+    async def data(self):
+        return FakeResult.data(self)
+
+
+class AsyncFakeSession(FakeSession):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def run(self, query, parameters=None, **params):
+        return AsyncFakeResult(FakeSession.run(self, query, parameters, **params))
+
+    async def close(self):
+        pass
+
+
+class AsyncFakeDriver(FakeDriver):
+    def session(self, **kwargs):
+        return AsyncFakeSession(self)
+
+    async def close(self):
+        pass
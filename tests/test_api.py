@@ -0,0 +1,197 @@
+"""
+Endpoint tests for the retriever API. The search functions and providers are
+replaced by small fakes, so neither Neo4j nor an embedding backend is needed;
+the lifespan (pools, warmup) is not run.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.neo4j_retriever_api as api  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+
+
+def _passage(chunk_id, score=0.5):
+    return {
+        "chunk_id": chunk_id,
+        "text": f"text of {chunk_id}",
+        "latex": "",
+        "page_start": 1,
+        "page_end": 1,
+        "duplicates": 0,
+        "score": score,
+    }
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Record which search function served each query."""
+    calls = []
+
+    async def flat(query, k, filters=None, window=0):
+        calls.append(("flat", query, k, bool(filters), window))
+        return [_passage(f"{query}-flat")]
+
+    async def hybrid(query, k, mathy=False):
+        calls.append(("hybrid", query, k, mathy))
+        return [_passage(f"{query}-hybrid")]
+
+    async def hierarchical(query, k):
+        calls.append(("hierarchical", query, k))
+        return [_passage(f"{query}-hierarchical")]
+
+    monkeypatch.setattr(api, "adual_vector_search", flat)
+    monkeypatch.setattr(api, "ahybrid_search", hybrid)
+    monkeypatch.setattr(api, "ahierarchical_search", hierarchical)
+    monkeypatch.setattr(api, "get_result_cache", lambda: None)
+    monkeypatch.setattr(settings, "SEARCH_MODE", "flat")
+    return calls
+
+
+@pytest.fixture
+def client():
+    return TestClient(api.app)
+
+
+# ---- /search ----
+def test_search_serves_the_default_mode(client, calls):
+    response = client.post("/search", json={"query": "dirac", "k": 3})
+
+    assert response.status_code == 200
+    assert response.json() == [{**_passage("dirac-flat"), "chunk_ids": []}]
+    assert calls == [("flat", "dirac", 3, False, 0)]
+
+
+def test_search_honours_the_requested_mode(client, calls):
+    client.post("/search", json={"query": "q", "mode": "hierarchical"})
+
+    assert calls == [("hierarchical", "q", 8)]
+
+
+def test_filtered_search_is_always_flat(client, calls):
+    client.post(
+        "/search", json={"query": "q", "mode": "hierarchical", "doc_id": "abc"}
+    )
+
+    assert calls == [("flat", "q", 8, True, 0)]
+
+
+def test_search_validates_the_request(client, calls):
+    assert client.post("/search", json={"k": 3}).status_code == 422
+    assert client.post("/search", json={"query": "q", "mode": "x"}).status_code == 422
+    assert calls == []
+
+
+def test_hybrid_search_passes_the_mathy_hint(client, calls):
+    client.post("/search", json={"query": "q", "mode": "hybrid", "mathy": True})
+
+    assert calls == [("hybrid", "q", 8, True)]
+
+
+# ---- /search/batch ----
+@pytest.fixture
+def batches(monkeypatch, calls):
+    """Record the BatchQuery lists sent to the shared batch search."""
+    batches = []
+
+    async def search_batch(items):
+        batches.append([(b.query, b.k, b.mode, b.mathy) for b in items])
+        return [[_passage(f"{b.query}-{b.mode}")] for b in items]
+
+    monkeypatch.setattr(api, "asearch_batch", search_batch)
+    return batches
+
+
+def test_batch_returns_results_in_input_order(client, calls, batches):
+    response = client.post(
+        "/search/batch",
+        json=[
+            {"query": "a"},
+            {"query": "b", "doc_id": "abc", "k": 2},
+            {"query": "c", "mode": "hybrid", "mathy": True},
+        ],
+    )
+
+    assert response.status_code == 200
+    assert [[p["chunk_id"] for p in found] for found in response.json()] == [
+        ["a-flat"],
+        ["b-flat"],
+        ["c-hybrid"],
+    ]
+    # the filtered query plans its own Cypher, the rest share one batch
+    assert calls == [("flat", "b", 2, True, 0)]
+    assert batches == [[("a", 8, "flat", False), ("c", 8, "hybrid", True)]]
+
+
+def test_batch_rejects_oversized_requests(client, batches, monkeypatch):
+    monkeypatch.setattr(settings, "SEARCH_BATCH_MAX", 2)
+
+    response = client.post("/search/batch", json=[{"query": "q"}] * 3)
+
+    assert response.status_code == 413
+    assert batches == []
+
+
+# ---- /answer ----
+class _ChatProvider:
+    def __init__(self, pieces, fail=False):
+        self.pieces = pieces
+        self.fail = fail
+        self.prompts = []
+
+    async def aload_chat_model(self):
+        return None
+
+    async def astream_chat(self, prompt):
+        self.prompts.append(prompt)
+        for piece in self.pieces:
+            yield piece
+        if self.fail:
+            raise RuntimeError("model went away")
+
+
+def _events(response):
+    """``(event, data)`` pairs of a server-sent event stream."""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data[6:])))
+    return events
+
+
+def test_answer_streams_passages_then_tokens(client, calls, monkeypatch):
+    provider = _ChatProvider(["Dirac ", "says"])
+    monkeypatch.setattr(api, "get_chat_provider", lambda: provider)
+
+    response = client.post("/answer", json={"query": "dirac", "k": 3})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert _events(response) == [
+        (
+            "passages",
+            [{"chunk_id": "dirac-flat", "page_start": 1, "page_end": 1, "score": 0.5}],
+        ),
+        ("token", {"text": "Dirac "}),
+        ("token", {"text": "says"}),
+        ("done", {}),
+    ]
+    assert "text of dirac-flat" in provider.prompts[0]
+
+
+def test_answer_reports_failures_in_band(client, calls, monkeypatch):
+    provider = _ChatProvider(["partial"], fail=True)
+    monkeypatch.setattr(api, "get_chat_provider", lambda: provider)
+
+    events = _events(client.post("/answer", json={"query": "q"}))
+
+    assert [event for event, _ in events] == ["passages", "token", "error"]
+    assert events[-1][1] == {"detail": "model went away"}
@@ -0,0 +1,109 @@
+"""
+Unit tests for the bulk import CSV export: rows are streamed per batch and
+a document that fails midway leaves nothing behind. Embeddings are faked;
+small PDFs are generated on the fly.
+"""
+
+import csv
+import sys
+from pathlib import Path
+
+import fitz
+import numpy as np
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.ingest_pdf as ingest_pdf  # noqa: E402
+from pjs_neo_rag.bulk_import import FILES, export  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+
+
+def _pdf(path, pages, toc=None):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(36, 36, 560, 800), f"{path.stem} page {i}. " * 40, fontsize=8
+        )
+    if toc:
+        doc.set_toc(toc)
+    doc.save(path)
+    return str(path)
+
+
+def _read(out_dir):
+    tables = {}
+    for key, (name, header) in FILES.items():
+        with open(out_dir / name, newline="", encoding="utf-8") as fh:
+            rows = list(csv.reader(fh))
+        assert rows[0] == header
+        tables[key] = rows[1:]
+    return tables
+
+
+def _embed(fail_on=None):
+    def embed(texts):
+        if fail_on and any(fail_on in t for t in texts):
+            raise RuntimeError("provider down")
+        return np.ones((len(texts), settings.EMBED_DIM), dtype=np.float32)
+
+    return embed
+
+
+def _assert_consistent(tables):
+    docs = {r[0] for r in tables["documents"]}
+    sections = {r[0] for r in tables["sections"]}
+    chunks = {r[0] for r in tables["chunks"]}
+    assert len(sections) == len(tables["sections"])
+    assert len(chunks) == len(tables["chunks"])
+    assert {(d in docs, s in sections) for d, s in tables["doc_sections"]} <= {
+        (True, True)
+    }
+    assert {(s in sections, c in chunks) for s, c in tables["section_chunks"]} <= {
+        (True, True)
+    }
+    assert {(a in chunks, b in chunks) for a, b in tables["next_chunks"]} <= {
+        (True, True)
+    }
+
+
+def test_export_streams_every_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pdf, "embed_vectors", _embed())
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 2)
+    files = [
+        _pdf(tmp_path / "alpha.pdf", 3, toc=[[1, "Intro", 1], [1, "Body", 2]]),
+        _pdf(tmp_path / "beta.pdf", 2),
+    ]
+
+    export(files, tmp_path / "out")
+    tables = _read(tmp_path / "out")
+
+    _assert_consistent(tables)
+    assert len(tables["documents"]) == 2
+    # chunk_count matches the chunk rows of each document
+    for doc_id, *_, chunk_count, _ in tables["documents"]:
+        rows = [c for c in tables["chunks"] if c[5] == doc_id]
+        assert int(chunk_count) == len(rows) > 0
+    # two outline sections + two page sections, each with a vector
+    assert len(tables["sections"]) == 4
+    assert all(r[5] for r in tables["sections"])
+    assert len(tables["next_chunks"]) == len(tables["chunks"]) - 2
+
+
+def test_failed_document_is_dropped_from_the_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_pdf, "embed_vectors", _embed(fail_on="beta page 2"))
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 2)
+    files = [
+        _pdf(tmp_path / "alpha.pdf", 2),
+        _pdf(tmp_path / "beta.pdf", 4),  # fails after its first batches
+        _pdf(tmp_path / "gamma.pdf", 2),
+    ]
+
+    export(files, tmp_path / "out")
+    tables = _read(tmp_path / "out")
+
+    _assert_consistent(tables)
+    assert [r[1] for r in tables["documents"]] == ["alpha.pdf", "gamma.pdf"]
+    assert not any("beta" in r[1] for r in tables["chunks"])
@@ -0,0 +1,71 @@
+"""
+Unit tests for the embedding helpers: the persistent embedding cache serves
+ingestion, while search queries only use the in-process query cache.
+The provider is a small fake; no network needed.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.embeddings as embeddings  # noqa: E402
+import pjs_neo_rag.query_cache as query_cache  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.embedding_cache import EmbeddingCache  # noqa: E402
+
+
+class _Provider:
+    def __init__(self):
+        self.calls = []
+
+    def embed(self, text):
+        self.calls.append([text])
+        return np.ones(settings.EMBED_DIM)
+
+    def embed_batch(self, texts):
+        self.calls.append(list(texts))
+        return np.ones((len(texts), settings.EMBED_DIM))
+
+
+def _setup(tmp_path, monkeypatch):
+    provider = _Provider()
+    cache = EmbeddingCache(
+        path=tmp_path / "embed.sqlite",
+        provider="fake",
+        model="fake",
+        dim=settings.EMBED_DIM,
+        max_bytes=1 << 20,
+    )
+    monkeypatch.setattr(embeddings, "get_embedding_provider", lambda: provider)
+    monkeypatch.setattr(embeddings, "get_embedding_cache", lambda: cache)
+    monkeypatch.setattr(
+        query_cache, "get_query_cache", lambda: query_cache.LRUCache(16, 60)
+    )
+    return provider, cache
+
+
+def test_embed_vectors_uses_the_persistent_cache(tmp_path, monkeypatch):
+    provider, cache = _setup(tmp_path, monkeypatch)
+
+    first = embeddings.embed_vectors(["a", "b", "a"])
+    again = embeddings.embed_vectors(["b", "c"])
+
+    assert provider.calls == [["a", "b"], ["c"]]
+    assert first.shape == (3, settings.EMBED_DIM)
+    assert np.allclose(np.linalg.norm(again, axis=1), 1.0)
+    assert cache.get_many(["a"])[0] is not None
+
+
+def test_queries_bypass_the_persistent_cache(tmp_path, monkeypatch):
+    provider, cache = _setup(tmp_path, monkeypatch)
+
+    query_cache.embed_query("dirac equation")
+    query_cache.embed_queries(["spinor", "clifford algebra"])
+
+    assert provider.calls == [["dirac equation"], ["spinor", "clifford algebra"]]
+    assert cache.get_many(["dirac equation", "spinor"]) == [None, None]
@@ -0,0 +1,123 @@
+"""
+Unit tests for filtered search: the filter clauses, and the choice between
+the widened ANN pool and the exact scan. Neo4j is replaced by the recording
+fake drivers.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from fakes import AsyncFakeDriver, FakeDriver  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.neo_search import (  # noqa: E402
+    SearchFilters,
+    _afiltered_search,
+    _filtered_search,
+)
+
+
+# ---- SearchFilters ----
+def test_filters_empty():
+    filters = SearchFilters()
+
+    assert not filters
+    assert filters.where() == "true"
+    assert filters.match() == "MATCH (c:Chunk)\nWHERE true"
+
+
+def test_filters_params_and_where():
+    filters = SearchFilters(doc_id="abc", page_from=3, page_to=7)
+
+    assert filters
+    assert filters.params() == {
+        "doc_id": "abc",
+        "path_prefix": None,
+        "page_from": 3,
+        "page_to": 7,
+        "source_type": None,
+    }
+    assert filters.where("n") == (
+        "n.source_hash = $doc_id AND n.page_end >= $page_from "
+        "AND n.page_start <= $page_to"
+    )
+
+
+def test_filters_match_anchors_on_document_path():
+    match = SearchFilters(path_prefix="/papers/").match()
+
+    assert match.startswith("MATCH (d:Document)-[:CONTAINS]->(:Section)")
+    assert "d.path STARTS WITH $path_prefix" in match
+    assert not match.endswith("true")
+
+    with_pages = SearchFilters(path_prefix="/papers/", page_from=2).match()
+    assert with_pages.endswith("AND c.page_end >= $page_from")
+
+
+def test_filters_match_with_doc_id_uses_chunk_predicates():
+    match = SearchFilters(doc_id="abc", path_prefix="/papers/").match()
+
+    assert match.startswith("MATCH (c:Chunk)\nWHERE c.source_hash = $doc_id")
+    assert "d.path STARTS WITH $path_prefix" in match
+
+
+# ---- exact-scan fallback ----
+def _graph(matched, ann_hits):
+    """Handler answering the count, ANN and exact queries of a filtered search."""
+
+    def handler(query, params):
+        if "AS total" in query:
+            return [{"matched": matched, "total": 1000}]
+        if "vector.similarity.cosine" in query:
+            return [{"chunk_id": f"exact{i}"} for i in range(params["k"])]
+        return [{"chunk_id": f"ann{i}"} for i in range(ann_hits)]
+
+    return handler
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(settings, "FILTER_EXACT_MAX", 10)
+    monkeypatch.setattr(settings, "FILTER_MAX_POOL", 100_000)
+
+
+def _exact_scans(driver):
+    return [q for q, _ in driver.runs if "vector.similarity.cosine" in q]
+
+
+def test_short_ann_result_falls_back_to_exact_scan(pool):
+    # the widened pool is below FILTER_MAX_POOL but still comes up short
+    driver = FakeDriver(_graph(matched=50, ann_hits=1))
+    with driver.session() as s:
+        rows = _filtered_search(s, SearchFilters(doc_id="abc"), [1.0], 5)
+
+    assert [r["chunk_id"] for r in rows] == [f"exact{i}" for i in range(5)]
+    assert len(_exact_scans(driver)) == 1
+
+
+def test_full_ann_result_skips_exact_scan(pool):
+    driver = FakeDriver(_graph(matched=50, ann_hits=5))
+    with driver.session() as s:
+        rows = _filtered_search(s, SearchFilters(doc_id="abc"), [1.0], 5)
+
+    assert [r["chunk_id"] for r in rows] == [f"ann{i}" for i in range(5)]
+    assert _exact_scans(driver) == []
+
+
+def test_async_short_ann_result_falls_back_to_exact_scan(pool):
+    driver = AsyncFakeDriver(_graph(matched=50, ann_hits=1))
+
+    async def search():
+        async with driver.session() as s:
+            return await _afiltered_search(s, SearchFilters(doc_id="abc"), [1.0], 5)
+
+    rows = asyncio.run(search())
+
+    assert [r["chunk_id"] for r in rows] == [f"exact{i}" for i in range(5)]
+    assert len(_exact_scans(driver)) == 1
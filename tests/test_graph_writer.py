@@ -0,0 +1,123 @@
+"""
+Unit tests for GraphWriter batching: parents written once, NEXT and
+DUPLICATE_OF links deferred to flush and skipped for failed batches.
+Neo4j is replaced by the recording fake driver.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.graph_writer as graph_writer  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.corpus_generation import BUMP_GENERATION  # noqa: E402
+from pjs_neo_rag.graph_writer import (  # noqa: E402
+    CLEAR_NEXT,
+    LINK_NEXT,
+    MARK_INGESTED,
+    PRUNE_SECTIONS,
+    UPSERT_CHUNKS,
+    UPSERT_DOCS,
+    UPSERT_SECTIONS,
+    GraphWriter,
+)
+from pjs_neo_rag.near_dup import LINK_DUPLICATES  # noqa: E402
+
+
+def _row(n, sec="s1", canonical_id=None):
+    return {
+        "doc_id": "d",
+        "title": "Doc",
+        "path": "/papers/d.pdf",
+        "page_count": 3,
+        "sec_id": sec,
+        "section": sec,
+        "sec_level": 1,
+        "sec_page_start": 1,
+        "sec_page_end": 3,
+        "chunk_id": f"c{n}",
+        "prev_id": f"c{n - 1}" if n else None,
+        "text_norm": f"text {n}",
+        "latex_raw": "",
+        "page_start": 1,
+        "page_end": 1,
+        "vec_text": None if canonical_id else [1.0],
+        "vec_latex": None,
+        "canonical_id": canonical_id,
+    }
+
+
+def _writer(monkeypatch, handler=None):
+    monkeypatch.setattr(graph_writer, "confirm_canonical", lambda *a, **k: None)
+    driver = FakeDriver(handler)
+    return driver, GraphWriter(driver, concurrency=2, call_in_tx=False)
+
+
+def _pairs(driver):
+    return [
+        (p["prev_id"], p["chunk_id"])
+        for run in driver.params(LINK_NEXT)
+        for p in run["pairs"]
+    ]
+
+
+def test_parents_once_and_cross_batch_links_deferred(monkeypatch):
+    driver, writer = _writer(monkeypatch)
+
+    writer.write_rows([_row(0), _row(1)])
+    writer.write_rows([_row(2), _row(3, "s2", canonical_id="c0")])
+    writer.close()
+
+    assert [p["doc_ids"] for p in driver.params(CLEAR_NEXT)] == [["d"]]
+    assert [[d["doc_id"] for d in p["docs"]] for p in driver.params(UPSERT_DOCS)] == [
+        ["d"]
+    ]
+    assert [
+        [s["sec_id"] for s in p["sections"]] for p in driver.params(UPSERT_SECTIONS)
+    ] == [["s1"], ["s2"]]
+    assert len(driver.params(UPSERT_CHUNKS)) == 2
+    # in-batch links go with their chunks, the cross-batch one last
+    assert sorted(_pairs(driver)[:2]) == [("c0", "c1"), ("c2", "c3")]
+    assert _pairs(driver)[2:] == [("c1", "c2")]
+    assert driver.params(LINK_DUPLICATES) == [
+        {"links": [{"chunk_id": "c3", "canonical_id": "c0"}]}
+    ]
+    assert len(driver.params(BUMP_GENERATION)) == 1
+
+
+def test_flush_skips_links_touching_failed_batches(monkeypatch):
+    def handler(query, params):
+        failing = any(c["chunk_id"] == "c2" for c in params.get("chunks", []))
+        if query == UPSERT_CHUNKS and failing:
+            raise RuntimeError("write failed")
+        return None
+
+    driver, writer = _writer(monkeypatch, handler)
+
+    writer.write_rows([_row(0), _row(1)])
+    writer.write_rows([_row(2), _row(3, canonical_id="c0")])  # fails
+    writer.write_rows([_row(4, canonical_id="c0"), _row(5)])
+    with pytest.raises(RuntimeError):
+        writer.flush()
+
+    # c1->c2 and c3->c4 reach into the failed batch
+    assert ("c1", "c2") not in _pairs(driver)
+    assert ("c3", "c4") not in _pairs(driver)
+    assert ("c4", "c5") in _pairs(driver)
+    assert driver.params(LINK_DUPLICATES) == [
+        {"links": [{"chunk_id": "c4", "canonical_id": "c0"}]}
+    ]
+
+
+def test_mark_ingested_prunes_stale_sections(monkeypatch):
+    driver, writer = _writer(monkeypatch)
+
+    writer.mark_ingested("d", 4)
+
+    assert [q for q, _ in driver.runs] == [PRUNE_SECTIONS, MARK_INGESTED]
+    assert driver.params(PRUNE_SECTIONS) == [{"doc_id": "d"}]
@@ -0,0 +1,164 @@
+"""
+Unit tests for the shared HTTP transport: retries of idempotent calls and
+the circuit breaker. The backend is a scripted fake session (sync) or an
+httpx mock transport (async); no network needed.
+"""
+
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+import requests
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from pjs_neo_rag.http_transport import (  # noqa: E402
+    CircuitBreaker,
+    CircuitOpenError,
+    HttpTransport,
+)
+
+BASE_URL = "http://backend.test"
+
+
+def _response(status):
+    response = requests.Response()
+    response.status_code = status
+    response.url = f"{BASE_URL}/embed"
+    response.raw = io.BytesIO(b"{}")
+    return response
+
+
+class _Session:
+    """Returns (or raises) the scripted outcomes in order."""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _response(outcome)
+
+    def close(self):
+        pass
+
+
+def _transport(outcomes, retries=2, failures=5):
+    transport = HttpTransport(
+        BASE_URL, retries=retries, backoff=0, breaker=CircuitBreaker(failures, 60)
+    )
+    transport.session = _Session(outcomes)
+    return transport
+
+
+# ---- retries ----
+def test_idempotent_call_retries_retryable_statuses():
+    transport = _transport([503, 429, 200])
+
+    assert transport.post_json("/embed", {}, idempotent=True).status_code == 200
+    assert transport.session.calls == 3
+    assert transport.breaker.failures == 0
+
+
+def test_non_idempotent_call_is_not_retried():
+    transport = _transport([503, 200])
+
+    with pytest.raises(requests.HTTPError):
+        transport.post_json("/chat", {})
+    assert transport.session.calls == 1
+    assert transport.breaker.failures == 1
+
+
+def test_connection_errors_count_once_after_the_last_attempt():
+    transport = _transport([requests.ConnectionError("down")] * 3)
+
+    with pytest.raises(requests.ConnectionError):
+        transport.post_json("/embed", {}, idempotent=True)
+    assert transport.session.calls == 3
+    assert transport.breaker.failures == 1
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    transport = _transport([404], failures=1)
+
+    with pytest.raises(requests.HTTPError):
+        transport.post_json("/embed", {}, idempotent=True)
+    assert transport.breaker.state == "closed"
+
+
+# ---- circuit breaker ----
+def test_open_circuit_fails_fast():
+    transport = _transport([500, 500, 200], retries=0, failures=2)
+
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            transport.post_json("/embed", {})
+    assert transport.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        transport.post_json("/embed", {})
+    assert transport.session.calls == 2
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    breaker.opened_at -= 60
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # the timer is re-armed for the trial
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+# ---- async ----
+def _async_transport(statuses, failures=5):
+    statuses = list(statuses)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses.pop(0), json={})
+
+    transport = HttpTransport(
+        BASE_URL, retries=2, backoff=0, breaker=CircuitBreaker(failures, 60)
+    )
+    transport._async_client = httpx.AsyncClient(
+        base_url=BASE_URL, transport=httpx.MockTransport(handler)
+    )
+    return transport, calls
+
+
+def test_async_idempotent_call_retries():
+    transport, calls = _async_transport([502, 200])
+
+    response = asyncio.run(transport.apost_json("/embed", {}, idempotent=True))
+
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+
+def test_async_errors_surface_as_requests_exceptions():
+    transport, calls = _async_transport([500], failures=1)
+
+    with pytest.raises(requests.HTTPError) as exc:
+        asyncio.run(transport.apost_json("/chat", {}))
+    assert exc.value.response.status_code == 500
+    assert transport.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(transport.apost_json("/chat", {}))
+    assert len(calls) == 1
@@ -0,0 +1,123 @@
+"""
+Unit tests for hybrid retrieval: weighted reciprocal rank fusion and batch
+searches served from the in-process vector index. Neo4j and the index are
+replaced by fakes.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.neo_search as neo_search  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.neo_search import (  # noqa: E402
+    BATCH_HIERARCHICAL_CYPHER,
+    BATCH_MMAP_FLAT_CYPHER,
+    BATCH_MMAP_HYBRID_CYPHER,
+    BatchQuery,
+    _rrf,
+    search_batch,
+)
+
+
+def _hit(source, chunk_id, score):
+    return {"source": source, "chunk_id": chunk_id, "score": score, "text": chunk_id}
+
+
+# ---- _rrf ----
+def test_rrf_sums_weighted_reciprocal_ranks():
+    rows = [
+        _hit("prose", "a", 0.9),
+        _hit("prose", "b", 0.8),
+        _hit("latex", "b", 0.7),
+    ]
+    fused = {r["chunk_id"]: r for r in _rrf(rows, mathy=False, k=10)}
+
+    w_prose, w_latex = settings.PROSE_QUERY_WEIGHT, settings.LATEX_QUERY_WEIGHT
+    assert fused["a"]["score"] == w_prose / (settings.RRF_K + 1)
+    assert fused["b"]["score"] == (
+        w_prose / (settings.RRF_K + 2) + w_latex / (settings.RRF_K + 1)
+    )
+    assert "source" not in fused["a"]
+
+
+def test_rrf_counts_a_chunk_once_per_source_and_truncates():
+    rows = [
+        _hit("prose", "a", 0.9),
+        _hit("prose", "a", 0.5),  # a second duplicate of the same canonical
+        _hit("prose", "b", 0.4),
+        _hit("prose", "c", 0.3),
+    ]
+    fused = _rrf(rows, mathy=False, k=2)
+
+    assert [r["chunk_id"] for r in fused] == ["a", "b"]
+    # "b" is ranked 2nd, not 3rd
+    assert fused[1]["score"] == settings.PROSE_QUERY_WEIGHT / (settings.RRF_K + 2)
+
+
+def test_rrf_mathy_boosts_latex_signals():
+    rows = [_hit("prose", "p", 0.9), _hit("bm25", "m", 5.0)]
+    plain = {r["chunk_id"]: r["score"] for r in _rrf(rows, mathy=False, k=2)}
+    mathy = {r["chunk_id"]: r["score"] for r in _rrf(rows, mathy=True, k=2)}
+
+    assert mathy["p"] == plain["p"]
+    assert mathy["m"] == plain["m"] * settings.MATHY_LATEX_BOOST
+
+
+# ---- batch search on the mmap index ----
+class _Index:
+    def search(self, v, k, k_prose, k_latex):
+        return [{"chunk_id": "flat-hit", "score": 0.9}]
+
+    def candidates(self, v, k_prose, k_latex):
+        return [{"source": "prose", "chunk_id": "hybrid-hit", "score": 0.8}]
+
+
+def test_batch_query_defaults_to_the_configured_mode():
+    assert BatchQuery("q").mode == settings.SEARCH_MODE
+
+
+def test_batch_search_uses_the_mmap_index(monkeypatch):
+    def handler(query, params):
+        return [
+            {"i": q["i"], "source": "prose", "chunk_id": f"c{q['i']}", "score": 0.5}
+            for q in params["queries"]
+        ]
+
+    driver = FakeDriver(handler)
+    monkeypatch.setattr(neo_search, "get_sync_driver", lambda: driver)
+    monkeypatch.setattr(neo_search, "_mmap", lambda: _Index())
+    monkeypatch.setattr(
+        neo_search,
+        "embed_queries",
+        lambda queries: [np.ones(settings.EMBED_DIM) for _ in queries],
+    )
+    items = [
+        BatchQuery("a", mode="flat"),
+        BatchQuery("b", mode="hybrid"),
+        BatchQuery("c", mode="hierarchical"),
+    ]
+
+    results = search_batch(items)
+
+    assert [[r["chunk_id"] for r in found] for found in results] == [
+        ["c0"],
+        ["c1"],
+        ["c2"],
+    ]
+    (flat,) = driver.params(BATCH_MMAP_FLAT_CYPHER)
+    assert flat["queries"] == [
+        {"i": 0, "hits": [{"chunk_id": "flat-hit", "score": 0.9}], "ft": ""}
+    ]
+    (hybrid,) = driver.params(BATCH_MMAP_HYBRID_CYPHER)
+    assert hybrid["queries"][0]["hits"][0]["chunk_id"] == "hybrid-hit"
+    assert "v" not in hybrid["queries"][0]
+    # hierarchical search has no in-process form
+    (hierarchical,) = driver.params(BATCH_HIERARCHICAL_CYPHER)
+    assert "v" in hierarchical["queries"][0]
@@ -0,0 +1,165 @@
+"""
+Unit tests for incremental ingestion: the ingest manifest, planning which
+files to ingest, and the completion stamp that tells a fully ingested
+Document from one a failure left partial. Neo4j and embeddings are faked.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import fitz
+import numpy as np
+import pytest
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.ingest_files as ingest_files  # noqa: E402
+import pjs_neo_rag.ingest_pdf as ingest_pdf  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.graph_writer import (  # noqa: E402
+    MARK_INGESTED,
+    UPSERT_CHUNKS,
+    UPSERT_CHUNKS_IN_TX,
+)
+from pjs_neo_rag.ingest_files import EXISTING_DOCS, plan_incremental  # noqa: E402
+from pjs_neo_rag.ingest_manifest import IngestManifest  # noqa: E402
+from pjs_neo_rag.ingest_pdf import file_doc_id  # noqa: E402
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def _existing(doc_ids):
+    def handler(query, params):
+        if query == EXISTING_DOCS:
+            return [{"doc_id": d} for d in params["doc_ids"] if d in doc_ids]
+        return None
+
+    return handler
+
+
+# ---- plan_incremental ----
+def test_plan_incremental(tmp_path, monkeypatch):
+    unchanged = _write(tmp_path / "unchanged.pdf", b"one")
+    moved = _write(tmp_path / "moved.pdf", b"two")
+    new = _write(tmp_path / "new.pdf", b"three")
+    twin = _write(tmp_path / "twin.pdf", b"three")
+
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    manifest.record(unchanged, os.stat(unchanged), file_doc_id(unchanged))
+    driver = FakeDriver(_existing({file_doc_id(moved)}))
+    monkeypatch.setattr(ingest_files, "get_driver", lambda: driver)
+
+    todo = plan_incremental([unchanged, moved, new, twin], manifest)
+
+    # same bytes as an already scheduled file -> only one of them is ingested
+    assert todo == [new]
+    # the unchanged file is not even looked up
+    looked_up = driver.runs[0][1]["doc_ids"]
+    assert file_doc_id(unchanged) not in looked_up
+    # known content only gets its path updated and recorded
+    assert driver.runs[1][1]["rows"] == [{"doc_id": file_doc_id(moved), "path": moved}]
+    assert manifest.entries[moved].doc_id == file_doc_id(moved)
+    assert new not in manifest.entries
+
+
+def test_plan_incremental_skips_everything_unchanged(tmp_path, monkeypatch):
+    f = _write(tmp_path / "a.pdf", b"a")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    manifest.record(f, os.stat(f), file_doc_id(f))
+
+    def no_driver():
+        raise AssertionError("Neo4j must not be queried")
+
+    monkeypatch.setattr(ingest_files, "get_driver", no_driver)
+
+    assert plan_incremental([f], manifest) == []
+
+
+def test_plan_incremental_only_trusts_completed_documents(tmp_path, monkeypatch):
+    partial = _write(tmp_path / "partial.pdf", b"partial")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    # the Document exists but was never stamped, so EXISTING_DOCS skips it
+    driver = FakeDriver(_existing(set()))
+    monkeypatch.setattr(ingest_files, "get_driver", lambda: driver)
+
+    assert "ingested_at IS NOT NULL" in EXISTING_DOCS
+    assert plan_incremental([partial], manifest) == [partial]
+    assert partial not in manifest.entries
+
+
+# ---- completion stamp ----
+def _pdf(path, pages=4):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_textbox(
+            fitz.Rect(36, 36, 560, 800), f"Page {i} about algebra. " * 40, fontsize=8
+        )
+    doc.save(path)
+    return str(path)
+
+
+def _fake_ingest(monkeypatch, handler=None):
+    driver = FakeDriver(handler)
+    monkeypatch.setattr(ingest_pdf, "get_driver", lambda: driver)
+    monkeypatch.setattr(ingest_pdf, "mark_duplicates", lambda rows: 0)
+    monkeypatch.setattr(
+        ingest_pdf,
+        "embed_vectors",
+        lambda texts: np.ones((len(texts), settings.EMBED_DIM), dtype=np.float32),
+    )
+    monkeypatch.setattr(settings, "INGEST_BATCH_SIZE", 2)
+    return driver
+
+
+def test_ingest_pdf_stamps_completed_document(tmp_path, monkeypatch):
+    pdf = _pdf(tmp_path / "doc.pdf")
+    driver = _fake_ingest(monkeypatch)
+
+    doc_id = ingest_pdf.ingest_pdf(pdf)
+
+    batches = driver.params(UPSERT_CHUNKS) + driver.params(UPSERT_CHUNKS_IN_TX)
+    written = sum(len(p["chunks"]) for p in batches)
+    assert driver.params(MARK_INGESTED) == [
+        {"doc_id": doc_id, "chunk_count": written}
+    ]
+
+
+def test_partial_document_is_not_stamped(tmp_path, monkeypatch):
+    pdf = _pdf(tmp_path / "doc.pdf")
+
+    def handler(query, params):
+        if query in (UPSERT_CHUNKS, UPSERT_CHUNKS_IN_TX) and any(
+            c["chunk_id"].endswith(":o0") for c in params["chunks"]
+        ):
+            raise RuntimeError("write failed")
+        return None
+
+    driver = _fake_ingest(monkeypatch, handler)
+
+    with pytest.raises(RuntimeError):
+        ingest_pdf.ingest_pdf(pdf)
+
+    assert driver.params(MARK_INGESTED) == []
+
+
+# ---- manifest ----
+def test_manifest_reset_for_another_database(tmp_path):
+    f = _write(tmp_path / "a.pdf", b"a")
+    manifest = IngestManifest(tmp_path / "manifest.json")
+    assert manifest.bind("corpus-1")
+    manifest.record(f, os.stat(f), file_doc_id(f))
+    manifest.save()
+
+    loaded = IngestManifest.load(tmp_path / "manifest.json")
+    assert loaded.bind("corpus-1")
+    assert f in loaded.entries
+    assert not loaded.bind("corpus-2")
+    assert loaded.entries == {}
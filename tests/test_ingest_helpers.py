@@ -0,0 +1,78 @@
+"""
+Unit tests for ingestion helpers: LaTeX splitting and LaTeX vector gating.
+Embeddings are replaced by a small fake.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.ingest_pdf as ingest_pdf  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.ingest_pdf import embed_rows, split_latex  # noqa: E402
+
+
+# ---- split_latex ----
+def test_split_latex_keeps_math_verbatim():
+    text = (
+        "Energy $E = mc^2$ and \\begin{align*}a &= b\\end{align*} "
+        "then $$\\int_0^1 x\\,dx$$ done."
+    )
+    prose, latex = split_latex(text)
+
+    assert prose == "Energy  ⟨EQ⟩  and  ⟨EQ⟩  then  ⟨EQ⟩  done."
+    assert latex.split("\n") == [
+        "$E = mc^2$",
+        "\\begin{align*}a &= b\\end{align*}",
+        "$$\\int_0^1 x\\,dx$$",
+    ]
+
+
+def test_split_latex_plain_text():
+    assert split_latex("  no math here ") == ("no math here", "")
+
+
+# ---- LaTeX gating in embed_rows ----
+def _fake_embed(calls):
+    def embed(texts):
+        calls.append(list(texts))
+        return np.ones((len(texts), settings.EMBED_DIM), dtype=np.float32)
+
+    return embed
+
+
+def test_embed_rows_gates_latex_vectors(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest_pdf, "embed_vectors", _fake_embed(calls))
+    latex_row = {"text_norm": "mass ⟨EQ⟩", "latex_raw": "$E = mc^2$"}
+    plain_row = {"text_norm": "just prose", "latex_raw": ""}
+
+    embed_rows([latex_row, plain_row])
+
+    # one call: both texts plus the single LaTeX string
+    assert calls == [["mass ⟨EQ⟩", "just prose", "$E = mc^2$"]]
+    assert latex_row["vec_text"] is not None
+    assert latex_row["vec_latex"] is not None
+    assert plain_row["vec_text"] is not None
+    assert plain_row["vec_latex"] is None
+
+
+def test_embed_rows_skips_duplicates_and_memoizes_latex(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest_pdf, "embed_vectors", _fake_embed(calls))
+    memo = {}
+    first = {"text_norm": "a", "latex_raw": "$x$"}
+    dup = {"text_norm": "a", "latex_raw": "$x$", "canonical_id": "doc:p1:o0"}
+    again = {"text_norm": "b", "latex_raw": "$x$"}
+
+    embed_rows([first, dup], memo)
+    embed_rows([again], memo)
+
+    assert calls == [["a", "$x$"], ["b"]]
+    assert dup["vec_text"] is None and dup["vec_latex"] is None
+    assert again["vec_latex"] is not None
@@ -0,0 +1,119 @@
+"""
+Unit tests for the memory-mapped vector index: building (full and
+incremental) from the fake Neo4j driver, searching, and when a built
+version is ignored. Indexes are written under tmp_path.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.mmap_index as mmap_index  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.corpus_generation import READ_GENERATION  # noqa: E402
+from pjs_neo_rag.mmap_index import (  # noqa: E402
+    FETCH_VECTORS,
+    LIST_VECTOR_IDS,
+    build,
+    get_mmap_index,
+)
+
+DIM = 4
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "MMAP_INDEX_DIR", tmp_path / "index")
+    monkeypatch.setattr(settings, "EMBED_DIM", DIM)
+    monkeypatch.setattr(settings, "EMBED_MODEL", "test-model")
+    monkeypatch.setattr(mmap_index, "_loaded", None)
+    monkeypatch.setattr(mmap_index, "_failed", None)
+    return tmp_path / "index"
+
+
+def _unit(i):
+    v = np.zeros(DIM, dtype=np.float32)
+    v[i % DIM] = 1.0
+    return v.tolist()
+
+
+class _Corpus:
+    """Chunks with vectors, as LIST_VECTOR_IDS and FETCH_VECTORS see them."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks  # chunk_id -> (content_hash, vec_text, vec_latex)
+
+    def __call__(self, query, params):
+        if query == READ_GENERATION:
+            return [{"generation": 1}]
+        if query == LIST_VECTOR_IDS:
+            return [
+                {"chunk_id": cid, "content_hash": h}
+                for cid, (h, _, _) in self.chunks.items()
+            ]
+        if query == FETCH_VECTORS:
+            return [
+                {
+                    "chunk_id": cid,
+                    "vec_text": self.chunks[cid][1],
+                    "vec_latex": self.chunks[cid][2],
+                }
+                for cid in params["ids"]
+            ]
+        return None
+
+
+def _fetched(driver):
+    return [cid for p in driver.params(FETCH_VECTORS) for cid in p["ids"]]
+
+
+def test_build_and_search():
+    corpus = _Corpus(
+        {
+            "a": ("ha", _unit(0), None),
+            "b": ("hb", _unit(1), _unit(2)),
+            "c": ("hc", _unit(3), None),
+        }
+    )
+    build(driver=FakeDriver(corpus))
+    index = get_mmap_index()
+
+    hits = index.search(np.asarray(_unit(2)), k=2, k_prose=3, k_latex=3)
+    # b's LaTeX vector matches exactly: cosine 1 -> Neo4j score 1
+    assert hits[0] == {"chunk_id": "b", "score": 1.0}
+    assert len(hits) == 2
+    sources = {(h["source"], h["chunk_id"]) for h in index.candidates(_unit(0), 1, 1)}
+    assert sources == {("prose", "a"), ("latex", "b")}
+
+
+def test_incremental_build_fetches_only_changed_chunks():
+    corpus = _Corpus({"a": ("ha", _unit(0), None), "b": ("hb", _unit(1), None)})
+    build(driver=FakeDriver(corpus))
+
+    corpus.chunks["b"] = ("hb2", _unit(2), None)  # rewritten
+    corpus.chunks["c"] = ("hc", _unit(3), None)  # new
+    del corpus.chunks["a"]  # removed
+    driver = FakeDriver(corpus)
+    build(driver=driver)
+
+    assert sorted(_fetched(driver)) == ["b", "c"]
+    index = get_mmap_index()
+    assert sorted(index.chunk_ids.tolist()) == ["b", "c"]
+    assert index.search(np.asarray(_unit(2)), 1, 2, 2)[0]["chunk_id"] == "b"
+
+
+def test_index_of_another_dimension_is_ignored(monkeypatch):
+    build(driver=FakeDriver(_Corpus({"a": ("ha", _unit(0), None)})))
+    assert get_mmap_index() is not None
+
+    monkeypatch.setattr(settings, "EMBED_DIM", DIM * 2)
+    monkeypatch.setattr(mmap_index, "_loaded", None)
+
+    assert get_mmap_index() is None
@@ -0,0 +1,127 @@
+"""
+Unit tests for near-duplicate detection (MinHash signatures + SQLite LSH).
+Uses a throwaway index file; no Neo4j needed.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from pjs_neo_rag.near_dup import (  # noqa: E402
+    NUM_PERM,
+    DedupIndex,
+    MinHasher,
+    jaccard,
+    mark_duplicates,
+)
+
+TEXT = (
+    "the dirac equation describes spin one half particles and predicts "
+    "antimatter as solutions with negative energy in relativistic quantum mechanics"
+)
+OTHER = (
+    "clifford algebras generalize complex numbers and quaternions and give "
+    "a compact language for rotations reflections and spinors in any dimension"
+)
+
+
+def _index(tmp_path):
+    return DedupIndex(tmp_path / "dedup.sqlite", threshold=0.8, shingle=3)
+
+
+def _row(chunk_id, text):
+    return {"chunk_id": chunk_id, "text_norm": text, "latex_raw": ""}
+
+
+# ---- MinHash ----
+def test_signature_is_deterministic():
+    sig = MinHasher(shingle=3).signature(TEXT)
+
+    assert sig.dtype == np.uint32 and sig.shape == (NUM_PERM,)
+    assert np.array_equal(sig, MinHasher(shingle=3).signature(TEXT))
+    assert MinHasher(shingle=3).signature("   ") is None
+
+
+def test_jaccard_estimate():
+    hasher = MinHasher(shingle=3)
+    sig = hasher.signature(TEXT)
+
+    assert jaccard(sig, hasher.signature(TEXT.upper())) == 1.0  # case-folded
+    assert jaccard(sig, hasher.signature(OTHER)) < 0.2
+    near = jaccard(sig, hasher.signature(TEXT + " today"))
+    assert 0.8 < near < 1.0
+
+
+# ---- LSH index ----
+def test_mark_duplicates_within_a_batch(tmp_path):
+    index = _index(tmp_path)
+    rows = [_row("d:p1:o0", TEXT), _row("d:p2:o0", TEXT), _row("d:p3:o0", OTHER)]
+
+    assert mark_duplicates(rows, index) == 1
+    assert [r["canonical_id"] for r in rows] == [None, "d:p1:o0", None]
+
+
+def test_canonical_is_indexed_only_once_confirmed(tmp_path):
+    index = _index(tmp_path)
+    first = [_row("a:p1:o0", TEXT)]
+    mark_duplicates(first, index)
+
+    # pending canonicals are matched, but not stored
+    second = [_row("b:p1:o0", TEXT)]
+    mark_duplicates(second, index)
+    assert second[0]["canonical_id"] == "a:p1:o0"
+    assert index.stats()["entries"] == 0
+
+    index.confirm(["a:p1:o0"])
+    assert index.stats()["entries"] == 1
+
+    # a reopened index (next run) still knows the confirmed canonical
+    reopened = _index(tmp_path)
+    third = [_row("c:p1:o0", TEXT)]
+    mark_duplicates(third, reopened)
+    assert third[0]["canonical_id"] == "a:p1:o0"
+
+
+def test_released_canonical_no_longer_matches(tmp_path):
+    index = _index(tmp_path)
+    mark_duplicates([_row("a:p1:o0", TEXT)], index)
+    index.release(["a:p1:o0"])  # its write failed
+
+    rows = [_row("b:p1:o0", TEXT)]
+    assert mark_duplicates(rows, index) == 0
+    assert rows[0]["canonical_id"] is None
+    assert index.stats()["entries"] == 0
+
+
+def test_remove_docs(tmp_path):
+    index = _index(tmp_path)
+    mark_duplicates([_row("a:p1:o0", TEXT), _row("b:p1:o0", OTHER)], index)
+    index.confirm(["a:p1:o0", "b:p1:o0"])
+
+    index.remove_docs(["a"])
+
+    assert index.stats()["entries"] == 1
+    rows = [_row("c:p1:o0", TEXT)]
+    assert mark_duplicates(rows, index) == 0
+
+
+def test_bind_resets_the_index_for_another_database(tmp_path):
+    index = _index(tmp_path)
+    assert index.bind("corpus-1")
+    mark_duplicates([_row("a:p1:o0", TEXT)], index)
+    index.confirm(["a:p1:o0"])
+
+    assert _index(tmp_path).bind("corpus-1")
+    assert index.stats()["entries"] == 1
+
+    # the database was cleared: "a:p1:o0" no longer exists
+    reopened = _index(tmp_path)
+    assert not reopened.bind("corpus-2")
+    assert reopened.stats()["entries"] == 0
+    rows = [_row("b:p1:o0", TEXT)]
+    assert mark_duplicates(rows, reopened) == 0
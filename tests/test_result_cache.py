@@ -0,0 +1,128 @@
+"""
+Unit tests for the search result cache: key construction, the two backends
+and invalidation by corpus snapshot. Neo4j's Snapshot node is simulated by
+the recording fake driver.
+"""
+
+import sys
+import uuid
+from pathlib import Path
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.create_neo_indexes as create_neo_indexes  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.corpus_generation import (  # noqa: E402
+    BUMP_GENERATION,
+    ENSURE_CORPUS_ID,
+    READ_SNAPSHOT,
+    bump_generation,
+)
+from pjs_neo_rag.result_cache import (  # noqa: E402
+    GenerationTracker,
+    MemoryResultCache,
+    SQLiteResultCache,
+    result_key,
+)
+
+SNAP = ("corpus-a", 1)
+
+
+# ---- result_key ----
+def test_result_key_collapses_whitespace_only():
+    key = result_key(SNAP, "flat", "Dirac equation", 8, False)
+
+    assert result_key(SNAP, "flat", "  Dirac\n equation ", 8, False) == key
+    # case can matter in math queries
+    assert result_key(SNAP, "flat", "dirac equation", 8, False) != key
+
+
+def test_result_key_changes_with_every_input():
+    base = result_key(SNAP, "flat", "q", 8, False, {"doc_id": "a"}, 0)
+    variants = [
+        result_key(("corpus-a", 2), "flat", "q", 8, False, {"doc_id": "a"}, 0),
+        result_key(("corpus-b", 1), "flat", "q", 8, False, {"doc_id": "a"}, 0),
+        result_key(SNAP, "hybrid", "q", 8, False, {"doc_id": "a"}, 0),
+        result_key(SNAP, "flat", "other", 8, False, {"doc_id": "a"}, 0),
+        result_key(SNAP, "flat", "q", 5, False, {"doc_id": "a"}, 0),
+        result_key(SNAP, "flat", "q", 8, True, {"doc_id": "a"}, 0),
+        result_key(SNAP, "flat", "q", 8, False, {"doc_id": "b"}, 0),
+        result_key(SNAP, "flat", "q", 8, False, {"doc_id": "a"}, 2),
+    ]
+    assert len({base, *variants}) == len(variants) + 1
+
+
+# ---- backends ----
+def test_memory_cache_round_trip():
+    cache = MemoryResultCache(maxsize=2, ttl=60)
+    cache.put("a", [{"chunk_id": "c1"}])
+
+    assert cache.get("a") == [{"chunk_id": "c1"}]
+    assert cache.get("b") is None
+
+
+def test_sqlite_cache_round_trip_and_expiry(tmp_path):
+    cache = SQLiteResultCache(tmp_path / "results.sqlite", maxsize=10, ttl=60)
+    cache.put("a", [{"chunk_id": "c1", "score": 0.5}])
+
+    assert cache.get("a") == [{"chunk_id": "c1", "score": 0.5}]
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+
+    expired = SQLiteResultCache(tmp_path / "expired.sqlite", maxsize=10, ttl=-1)
+    expired.put("a", [])
+    assert expired.get("a") is None
+
+
+# ---- invalidation ----
+class _Graph:
+    """Just enough of Neo4j for the Snapshot node and a full wipe."""
+
+    def __init__(self):
+        self.snapshot = None
+
+    def __call__(self, query, params):
+        if query == "MATCH (n) DETACH DELETE n":
+            self.snapshot = None
+        elif query in (BUMP_GENERATION, ENSURE_CORPUS_ID):
+            if self.snapshot is None:
+                self.snapshot = {"corpus_id": None, "generation": 0}
+            if self.snapshot["corpus_id"] is None:
+                self.snapshot["corpus_id"] = str(uuid.uuid4())
+            if query == BUMP_GENERATION:
+                self.snapshot["generation"] += 1
+            return [dict(self.snapshot)]
+        elif query == READ_SNAPSHOT:
+            snap = self.snapshot or {"corpus_id": None, "generation": 0}
+            return [dict(snap)]
+        return None
+
+
+def test_ingest_after_a_wipe_does_not_hit_old_entries(monkeypatch):
+    driver = FakeDriver(_Graph())
+    monkeypatch.setattr(create_neo_indexes, "get_driver", lambda: driver)
+    cache = MemoryResultCache(maxsize=8, ttl=60)
+
+    with driver.session() as s:
+        bump_generation(s)  # first ingest
+    before = GenerationTracker(poll_seconds=0).current(driver)
+    cache.put(result_key(before, "flat", "q", 8, False), [{"chunk_id": "old"}])
+
+    create_neo_indexes.clear_all_data()
+    with driver.session() as s:
+        bump_generation(s)  # re-ingest: the generation starts over at 1
+    after = GenerationTracker(poll_seconds=0).current(driver)
+
+    assert after[1] == before[1] == 1
+    assert cache.get(result_key(after, "flat", "q", 8, False)) is None
+
+
+def test_tracker_polls_at_most_once_per_interval():
+    driver = FakeDriver(lambda q, p: [{"corpus_id": "c", "generation": 3}])
+    tracker = GenerationTracker(poll_seconds=60)
+
+    assert tracker.current(driver) == ("c", 3)
+    assert tracker.current(driver) == ("c", 3)
+    assert len(driver.runs) == 1
@@ -0,0 +1,81 @@
+"""
+Unit tests for ``--sync``: which Documents are stale, and the guard against
+wiping the corpus when no PDFs are found. Neo4j is replaced by the recording
+fake driver.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import pjs_neo_rag.ingest_files as ingest_files  # noqa: E402
+from fakes import FakeDriver  # noqa: E402
+from pjs_neo_rag.config import settings  # noqa: E402
+from pjs_neo_rag.ingest_files import DELETE_DOCS, DOCS_UNDER, sync_corpus  # noqa: E402
+from pjs_neo_rag.ingest_pdf import file_doc_id  # noqa: E402
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_sync_deletes_edited_and_removed_documents(tmp_path, monkeypatch):
+    kept = _write(tmp_path / "kept.pdf", b"kept")
+    edited = _write(tmp_path / "edited.pdf", b"new bytes")
+    failed = _write(tmp_path / "failed.pdf", b"failed")
+    indexed = [
+        {"doc_id": file_doc_id(kept), "path": kept},
+        {"doc_id": "old-edited", "path": edited},
+        {"doc_id": "old-failed", "path": failed},
+        {"doc_id": "removed", "path": str(tmp_path / "removed.pdf")},
+    ]
+
+    def handler(query, params):
+        return indexed if query == DOCS_UNDER else None
+
+    driver = FakeDriver(handler)
+    monkeypatch.setattr(ingest_files, "get_driver", lambda: driver)
+    monkeypatch.setattr(ingest_files, "release_documents", lambda s, ids: None)
+
+    stale = sync_corpus(
+        [kept, edited, failed],
+        ingested={edited: file_doc_id(edited)},
+        todo=[edited, failed],  # failed.pdf did not make it this run
+        manifest=None,
+        root=str(tmp_path),
+    )
+
+    assert stale == ["old-edited", "removed"]
+    assert driver.params(DELETE_DOCS)[0]["doc_ids"] == stale
+
+
+def _main(tmp_path, monkeypatch, *argv):
+    synced = []
+    monkeypatch.setattr(settings, "SOURCE_DIR", tmp_path)
+    monkeypatch.setattr(ingest_files, "create_indexes", lambda force_recreate: None)
+    monkeypatch.setattr(ingest_files, "get_embedding_cache", lambda: None)
+    monkeypatch.setattr(ingest_files, "bind_dedup", lambda: None)
+    monkeypatch.setattr(ingest_files, "get_dedup_index", lambda: None)
+    monkeypatch.setattr(ingest_files, "sync_corpus", lambda *a: synced.append(a))
+    ingest_files.main(list(argv))
+    return synced
+
+
+def test_sync_refuses_an_empty_source(tmp_path, monkeypatch):
+    with pytest.raises(SystemExit) as exc:
+        _main(tmp_path, monkeypatch, "--sync")
+
+    assert exc.value.code == 1
+
+
+def test_empty_sync_needs_an_explicit_flag(tmp_path, monkeypatch):
+    synced = _main(tmp_path, monkeypatch, "--sync", "--allow-empty-sync")
+
+    assert len(synced) == 1
+    assert synced[0][0] == []  # no files: every Document under the root goes
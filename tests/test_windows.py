@@ -0,0 +1,86 @@
+"""
+Unit tests for neighbour windows: merging overlapping windows of flat search
+hits into passages. No Neo4j or embedding backend needed.
+"""
+
+import sys
+from pathlib import Path
+
+# Add src to path
+src_path = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+from pjs_neo_rag.neo_search import (  # noqa: E402
+    _merge_windows,
+    _union,
+)
+
+
+def _chunk(chunk_id, page):
+    return {
+        "chunk_id": chunk_id,
+        "text": chunk_id,
+        "latex": "",
+        "page_start": page,
+        "page_end": page,
+    }
+
+
+# ---- _union / _merge_windows ----
+def test_union_keeps_chain_order():
+    a = [_chunk("c1", 1), _chunk("c2", 1), _chunk("c3", 2)]
+    b = [_chunk("c3", 2), _chunk("c4", 2)]
+
+    assert [c["chunk_id"] for c in _union(a, b)] == ["c1", "c2", "c3", "c4"]
+    assert [c["chunk_id"] for c in _union(b, a)] == ["c1", "c2", "c3", "c4"]
+
+
+def test_merge_windows_joins_overlapping_windows():
+    rows = [
+        {
+            "chunk_id": "c2",
+            "score": 0.5,
+            "duplicates": 0,
+            "window": [_chunk("c1", 1), _chunk("c2", 1), _chunk("c3", 2)],
+        },
+        {
+            "chunk_id": "c4",
+            "score": 0.9,
+            "duplicates": 2,
+            "window": [_chunk("c3", 2), _chunk("c4", 2), _chunk("c5", 3)],
+        },
+        {
+            "chunk_id": "x1",
+            "score": 0.7,
+            "duplicates": 0,
+            "window": [_chunk("x1", 9)],
+        },
+    ]
+    passages = _merge_windows(rows)
+
+    assert len(passages) == 2
+    merged, other = passages
+    # the merged passage keeps its best hit
+    assert merged["chunk_id"] == "c4"
+    assert merged["score"] == 0.9
+    assert merged["duplicates"] == 2
+    assert merged["chunk_ids"] == ["c1", "c2", "c3", "c4", "c5"]
+    assert (merged["page_start"], merged["page_end"]) == (1, 3)
+    assert merged["text"] == "c1\nc2\nc3\nc4\nc5"
+    assert other["chunk_ids"] == ["x1"]
+
+
+def test_merge_windows_bridges_two_groups():
+    rows = [
+        {"chunk_id": "c1", "score": 0.9, "duplicates": 0, "window": [_chunk("c1", 1)]},
+        {"chunk_id": "c3", "score": 0.8, "duplicates": 0, "window": [_chunk("c3", 1)]},
+        {
+            "chunk_id": "c2",
+            "score": 0.1,
+            "duplicates": 0,
+            "window": [_chunk("c1", 1), _chunk("c2", 1), _chunk("c3", 1)],
+        },
+    ]
+    passages = _merge_windows(rows)
+
+    assert [p["chunk_ids"] for p in passages] == [["c1", "c2", "c3"]]